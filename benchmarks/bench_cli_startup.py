@@ -0,0 +1,71 @@
+"""
+Measures the import time of exif_cli commands that should start fast.
+
+Each command runs several times in a fresh interpreter with -X importtime,
+and the script reports the median total import time of the top-level
+modules (the interpreter's own site/encodings excluded) and the heavy
+modules the command loaded, which should be none. The help commands take
+about 30-40 ms on a typical machine.
+
+    python benchmarks/bench_cli_startup.py --runs 10 --budget 100
+
+With --budget (milliseconds), a command above it makes the script exit
+with status 1.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CLI = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'exif_cli.py'))
+
+# Modules a command must not load unless it needs them (see tests/test_cli.py).
+HEAVY_MODULES = {'piexif', 'PIL', 'exif_editor', 'exif_reader', 'sqlite3', 'tkinter', 'configparser'}
+
+COMMANDS = [('--help',), ('scan', '--help'), ('tag', '--help'), ('watch', '--help'), ('batch', 'run', '--help'),
+            ('restore', '--help'), ('report', '--help'), ('cleanup', '--dry-run', '{directory}')]
+
+
+def import_profile(args):
+    """Runs the CLI with -X importtime; returns (imported module names, import seconds)."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', CLI, *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {result.stderr}")
+    modules = set()
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        # Top-level lines include the time of the modules they import.
+        if not name.startswith('  ') and name.strip() not in ('site', 'encodings'):
+            total += int(cumulative)
+    return modules, total / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the import time of exif_cli commands.')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per command; the median is reported.')
+    parser.add_argument('--budget', type=float, default=None, help='Fail if a command imports for longer (ms).')
+    args = parser.parse_args()
+
+    over_budget = False
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'command':<24} {'import ms':>10}  heavy modules")
+        for command in COMMANDS:
+            command = [arg.format(directory=directory) for arg in command]
+            runs = [import_profile(command) for _ in range(args.runs)]
+            milliseconds = statistics.median(seconds for _, seconds in runs) * 1000
+            heavy = set().union(*(modules & HEAVY_MODULES for modules, _ in runs))
+            label = ' '.join(arg for arg in command if arg != directory)
+            print(f"{label:<24} {milliseconds:>10.1f}  {', '.join(sorted(heavy)) or '-'}")
+            if args.budget is not None and milliseconds > args.budget:
+                over_budget = True
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Compares the old os.walk + any(endswith) discovery loop with FileFinder.
+
+Builds a tree of empty files (mostly matching, some not) and times a full
+walk with each, plus the time until the first file is found, which is
+what lets parsing start early.
+
+    python benchmarks/bench_discovery.py --dirs 200 --files 500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from discovery import FileFinder  # noqa: E402
+
+EXTENSIONS = ['.jpg', '.jpeg', '.tif', '.tiff']
+
+
+def legacy_walk(directory_path, target_extensions):
+    for root, _, files in os.walk(directory_path):
+        for file in files:
+            if any(file.lower().endswith(ext.lower()) for ext in target_extensions):
+                yield os.path.join(root, file)
+
+
+def finder_walk(directory_path, target_extensions):
+    for entry in FileFinder(target_extensions).scan(directory_path):
+        yield entry.path
+
+
+def make_tree(directory, dirs, files):
+    for d in range(dirs):
+        sub = os.path.join(directory, f'{d // 20:03d}', f'{d:05d}')
+        os.makedirs(sub)
+        for i in range(files):
+            name = f'IMG_{i:05d}.JPG' if i % 5 else f'IMG_{i:05d}.xmp'
+            open(os.path.join(sub, name), 'w').close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark file discovery.')
+    parser.add_argument('--dirs', type=int, default=200, help='Number of leaf directories.')
+    parser.add_argument('--files', type=int, default=500, help='Files per directory.')
+    parser.add_argument('--rounds', type=int, default=3, help='Walks per method; the best is reported.')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        make_tree(directory, args.dirs, args.files)
+        print(f"{args.dirs * args.files:,} entries")
+        print(f"{'walker':<8} {'found':>9} {'first (ms)':>11} {'total (s)':>10} {'entries/s':>12}")
+        for name, walk in (('os.walk', legacy_walk), ('finder', finder_walk)):
+            best_first = best_total = float('inf')
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                found = walk(directory, EXTENSIONS)
+                next(found)
+                first = time.perf_counter() - start
+                count = 1 + sum(1 for _ in found)
+                total = time.perf_counter() - start
+                best_first, best_total = min(best_first, first), min(best_total, total)
+            print(f"{name:<8} {count:>9,} {best_first * 1000:>11.2f} {best_total:>10.3f} "
+                  f"{args.dirs * args.files / best_total:>12,.0f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares the throughput of the durability policies of a tagging run.
+
+Each policy tags a fresh copy of the same corpus with process_directory
+and .bak backups, and the script reports files per second, the number of
+fsync calls and how many written files a power loss could take with it
+at worst (all of them for 'none'; for the others, the files whose
+directories are not synced yet: until the run ends for 'end', one batch
+for 'per-batch', none for 'per-file'). With every policy but 'none' the
+file data is flushed in the workers, so a lost file reverts to its
+previous version instead of being left empty or torn.
+
+fsync cost depends on the disk, so run it on the disk you care about:
+tmpfs (often /tmp) makes every policy look free.
+
+    python benchmarks/bench_durability.py --directory /mnt/nas/bench --files 500
+"""
+import argparse
+import configparser
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from corpus import add_corpus_arguments, corpus_options, generate_corpus  # noqa: E402
+from durability import DEFAULT_BATCH_SIZE, DURABILITY_POLICIES  # noqa: E402
+
+
+def write_config(path):
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'true', 'backup_mode': 'copy', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'artist': 'Benchmark', 'copyright': 'All rights reserved.'}
+    with open(path, 'w') as f:
+        config.write(f)
+
+
+def run_policy(corpus, work, config_path, policy):
+    """Tags a copy of the corpus; returns (seconds, fsync calls)."""
+    from exif_editor import process_directory
+
+    shutil.copytree(corpus, work)
+    # Start from the same state: nothing of the copy waiting to be written.
+    os.sync()
+    calls = 0
+    real_fsync = os.fsync
+
+    def counting_fsync(fd):
+        nonlocal calls
+        calls += 1
+        real_fsync(fd)
+
+    os.fsync = counting_fsync
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_directory(work, config_path, durability=policy)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.fsync = real_fsync
+        shutil.rmtree(work)
+    return elapsed, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the durability policies of a tagging run.')
+    add_corpus_arguments(parser)
+    parser.add_argument('--directory', default=None,
+                        help='Where to put the corpus and its copies (default: a temp directory).')
+    parser.add_argument('--policies', default=','.join(DURABILITY_POLICIES),
+                        help='Comma-separated policies to run.')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(dir=args.directory)
+    try:
+        corpus = os.path.join(root, 'corpus')
+        paths = generate_corpus(corpus, **corpus_options(args))
+        config_path = os.path.join(root, 'bench.ini')
+        write_config(config_path)
+        files = len(paths)
+        at_risk = {'none': files, 'per-file': 0, 'per-batch': min(files, DEFAULT_BATCH_SIZE), 'end': files}
+
+        print(f"{files} files in {root}")
+        print(f"{'policy':<10} {'files/sec':>10} {'fsyncs':>8} {'at risk':>8}")
+        for policy in args.policies.split(','):
+            elapsed, calls = run_policy(corpus, os.path.join(root, 'work'), config_path, policy.strip())
+            print(f"{policy:<10} {files / elapsed:>10,.0f} {calls:>8} {at_risk[policy]:>8}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
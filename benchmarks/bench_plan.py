@@ -0,0 +1,102 @@
+"""
+Compares applying a compiled TagPlan with the old per-file if/elif chain.
+
+The old code lowercased every config key, re-encoded every value and
+rebuilt UserComment for each file; a TagPlan does that once per run. This
+measures only that per-file step, on an in-memory EXIF dict, so file I/O
+does not hide the difference.
+
+    python benchmarks/bench_plan.py --files 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+import piexif
+import piexif.helper
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from tag_registry import compile_plan  # noqa: E402
+
+CONFIG = {
+    'artist': 'Mr. HA (c)',
+    'copyright': 'All rights reserved. (2025)',
+    'usercomment': 'Nikon ZF Camera,Nikon Z 40mm f/2 SE Lens.',
+    'make': 'Nikon',
+    'model': 'ZF',
+    'datetimeoriginal': '',
+    'software': 'Gemini EXIF Editor',
+    'lensmake': 'Nikon',
+    'lensmodel': 'Nikon Z 40mm f/2 SE',
+}
+
+
+def legacy_targets(config):
+    """The if/elif chain process_directory used to run for every file."""
+    targets = {}
+    for key, value in config['EXIF'].items():
+        if not value:
+            continue
+        if key.lower() == 'artist':
+            targets[('0th', piexif.ImageIFD.Artist)] = value.encode('utf-8')
+        elif key.lower() == 'copyright':
+            targets[('0th', piexif.ImageIFD.Copyright)] = value.encode('utf-8')
+        elif key.lower() == 'make':
+            targets[('0th', piexif.ImageIFD.Make)] = value.encode('utf-8')
+        elif key.lower() == 'model':
+            targets[('0th', piexif.ImageIFD.Model)] = value.encode('utf-8')
+        elif key.lower() == 'software':
+            targets[('0th', piexif.ImageIFD.Software)] = value.encode('utf-8')
+        elif key.lower() == 'datetimeoriginal':
+            targets[('Exif', piexif.ExifIFD.DateTimeOriginal)] = value.encode('utf-8')
+        elif key.lower() == 'usercomment':
+            targets[('Exif', piexif.ExifIFD.UserComment)] = piexif.helper.UserComment.dump(value, encoding="unicode")
+        elif key.lower() == 'lensmake':
+            targets[('Exif', piexif.ExifIFD.LensMake)] = value.encode('utf-8')
+        elif key.lower() == 'lensmodel':
+            targets[('Exif', piexif.ExifIFD.LensModel)] = value.encode('utf-8')
+    return targets
+
+
+def apply_legacy(config, exif_dict):
+    changes = 0
+    for (ifd_name, tag), value in legacy_targets(config).items():
+        if exif_dict[ifd_name].get(tag) != value:
+            exif_dict[ifd_name][tag] = value
+            changes += 1
+    return changes
+
+
+def apply_plan(plan, exif_dict):
+    changes = 0
+    for ifd_name, tag, value in plan:
+        if exif_dict[ifd_name].get(tag) != value:
+            exif_dict[ifd_name][tag] = value
+            changes += 1
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-file tag plan application.')
+    parser.add_argument('--files', type=int, default=200000, help='Number of simulated files.')
+    args = parser.parse_args()
+
+    config = {'EXIF': CONFIG}
+    start = time.perf_counter()
+    plan = compile_plan(CONFIG)
+    compile_time = time.perf_counter() - start
+    print(f"compile_plan: {compile_time * 1e6:.1f} us for {len(plan)} tags (once per run)")
+    print(f"{'path':<8} {'us/file':>10} {'files/sec':>12}")
+
+    for name, apply, argument in (('legacy', apply_legacy, config), ('plan', apply_plan, plan)):
+        exif_dict = {'0th': {}, 'Exif': {}, 'GPS': {}}
+        start = time.perf_counter()
+        for _ in range(args.files):
+            apply(argument, exif_dict)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<8} {elapsed / args.files * 1e6:>10.2f} {args.files / elapsed:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
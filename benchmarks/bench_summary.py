@@ -0,0 +1,87 @@
+"""
+Compares the header-only EXIF reader with piexif.load for the summary scan.
+
+Generates a small corpus of noisy JPEGs (noise does not compress, so the
+files are large), then reads Make/Model/LensModel from every file with both
+readers and reports bytes read per file and files per second.
+
+    python benchmarks/bench_summary.py --files 50 --megapixels 12
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+import piexif
+
+from common import read_proc_io
+from exif_reader import read_exif_tags, SUMMARY_TAGS
+
+
+def make_corpus(directory, count, megapixels):
+    side = int((megapixels * 1_000_000) ** 0.5)
+    exif_bytes = piexif.dump({
+        '0th': {piexif.ImageIFD.Make: b'Nikon', piexif.ImageIFD.Model: b'ZF'},
+        'Exif': {piexif.ExifIFD.LensModel: b'Nikon Z 40mm f/2 SE'},
+    })
+    template = os.path.join(directory, 'template.jpg')
+    Image.effect_noise((side, side), 64).convert('RGB').save(template, exif=exif_bytes, quality=95)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'photo_{i:05d}.jpg')
+        shutil.copyfile(template, path)
+        paths.append(path)
+    os.remove(template)
+    return paths
+
+
+def read_with_piexif(path):
+    exif_dict = piexif.load(path)
+    return (exif_dict['0th'].get(piexif.ImageIFD.Make),
+            exif_dict['0th'].get(piexif.ImageIFD.Model),
+            exif_dict['Exif'].get(piexif.ExifIFD.LensModel))
+
+
+def read_header_only(path):
+    tags = read_exif_tags(path, SUMMARY_TAGS)
+    return tuple(tags.get(key) for key in SUMMARY_TAGS)
+
+
+def run(name, reader, paths, rounds):
+    before = read_proc_io()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for path in paths:
+            reader(path)
+    elapsed = time.perf_counter() - start
+    after = read_proc_io()
+    files = len(paths) * rounds
+    per_file = (after['rchar'] - before['rchar']) / files if before is not None else float('nan')
+    print(f"{name:<12} {per_file:>14,.0f} {files / elapsed:>12,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the summary EXIF readers.')
+    parser.add_argument('--files', type=int, default=50, help='Number of files in the corpus.')
+    parser.add_argument('--megapixels', type=float, default=4, help='Image size of each file.')
+    parser.add_argument('--rounds', type=int, default=5, help='Times to read the whole corpus.')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = make_corpus(directory, args.files, args.megapixels)
+        size = os.path.getsize(paths[0])
+        print(f"{args.files} files of {size / 1024 / 1024:.1f} MB")
+        print(f"{'reader':<12} {'bytes/file':>14} {'files/sec':>12}")
+        for path in paths:
+            assert read_with_piexif(path) == read_header_only(path)
+        run('piexif', read_with_piexif, paths, args.rounds)
+        run('header-only', read_header_only, paths, args.rounds)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Compares piexif.load + piexif.insert with the segment write engine.
+
+Each round tags every file of a fresh corpus of noisy JPEGs without EXIF
+with alternating Artist values, once through the old whole-file piexif path and once
+through exif_writer, and reports bytes read/written per file and files
+per second. Bytes for piexif come from /proc/self/io; for the write engine
+they come from WriteStats, which also counts the bytes copied inside the
+kernel by copy_file_range/sendfile.
+
+    python benchmarks/bench_write.py --files 20 --megapixels 12
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+import piexif
+
+from common import read_proc_io
+from exif_writer import WriteStats, locate_exif, write_exif
+
+
+def make_corpus(directory, count, megapixels):
+    side = int((megapixels * 1_000_000) ** 0.5)
+    template = os.path.join(directory, 'template.jpg')
+    Image.effect_noise((side, side), 64).convert('RGB').save(template, quality=95)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f'photo_{i:05d}.jpg')
+        shutil.copyfile(template, path)
+        paths.append(path)
+    os.remove(template)
+    return paths
+
+
+def tag_with_piexif(path, artist):
+    try:
+        exif_dict = piexif.load(path)
+    except piexif.InvalidImageDataError:
+        exif_dict = {'0th': {}, 'Exif': {}, 'GPS': {}, '1st': {}, 'thumbnail': None}
+    exif_dict['0th'][piexif.ImageIFD.Artist] = artist
+    piexif.insert(piexif.dump(exif_dict), path)
+
+
+def tag_with_engine(path, artist, stats):
+    with open(path, 'rb') as f:
+        location = locate_exif(f, stats)
+    if location.exif_bytes is None:
+        exif_dict = {'0th': {}, 'Exif': {}, 'GPS': {}, '1st': {}, 'thumbnail': None}
+    else:
+        exif_dict = piexif.load(location.exif_bytes)
+    exif_dict['0th'][piexif.ImageIFD.Artist] = artist
+    write_exif(path, piexif.dump(exif_dict), location, stats)
+
+
+def artist_for(round_number):
+    # Alternate long and short values so both in-place and rewrite happen.
+    return b'Photographer Name' if round_number % 2 else b'Someone'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the EXIF write paths.')
+    parser.add_argument('--files', type=int, default=20, help='Number of files in the corpus.')
+    parser.add_argument('--megapixels', type=float, default=4, help='Image size of each file.')
+    parser.add_argument('--rounds', type=int, default=4, help='Times to tag the whole corpus.')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = make_corpus(directory, args.files, args.megapixels)
+        print(f"{args.files} files of {os.path.getsize(paths[0]) / 1024 / 1024:.1f} MB")
+        print(f"{'writer':<8} {'read/file':>14} {'written/file':>14} {'in place':>9} {'files/sec':>10}")
+        files = len(paths) * args.rounds
+
+        before = read_proc_io()
+        start = time.perf_counter()
+        for round_number in range(args.rounds):
+            for path in paths:
+                tag_with_piexif(path, artist_for(round_number))
+        elapsed = time.perf_counter() - start
+        after = read_proc_io()
+        if before is None:
+            read = written = float('nan')
+        else:
+            read = (after['rchar'] - before['rchar']) / files
+            written = (after['wchar'] - before['wchar']) / files
+        print(f"{'piexif':<8} {read:>14,.0f} {written:>14,.0f} {'-':>9} {files / elapsed:>10,.0f}")
+
+        # Start the engine from the same EXIF-less files piexif started from.
+        shutil.rmtree(directory)
+        os.makedirs(directory)
+        paths = make_corpus(directory, args.files, args.megapixels)
+        totals = WriteStats()
+        in_place = 0
+        start = time.perf_counter()
+        for round_number in range(args.rounds):
+            for path in paths:
+                stats = WriteStats()
+                tag_with_engine(path, artist_for(round_number), stats)
+                totals.bytes_read += stats.bytes_read
+                totals.bytes_written += stats.bytes_written
+                in_place += stats.in_place
+        elapsed = time.perf_counter() - start
+        print(f"{'engine':<8} {totals.bytes_read / files:>14,.0f} {totals.bytes_written / files:>14,.0f} "
+              f"{in_place:>9} {files / elapsed:>10,.0f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
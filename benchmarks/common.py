@@ -0,0 +1,25 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def read_proc_io():
+    """
+    Returns this process's read/write byte counters from /proc/self/io.
+
+    rchar/wchar count bytes passed through read/write system calls, so data
+    moved inside the kernel (copy_file_range, sendfile) is not included.
+
+    Returns:
+        dict: {'rchar': int, 'wchar': int}, or None where /proc is missing.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return None
+    return {'rchar': int(fields['rchar']), 'wchar': int(fields['wchar'])}
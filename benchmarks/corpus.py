@@ -0,0 +1,152 @@
+"""
+Generates synthetic JPEG corpora for the benchmarks.
+
+The same parameters and seed always give the same files, so results from
+different runs (and different machines) are comparable. Pixel data is
+seeded noise, which does not compress, so file sizes are close to those
+of real photos of the same resolution.
+
+    python benchmarks/corpus.py /tmp/corpus --files 1000 --megapixels 2,12
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+
+from PIL import Image
+import piexif
+
+CAMERAS = (
+    (b'Nikon', b'ZF', b'Nikon Z 40mm f/2 SE'),
+    (b'Canon', b'EOS R5', b'RF24-70mm F2.8 L IS USM'),
+    (b'SONY', b'ILCE-7M4', b'FE 35mm F1.8'),
+    (b'FUJIFILM', b'X-T5', b'XF33mmF1.4 R LM WR'),
+)
+
+
+def _noise_image(rng, megapixels):
+    width = max(16, int((megapixels * 1_000_000 * 4 / 3) ** 0.5))
+    height = max(16, width * 3 // 4)
+    return Image.frombytes('RGB', (width, height), rng.randbytes(width * height * 3))
+
+
+def _thumbnail(rng):
+    data = io.BytesIO()
+    _noise_image(rng, 0.0192).save(data, format='JPEG', quality=75)  # 160x120
+    return data.getvalue()
+
+
+def _exif_bytes(rng, thumbnail):
+    make, model, lens = rng.choice(CAMERAS)
+    exif_dict = {
+        '0th': {piexif.ImageIFD.Make: make, piexif.ImageIFD.Model: model,
+                piexif.ImageIFD.Software: b'corpus'},
+        'Exif': {piexif.ExifIFD.LensModel: lens,
+                 piexif.ExifIFD.DateTimeOriginal: b'2025:01:01 12:00:00',
+                 piexif.ExifIFD.FNumber: (rng.choice((14, 20, 28, 40)), 10)},
+        'GPS': {},
+        '1st': {},
+        'thumbnail': None,
+    }
+    if thumbnail is not None:
+        exif_dict['1st'] = {piexif.ImageIFD.Compression: 6}
+        exif_dict['thumbnail'] = thumbnail
+    return piexif.dump(exif_dict)
+
+
+def _leaf_directories(directory, depth, fanout):
+    leaves = ['']
+    for _ in range(depth):
+        leaves = [os.path.join(leaf, f'd{i:02d}') for leaf in leaves for i in range(fanout)]
+    return [os.path.join(directory, leaf) for leaf in leaves]
+
+
+def generate_corpus(directory, files=100, megapixels=(2,), exif_fraction=0.5, thumbnail_fraction=0.25,
+                    depth=2, fanout=4, seed=0, quality=90):
+    """
+    Writes a corpus of JPEG files below a directory.
+
+    Args:
+        directory (str): Where to write the corpus. Created if needed.
+        files (int): The number of files.
+        megapixels (sequence): Image sizes; files cycle through them.
+        exif_fraction (float): Share of files that get an EXIF segment.
+        thumbnail_fraction (float): Share of the files with EXIF that also
+            carry an embedded thumbnail.
+        depth (int): Levels of nested directories (0 puts all files in
+            directory itself).
+        fanout (int): Subdirectories per level.
+        seed (int): Seed for all random choices and pixel data.
+        quality (int): JPEG quality of the images.
+
+    Returns:
+        list: The paths of the generated files, in generation order.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    templates = {}
+    for size in megapixels:
+        path = os.path.join(directory, f'.template-{size}.jpg')
+        _noise_image(rng, size).save(path, quality=quality)
+        templates[size] = path
+    thumbnail = _thumbnail(rng)
+    leaves = _leaf_directories(directory, depth, fanout)
+    for leaf in leaves:
+        os.makedirs(leaf, exist_ok=True)
+
+    paths = []
+    for i in range(files):
+        path = os.path.join(leaves[i % len(leaves)], f'IMG_{i:06d}.jpg')
+        shutil.copyfile(templates[megapixels[i % len(megapixels)]], path)
+        if rng.random() < exif_fraction:
+            has_thumbnail = rng.random() < thumbnail_fraction
+            piexif.insert(_exif_bytes(rng, thumbnail if has_thumbnail else None), path)
+        paths.append(path)
+    for path in templates.values():
+        os.remove(path)
+    return paths
+
+
+def parse_sizes(text):
+    return tuple(float(size) for size in text.split(','))
+
+
+def add_corpus_arguments(parser):
+    """Adds the corpus options shared by the benchmark scripts."""
+    parser.add_argument('--files', type=int, default=200, help='Number of files in the corpus.')
+    parser.add_argument('--megapixels', type=parse_sizes, default=(2,),
+                        help='Comma-separated image sizes, e.g. 2,12.')
+    parser.add_argument('--exif', type=float, default=0.5, help='Share of files with EXIF.')
+    parser.add_argument('--thumbnails', type=float, default=0.25,
+                        help='Share of the files with EXIF that have a thumbnail.')
+    parser.add_argument('--depth', type=int, default=2, help='Levels of nested directories.')
+    parser.add_argument('--fanout', type=int, default=4, help='Subdirectories per level.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+
+
+def corpus_options(args):
+    """Returns the generate_corpus keyword arguments for parsed options."""
+    return {
+        'files': args.files,
+        'megapixels': args.megapixels,
+        'exif_fraction': args.exif,
+        'thumbnail_fraction': args.thumbnails,
+        'depth': args.depth,
+        'fanout': args.fanout,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic JPEG corpus.')
+    parser.add_argument('directory', help='Where to write the corpus.')
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    paths = generate_corpus(args.directory, **corpus_options(args))
+    total = sum(os.path.getsize(path) for path in paths)
+    print(f"{len(paths)} files, {total / 1024 / 1024:.1f} MB in {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Runs the end-to-end benchmark suite and emits the results as JSON.
+
+Each case runs in a fresh Python process on its own copy of a generated
+corpus (see corpus.py), so the peak RSS reported is that of the case
+alone and cases that modify files do not affect each other.
+
+Cases:
+    summary    iter_exif_summary, the scan behind get_exif_summary_from_directory
+    add_tags   add_exif_tags_to_file on every file
+    process    process_directory with .bak backups
+    cleanup    cleanup_backups after a process run (the run is not timed)
+
+For every case the JSON has the file count, wall time, files and MB per
+second, p50/p99 per-file latency in milliseconds (null for cleanup, which
+has no per-file hook) and the peak RSS in KiB.
+
+    python benchmarks/run_suite.py --files 500 --megapixels 2,12 --output new.json
+    python benchmarks/run_suite.py --files 500 --megapixels 2,12 --compare new.json
+
+With --compare, a case whose throughput dropped by more than --threshold
+against the given results makes the script exit with status 1.
+"""
+import argparse
+import configparser
+import contextlib
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from corpus import add_corpus_arguments, corpus_options, generate_corpus  # noqa: E402
+
+CASES = ('summary', 'add_tags', 'process', 'cleanup')
+
+EXTENSIONS = ['.jpg', '.jpeg']
+EXIF = {
+    'artist': 'Benchmark',
+    'copyright': 'All rights reserved.',
+    'usercomment': 'Nikon ZF Camera,Nikon Z 40mm f/2 SE Lens.',
+    'lensmodel': 'Nikon Z 40mm f/2 SE',
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def write_config(path, create_backup):
+    config = configparser.ConfigParser()
+    config['Settings'] = {
+        'create_backup': 'true' if create_backup else 'false',
+        'backup_mode': 'copy',
+        'target_extensions': ', '.join(EXTENSIONS),
+    }
+    config['EXIF'] = EXIF
+    with open(path, 'w') as f:
+        config.write(f)
+    return config
+
+
+def corpus_files(directory):
+    from discovery import iter_files
+    return list(iter_files(directory, EXTENSIONS))
+
+
+def case_summary(directory, jobs):
+    from exif_editor import iter_exif_summary
+    latencies = []
+    start = last = time.perf_counter()
+    for _ in iter_exif_summary(directory, EXTENSIONS, jobs=jobs):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    return time.perf_counter() - start, latencies
+
+
+def case_add_tags(directory, jobs):
+    from exif_editor import add_exif_tags_to_file
+    config = write_config(os.path.join(directory, 'bench.ini'), create_backup=False)
+    latencies = []
+    start = time.perf_counter()
+    for path in corpus_files(directory):
+        file_start = time.perf_counter()
+        if not add_exif_tags_to_file(path, config):
+            raise RuntimeError(f"add_exif_tags_to_file failed on {path}")
+        latencies.append(time.perf_counter() - file_start)
+    return time.perf_counter() - start, latencies
+
+
+def case_process(directory, jobs):
+    from exif_editor import process_directory
+    from progress import FileStarted, FileDone, FileSkipped, FileError
+    config_path = os.path.join(directory, 'bench.ini')
+    write_config(config_path, create_backup=True)
+    started = {}
+    latencies = []
+
+    def on_progress(event):
+        if isinstance(event, FileStarted):
+            started[event.path] = time.perf_counter()
+        elif isinstance(event, (FileDone, FileSkipped, FileError)):
+            # With jobs > 1 this includes the time spent queued.
+            latencies.append(time.perf_counter() - started.pop(event.path))
+
+    start = time.perf_counter()
+    process_directory(directory, config_path, jobs=jobs, progress=on_progress)
+    return time.perf_counter() - start, latencies
+
+
+def case_cleanup(directory, jobs):
+    from exif_editor import process_directory
+    from cleanup_backups import cleanup_backups
+    config_path = os.path.join(directory, 'bench.ini')
+    write_config(config_path, create_backup=True)
+    process_directory(directory, config_path, jobs=jobs)
+    start = time.perf_counter()
+    cleanup_backups(directory, jobs=max(jobs, 8))
+    return time.perf_counter() - start, None
+
+
+def run_case(case, directory, jobs):
+    """Runs one case in this process and returns its result dict."""
+    # Keeps process_directory's logging.basicConfig from writing a log file.
+    logging.basicConfig(handlers=[logging.NullHandler()], level=logging.WARNING)
+    paths = corpus_files(directory)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        elapsed, latencies = globals()[f'case_{case}'](directory, jobs)
+    if latencies is not None:
+        latencies = sorted(latencies)
+    return {
+        'case': case,
+        'files': len(paths),
+        'bytes': total_bytes,
+        'seconds': elapsed,
+        'files_per_second': len(paths) / elapsed if elapsed else None,
+        'mb_per_second': total_bytes / 1024 / 1024 / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        # ru_maxrss is in KiB on Linux and in bytes on macOS.
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1),
+    }
+
+
+def run_in_subprocess(case, directory, jobs):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-case', case, '--corpus', directory, '--jobs', str(jobs)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Prints the throughput change per case; returns the regressed cases."""
+    old = {result['case']: result for result in baseline['results']}
+    regressed = []
+    for result in results:
+        before = old.get(result['case'])
+        if not before or not before['files_per_second']:
+            continue
+        change = result['files_per_second'] / before['files_per_second'] - 1
+        print(f"{result['case']:<10} {before['files_per_second']:>10,.0f} -> "
+              f"{result['files_per_second']:>10,.0f} files/s ({change:+.1%})", file=sys.stderr)
+        if change < -threshold:
+            regressed.append(result['case'])
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the EXIF editor benchmark suite.')
+    add_corpus_arguments(parser)
+    parser.add_argument('--cases', default=','.join(CASES), help='Comma-separated cases to run.')
+    parser.add_argument('--jobs', type=int, default=1, help='Workers for the scan and process cases.')
+    parser.add_argument('--output', default=None, help='Write the JSON here instead of stdout.')
+    parser.add_argument('--compare', default=None, help='Results JSON to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed throughput drop before --compare fails (0.10 = 10%%).')
+    parser.add_argument('--run-case', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--corpus', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.corpus, args.jobs)))
+        return
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    workspace = tempfile.mkdtemp()
+    try:
+        template = os.path.join(workspace, 'corpus')
+        options = corpus_options(args)
+        generate_corpus(template, **options)
+        results = []
+        for case in cases:
+            directory = os.path.join(workspace, case)
+            shutil.copytree(template, directory)
+            results.append(run_in_subprocess(case, directory, args.jobs))
+            shutil.rmtree(directory)
+    finally:
+        shutil.rmtree(workspace)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'corpus': {**options, 'megapixels': list(options['megapixels'])},
+        'jobs': args.jobs,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.threshold)
+        if regressed:
+            print(f"Regressed: {', '.join(regressed)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import os
+import json
+import struct
+import shutil
+import threading
+import time
+from discovery import FileFinder
+
+JOURNAL_PREFIX = '.exif_backup-'
+JOURNAL_SUFFIX = '.journal'
+_MAGIC = b'EXIFJRNL1\n'
+_HEADER_LENGTH = struct.Struct('>I')
+
+# ioctl request number of FICLONE on Linux (_IOW(0x94, 9, int)).
+_FICLONE = 0x40049409
+
+
+def is_journal_file(name):
+    return name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX)
+
+
+class BackupJournal:
+    """
+    Records the original EXIF segment of each file before it is rewritten.
+
+    Since tagging only changes the APP1/Exif segment, the original file can
+    be rebuilt from that segment and its offset alone. Records go to one
+    append-only journal file per directory and run (and per process, when
+    the run uses worker processes). Each record is a single O_APPEND write,
+    so worker threads can share a journal without further locking. New
+    journal files are listed in the optional BackupManifest.
+
+    Record layout: a 4-byte big-endian header length, a JSON header with
+    the file name, segment offset, original segment length and original
+    file size, then the original segment bytes (none if the file had no
+    EXIF segment).
+    """
+
+    def __init__(self, run_id=None, manifest=None):
+        self.run_id = run_id or time.strftime('%Y%m%dT%H%M%S')
+        self.manifest = manifest
+        self._files = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes reopen their own journal files.
+        return {'run_id': self.run_id, 'manifest': self.manifest}
+
+    def __setstate__(self, state):
+        self.__init__(state['run_id'], state['manifest'])
+
+    def journal_path(self, directory):
+        return os.path.join(directory, f'{JOURNAL_PREFIX}{self.run_id}-{os.getpid()}{JOURNAL_SUFFIX}')
+
+    def _fd_for(self, directory, fsync=False):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._files = {}
+                self._pid = os.getpid()
+            fd = self._files.get(directory)
+            if fd is None:
+                path = self.journal_path(directory)
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                if os.fstat(fd).st_size == 0:
+                    os.write(fd, _MAGIC)
+                    if fsync:
+                        # Imported here: durability pulls in logging, which
+                        # cleanup (the other user of this module) does not need.
+                        from durability import fsync_directory
+                        # The records are no use if the journal itself is lost.
+                        os.fsync(fd)
+                        fsync_directory(directory)
+                    if self.manifest is not None:
+                        self.manifest.record(path)
+                self._files[directory] = fd
+            return fd
+
+    def record(self, image_path, location, fsync=False):
+        """
+        Appends the original segment of a file to its directory's journal.
+
+        Args:
+            image_path (str): The path to the JPEG file about to be changed.
+            location (ExifLocation): Its current EXIF segment location.
+            fsync (bool): Flush the journal to disk before returning, and
+                the directory entry of a new journal.
+        """
+        directory, name = os.path.split(os.path.abspath(image_path))
+        segment = location.segment or b''
+        header = json.dumps({
+            'name': name,
+            'offset': location.offset,
+            'length': len(segment),
+            'size': os.path.getsize(image_path),
+        }, ensure_ascii=False).encode('utf-8')
+        fd = self._fd_for(directory, fsync)
+        os.write(fd, _HEADER_LENGTH.pack(len(header)) + header + segment)
+        if fsync:
+            os.fsync(fd)
+
+    def close(self):
+        with self._lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files = {}
+
+
+def read_journal(journal_path):
+    """
+    Yields (header dict, original segment bytes) for each journal record.
+    """
+    with open(journal_path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{journal_path} is not an EXIF backup journal.")
+        while True:
+            prefix = f.read(_HEADER_LENGTH.size)
+            if len(prefix) < _HEADER_LENGTH.size:
+                # A record cut short by a crash is ignored.
+                return
+            header_bytes = f.read(_HEADER_LENGTH.unpack(prefix)[0])
+            try:
+                header = json.loads(header_bytes)
+            except ValueError:
+                return
+            segment = f.read(header['length'])
+            if len(segment) < header['length']:
+                return
+            yield header, segment
+
+
+def find_journals(directory_path, run_id=None):
+    """Returns the journal files below a directory, oldest run first."""
+    journals = []
+    for entry in FileFinder((JOURNAL_SUFFIX,)).scan(directory_path):
+        file = entry.name
+        if is_journal_file(file) and (run_id is None or file.startswith(f'{JOURNAL_PREFIX}{run_id}-')):
+            journals.append(entry.path)
+    return sorted(journals, key=os.path.basename)
+
+
+def restore_file(image_path, header, segment):
+    """
+    Rebuilds one file's original bytes from a journal record.
+
+    Returns:
+        bool: True if the file was restored, False if it no longer matches
+        the record (e.g. it was edited by another program).
+    """
+    # Imported here so that cleanup, which only needs the journal names,
+    # does not load the EXIF parser.
+    from exif_writer import ExifLocation, locate_exif, replace_segment
+
+    with open(image_path, 'rb') as f:
+        current = locate_exif(f)
+        size = os.fstat(f.fileno()).st_size
+    if current.segment == (segment or None):
+        # The run never got to rewrite this file.
+        return True
+    if current.offset != header['offset'] or current.segment is None:
+        return False
+    # Checked before anything is written, so a file that does not match
+    # is left as it is. replace_segment fails if the file changes meanwhile.
+    if size - current.length + len(segment) != header['size']:
+        return False
+    replace_segment(image_path, ExifLocation(current.offset, current.length, None), segment)
+    return True
+
+
+def restore(directory_path, run_id=None):
+    """
+    Restores the files recorded in the journals below a directory.
+
+    When a file appears in several runs, the record of the oldest run is
+    used, which brings it back to the state before the first run.
+
+    Args:
+        directory_path (str): The directory to restore.
+        run_id (str): Only use the journals of this run.
+
+    Returns:
+        tuple: (restored count, failed count).
+    """
+    originals = {}
+    for journal_path in find_journals(directory_path, run_id):
+        directory = os.path.dirname(journal_path)
+        for header, segment in read_journal(journal_path):
+            originals.setdefault(os.path.join(directory, header['name']), (header, segment))
+
+    restored = failed = 0
+    for image_path, (header, segment) in originals.items():
+        try:
+            if restore_file(image_path, header, segment):
+                restored += 1
+                continue
+            print(f"Could not restore {image_path}: it no longer matches the journal.")
+        except (OSError, ValueError) as e:
+            print(f"Could not restore {image_path}: {e}")
+        failed += 1
+    return restored, failed
+
+
+def clone_file(src, dst):
+    """
+    Copies a file as a reflink (copy-on-write clone) where supported.
+
+    On filesystems without reflinks (or off Linux) this falls back to a
+    regular shutil.copy2.
+    """
+    try:
+        import fcntl
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        shutil.copystat(src, dst)
+    except (ImportError, OSError):
+        shutil.copy2(src, dst)
+
+
+if __name__ == '__main__':
+    # The command line lives in exif_cli: `restore DIR` and, for the old
+    # `list DIR`, `restore DIR --list`.
+    import sys
+    from exif_cli import main
+    args = sys.argv[1:]
+    if args[:1] == ['list']:
+        args = args[1:] + ['--list']
+    elif args[:1] == ['restore']:
+        args = args[1:]
+    sys.exit(main(['restore'] + args))
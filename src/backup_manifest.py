@@ -0,0 +1,236 @@
+import os
+import json
+import threading
+import time
+
+MANIFEST_PREFIX = '.exif_manifest-'
+MANIFEST_SUFFIX = '.manifest'
+
+
+def default_registry_path():
+    """Returns the location of the manifest registry in the user cache dir."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'exif_editor', 'manifests.txt')
+
+
+def is_manifest_file(name):
+    return name.startswith(MANIFEST_PREFIX) and name.endswith(MANIFEST_SUFFIX)
+
+
+class BackupManifest:
+    """
+    Lists the backup files a run created, so cleanup can remove exactly
+    those instead of every *.bak file in the tree.
+
+    The manifest lives in the directory the run was started on and holds
+    one JSON line per backup with its path relative to that directory and
+    the time it was recorded. Backups keep the timestamps of their images,
+    so that time is what cleanup ages them by. The file is only created
+    once the first backup is recorded, and is then added to the registry
+    so cleanup of a parent or a subfolder can find it without walking the
+    tree. Each record is one O_APPEND write, so worker threads and worker
+    processes can share a manifest.
+
+    Args:
+        directory (str): The top directory of the run.
+        run_id (str): Names the manifest; defaults to the start time.
+        registry_path (str): The registry to add the manifest to; defaults
+            to default_registry_path().
+    """
+
+    def __init__(self, directory, run_id=None, registry_path=None):
+        self.directory = os.path.abspath(directory)
+        self.run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.path = os.path.join(self.directory, f'{MANIFEST_PREFIX}{self.run_id}{MANIFEST_SUFFIX}')
+        self.registry_path = registry_path
+        self._fd = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes open the manifest themselves.
+        return {'directory': self.directory, 'run_id': self.run_id, 'registry_path': self.registry_path}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'], state['run_id'], state['registry_path'])
+
+    def record(self, backup_path):
+        """Appends a backup file (a .bak copy or a journal) to the manifest."""
+        relative = os.path.relpath(os.path.abspath(backup_path), self.directory)
+        line = json.dumps({'path': relative, 'created': time.time()}, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = self._open()
+                self._pid = os.getpid()
+            os.write(self._fd, line.encode('utf-8'))
+
+    def _open(self):
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            # Opened before, or by another worker process.
+            return os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        register_manifest(self.path, self.registry_path)
+        return fd
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def read_manifest_entries(manifest_path):
+    """
+    Returns the backups listed in a manifest and when they were made.
+
+    Entries that would point outside the manifest's directory are dropped,
+    so a damaged or hand-edited manifest cannot make cleanup delete files
+    elsewhere. A line cut short by a crash is ignored.
+
+    Returns:
+        dict: The absolute backup paths, in manifest order, mapped to the
+        time each was recorded, or None for manifests written before the
+        time was kept.
+    """
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    entries = {}
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                relative = record['path']
+                created = record.get('created')
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            path = os.path.normpath(os.path.join(directory, relative))
+            if os.path.commonpath([directory, path]) != directory or path in entries:
+                continue
+            entries[path] = created if isinstance(created, (int, float)) else None
+    return entries
+
+
+def read_manifest(manifest_path):
+    """Returns the backup paths listed in a manifest, made absolute."""
+    return list(read_manifest_entries(manifest_path))
+
+
+def write_manifest(manifest_path, entries):
+    """
+    Rewrites a manifest atomically.
+
+    Args:
+        manifest_path (str): The manifest.
+        entries (Mapping): The backup paths mapped to the time each was
+            made, as read_manifest_entries returns them.
+    """
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for path, created in entries.items():
+            record = {'path': os.path.relpath(path, directory)}
+            if created is not None:
+                record['created'] = created
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(temp_path, manifest_path)
+
+
+def register_manifest(manifest_path, registry_path=None):
+    """
+    Adds a manifest to the registry.
+
+    The registry is a list of manifest paths, one per line, in the user
+    cache dir. Each entry is one O_APPEND write, so concurrent runs can
+    register at the same time. A registry that cannot be written is not
+    an error: the manifest is still found by cleanup of its own directory.
+    """
+    registry_path = registry_path or default_registry_path()
+    line = os.path.abspath(manifest_path) + '\n'
+    try:
+        os.makedirs(os.path.dirname(registry_path), exist_ok=True)
+        fd = os.open(registry_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8', 'surrogateescape'))
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def registered_manifests(registry_path=None):
+    """Returns the manifest paths in the registry, in the order they were added."""
+    registry_path = registry_path or default_registry_path()
+    try:
+        with open(registry_path, encoding='utf-8', errors='surrogateescape') as f:
+            return list(dict.fromkeys(line.rstrip('\n') for line in f if line.strip()))
+    except FileNotFoundError:
+        return []
+
+
+def prune_registry(registry_path=None):
+    """
+    Drops the manifests that no longer exist from the registry.
+
+    The registry is rewritten atomically. A manifest registered while it
+    is being rewritten may be dropped from it; cleanup of the manifest's
+    own directory still finds that manifest.
+    """
+    registry_path = registry_path or default_registry_path()
+    listed = registered_manifests(registry_path)
+    existing = [path for path in listed if os.path.isfile(path)]
+    if len(existing) == len(listed):
+        return
+    temp_path = f'{registry_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8', errors='surrogateescape') as f:
+            f.writelines(path + '\n' for path in existing)
+        os.replace(temp_path, registry_path)
+    except OSError:
+        pass
+
+
+def _manifests_in(directory_path):
+    try:
+        with os.scandir(directory_path) as entries:
+            return sorted(entry.path for entry in entries if is_manifest_file(entry.name) and entry.is_file())
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return []
+
+
+def find_manifests(directory_path, subdirectories=False, ancestors=False, registry_path=None):
+    """
+    Returns the manifests of a directory, oldest first within each directory.
+
+    A manifest lives in the directory its run was started on, so the
+    backups under a directory may be listed by manifests in its
+    subdirectories (runs on a subfolder) or in its ancestors (a run on a
+    parent folder). Those are looked up in the registry rather than by
+    walking the tree; only the directory's own listing is read.
+
+    Args:
+        directory_path (str): The directory.
+        subdirectories (bool): Also return the registered manifests of the
+            directories below it.
+        ancestors (bool): Also return the registered manifests of the
+            directories above it.
+        registry_path (str): The registry; defaults to default_registry_path().
+
+    Returns:
+        list: The manifest paths; the directory's own come first, then
+        those of its subdirectories, then those of its ancestors.
+    """
+    top = os.path.abspath(directory_path)
+    manifests = [os.path.abspath(path) for path in _manifests_in(directory_path)]
+    if not (subdirectories or ancestors):
+        return manifests
+    below, above = [], []
+    for path in sorted(registered_manifests(registry_path)):
+        directory = os.path.dirname(path)
+        if directory == top or not is_manifest_file(os.path.basename(path)):
+            continue
+        if subdirectories and os.path.commonpath([top, directory]) == top:
+            below.append(path)
+        elif ancestors and os.path.commonpath([top, directory]) == directory:
+            above.append(path)
+    # Manifests that were deleted since they were registered are skipped.
+    return manifests + [path for path in below + above if os.path.isfile(path)]
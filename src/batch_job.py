@@ -0,0 +1,283 @@
+import os
+import json
+import glob
+import shutil
+import logging
+from exif_editor import load_run_config, tag_paths, format_summary, written_paths, file_size
+from backup_journal import BackupJournal
+from backup_manifest import BackupManifest
+from durability import DURABILITY_POLICIES, SyncBatch, check_policy
+from progress import RunStarted, FileStarted, FileDone, FileSkipped, FileError, RunSummary
+
+# Files of a job directory.
+JOB_FILE = 'job.json'
+TARGETS_FILE = 'targets.ndjson'
+CONFIG_FILE = 'config.ini'
+
+# Statuses that count as done; files that failed are tried again on resume.
+_DONE = ('written', 'unchanged')
+
+
+def _shard_name(kind, shard, shards):
+    return f'{kind}-{shard}-of-{shards}'
+
+
+def _check_shard(shard, shards):
+    if shards < 1 or not 0 <= shard < shards:
+        raise ValueError(f"Invalid shard {shard} of {shards}; shards are numbered 0 to {shards - 1}.")
+
+
+def create_job(job_dir, directory_path, config_path):
+    """
+    Creates a batch job: the list of target files and a copy of the config.
+
+    The target files are found once, with the config's [Settings], and
+    listed relative to directory_path. Every shard of the job then works
+    from this list and the copied config, so all of them see the same
+    files and tags even when they run on different machines.
+
+    Args:
+        job_dir (str): The job directory; created if needed, must not
+            already hold a job.
+        directory_path (str): The directory containing the images.
+        config_path (str): The path to the configuration file.
+
+    Returns:
+        int: The number of target files.
+
+    Raises:
+        ValueError: If the config is invalid or job_dir already holds a job.
+    """
+    run_config = load_run_config(config_path)
+    os.makedirs(job_dir, exist_ok=True)
+    if os.path.exists(os.path.join(job_dir, JOB_FILE)):
+        raise ValueError(f"{job_dir} already holds a job.")
+    shutil.copyfile(config_path, os.path.join(job_dir, CONFIG_FILE))
+
+    total = 0
+    targets_path = os.path.join(job_dir, TARGETS_FILE)
+    with open(targets_path + '.tmp', 'w', encoding='utf-8') as f:
+        for entry in run_config.finder.scan(directory_path):
+            f.write(json.dumps(os.path.relpath(entry.path, directory_path), ensure_ascii=False) + '\n')
+            total += 1
+    os.replace(targets_path + '.tmp', targets_path)
+
+    # Written last: a job without it was not fully created.
+    with open(os.path.join(job_dir, JOB_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'directory': os.path.abspath(directory_path), 'total_files': total}, f, ensure_ascii=False)
+        f.write('\n')
+    return total
+
+
+def load_job(job_dir):
+    """
+    Returns the job.json contents of a job directory.
+
+    Raises:
+        ValueError: If job_dir does not hold a job.
+    """
+    try:
+        with open(os.path.join(job_dir, JOB_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"{job_dir} does not hold a job (no {JOB_FILE}).")
+
+
+def iter_shard(job_dir, total_files, shard=0, shards=1):
+    """
+    Yields the relative paths of the target files of one shard.
+
+    Shard k of n gets the k-th contiguous slice of the target list, so the
+    files of one directory mostly stay in one shard.
+    """
+    start = shard * total_files // shards
+    stop = (shard + 1) * total_files // shards
+    with open(os.path.join(job_dir, TARGETS_FILE), encoding='utf-8') as f:
+        for position, line in enumerate(f):
+            if position >= stop:
+                return
+            if position >= start:
+                yield json.loads(line)
+
+
+def read_checkpoint(checkpoint_path):
+    """
+    Returns {relative path: status} from a checkpoint log; later entries win.
+
+    A line cut short by a crash is ignored, so its file counts as not done.
+    """
+    statuses = {}
+    try:
+        with open(checkpoint_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    statuses[entry['path']] = entry['status']
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return statuses
+
+
+def run_job(job_dir, shard=0, shards=1, resume=False, jobs=1, executor='thread', directory_path=None, progress=None,
+            durability=None):
+    """
+    Processes the files of one shard of a batch job.
+
+    Each finished file is appended to the shard's checkpoint log
+    (checkpoint-K-of-N.log) as soon as its result is known. With resume,
+    files the log lists as written or unchanged are skipped; files that
+    failed are tried again. A file whose result was not logged before a
+    crash is simply processed again: its tags already match, so it is
+    neither backed up nor rewritten a second time.
+
+    A file is only logged once it is as durable as the durability policy
+    makes it: with 'per-batch', the lines of a batch are written after the
+    batch is flushed, so after a power loss every file the log lists as
+    written is intact on disk.
+
+    When the shard is finished, its totals (over all runs of the shard)
+    are written to summary-K-of-N.json for merge_job.
+
+    Args:
+        job_dir (str): The job directory made by create_job.
+        shard (int): The shard to process, from 0 to shards - 1.
+        shards (int): The number of shards the job is split into.
+        resume (bool): Continue from the shard's checkpoint log. Without
+            it, a shard that already has a log is refused.
+        jobs (int): The number of workers (see process_directory).
+        executor (str): 'thread' or 'process'.
+        directory_path (str): Where the images are, if the job's directory
+            is mounted elsewhere on this machine.
+        progress (callable): Optional callback for progress events (see
+            process_directory).
+        durability (str): One of durability.DURABILITY_POLICIES. Defaults
+            to the job config's [Settings] durability.
+
+    Returns:
+        dict: The shard totals, as written to the summary file.
+
+    Raises:
+        ValueError: If the job, the shard or the job's config is invalid.
+    """
+    _check_shard(shard, shards)
+    job = load_job(job_dir)
+    directory_path = directory_path or job['directory']
+    run_config = load_run_config(os.path.join(job_dir, CONFIG_FILE))
+    durability = check_policy(durability or run_config.durability)
+    checkpoint_path = os.path.join(job_dir, _shard_name('checkpoint', shard, shards) + '.log')
+    if os.path.exists(checkpoint_path) and not resume:
+        raise ValueError(f"Shard {shard} of {shards} was already started; use resume to continue it.")
+    statuses = read_checkpoint(checkpoint_path)
+
+    pending = [path for path in iter_shard(job_dir, job['total_files'], shard, shards)
+               if statuses.get(path) not in _DONE]
+    if progress is not None:
+        progress(RunStarted(directory_path, len(pending), sum(file_size(os.path.join(directory_path, path))
+                                                               for path in pending)))
+    logging.info(f"Job {job_dir}: shard {shard} of {shards}, {len(pending)} files to process")
+
+    backup_mode = run_config.backup_mode
+    manifest = BackupManifest(directory_path) if backup_mode else None
+    journal = BackupJournal(manifest=manifest) if backup_mode == 'journal' else None
+    sync = SyncBatch(durability)
+    checkpoint = os.open(checkpoint_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    unlogged = []
+
+    def log_durable():
+        # One O_APPEND write per line; a crash can only cut the last line.
+        for line in unlogged:
+            os.write(checkpoint, line)
+        unlogged.clear()
+
+    paths = (os.path.join(directory_path, path) for path in pending)
+    tagged = tag_paths(paths, run_config.plan, backup_mode, jobs=jobs, executor=executor, journal=journal,
+                       manifest=manifest, on_start=(lambda path: progress(FileStarted(path))) if progress else None,
+                       durability=durability)
+    try:
+        for image_path, (status, changes, _, error, _) in tagged:
+            relative = os.path.relpath(image_path, directory_path)
+            statuses[relative] = status
+            unlogged.append((json.dumps({'path': relative, 'status': status}, ensure_ascii=False)
+                             + '\n').encode('utf-8'))
+            if sync.add(written_paths(image_path, backup_mode) if status == 'written' else ()):
+                log_durable()
+            if progress is not None:
+                size = file_size(image_path)
+                if status == 'error':
+                    progress(FileError(image_path, size, error))
+                elif status == 'unchanged':
+                    progress(FileSkipped(image_path, size))
+                else:
+                    progress(FileDone(image_path, size, changes))
+    finally:
+        tagged.close()
+        try:
+            sync.flush()
+            log_durable()
+        finally:
+            os.close(checkpoint)
+        if journal is not None:
+            journal.close()
+        if manifest is not None:
+            manifest.close()
+
+    totals = {
+        'shard': shard,
+        'shards': shards,
+        'total_files': len(statuses),
+        'success_count': sum(status in _DONE for status in statuses.values()),
+        'error_count': sum(status == 'error' for status in statuses.values()),
+        'unchanged_count': sum(status == 'unchanged' for status in statuses.values()),
+    }
+    summary_path = os.path.join(job_dir, _shard_name('summary', shard, shards) + '.json')
+    with open(summary_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(totals, f)
+        f.write('\n')
+    os.replace(summary_path + '.tmp', summary_path)
+
+    summary = format_summary(totals['total_files'], totals['success_count'], totals['error_count'],
+                             totals['unchanged_count'])
+    logging.info(summary)
+    print(summary)
+    if progress is not None:
+        progress(RunSummary(totals['total_files'], totals['success_count'], totals['error_count'],
+                            totals['unchanged_count'], summary))
+    return totals
+
+
+def merge_job(job_dir, shards=1):
+    """
+    Combines the shard summaries of a job into one totals report.
+
+    Args:
+        job_dir (str): The job directory.
+        shards (int): The number of shards the job was split into.
+
+    Returns:
+        tuple: (totals dict, list of the shards that have not finished).
+    """
+    totals = {'total_files': 0, 'success_count': 0, 'error_count': 0, 'unchanged_count': 0}
+    finished = set()
+    for path in glob.glob(os.path.join(glob.escape(job_dir), _shard_name('summary', '*', shards) + '.json')):
+        with open(path, encoding='utf-8') as f:
+            shard_totals = json.load(f)
+        finished.add(shard_totals['shard'])
+        for key in totals:
+            totals[key] += shard_totals[key]
+    missing = [shard for shard in range(shards) if shard not in finished]
+
+    summary = format_summary(totals['total_files'], totals['success_count'], totals['error_count'],
+                             totals['unchanged_count'])
+    if missing:
+        summary += f"\nShards not finished: {', '.join(map(str, missing))}"
+    print(summary)
+    return totals, missing
+
+
+if __name__ == '__main__':
+    # The command line lives in exif_cli (`exif_cli.py batch`).
+    import sys
+    from exif_cli import main
+    sys.exit(main(['batch'] + sys.argv[1:]))
@@ -1,20 +1,206 @@
 import os
-import argparse
+import re
+import stat
+import time
+from backup_journal import JOURNAL_SUFFIX, is_journal_file
+from backup_manifest import find_manifests, prune_registry, read_manifest_entries, write_manifest
+from discovery import FileFinder
+from progress import RunStarted, FileDone, FileSkipped, FileError, RunSummary
 
-def cleanup_backups(directory):
+_AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_age(text):
+    """
+    Parses an age such as '30' (days), '12h' or '2w' into seconds.
+
+    Raises:
+        ValueError: If the text is not a number with an optional s/m/h/d/w unit.
     """
-    Removes all files with a .bak extension from a directory.
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', text.lower())
+    if not match:
+        raise ValueError(f"Invalid age '{text}', expected e.g. 30, 12h or 2w.")
+    return float(match.group(1)) * _AGE_UNITS[match.group(2) or 'd']
+
+
+def _is_backup_name(name):
+    return name.endswith('.bak') or is_journal_file(name)
+
+
+class CleanupSummary:
+    """The counts of one cleanup run."""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.removed = 0
+        self.bytes_reclaimed = 0
+        self.kept = 0
+        self.missing = 0
+        self.failed = 0
+
+    @property
+    def total_files(self):
+        return self.removed + self.kept + self.missing + self.failed
+
+    def format_text(self):
+        verb = "Would remove" if self.dry_run else "Removed"
+        return (f"\n--- Cleanup Summary ---\n{verb}: {self.removed}\n"
+                f"Bytes reclaimed: {self.bytes_reclaimed}\n"
+                f"Kept: {self.kept}\nAlready gone: {self.missing}\nFailed: {self.failed}\n"
+                "-----------------------")
+
+
+def _remove(path, cutoff, dry_run, created=None):
+    """
+    Removes one backup file; returns (outcome, size, error message).
+
+    outcome is 'removed', 'kept', 'missing' or 'error'. Only regular files
+    are removed: a path that was replaced by a symlink or a directory since
+    the backup was made is kept. A backup keeps the modification time of
+    its image, so it is aged by created, the time its manifest recorded,
+    or else by the later of its modification and status change times.
+    """
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return 'missing', 0, None
+    except OSError as e:
+        return 'error', 0, str(e)
+    if created is None:
+        created = max(st.st_mtime, st.st_ctime)
+    if not stat.S_ISREG(st.st_mode) or (cutoff is not None and created > cutoff):
+        return 'kept', st.st_size, None
+    if not dry_run:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return 'missing', 0, None
+        except OSError as e:
+            return 'error', st.st_size, str(e)
+    return 'removed', st.st_size, None
+
+
+def _walk_backups(directory, journals):
+    finder = FileFinder(('.bak', JOURNAL_SUFFIX) if journals else ('.bak',))
+    # The finder matches suffixes case-insensitively; only remove the
+    # exact names the editor creates.
+    return [entry.path for entry in finder.scan(directory, whole_directories=True) if _is_backup_name(entry.name)]
+
+
+def cleanup_backups(directory, journals=True, older_than=None, dry_run=False, jobs=8, progress=None, walk=False):
+    """
+    Removes the backup files that process_directory created in a directory.
+
+    Every run that makes backups lists them in a manifest in the directory
+    it was started on (see backup_manifest). Cleanup reads the manifests
+    of the directory and the registered manifests of its subdirectories
+    and ancestors, and removes exactly the listed files that lie inside
+    the directory, so the tree is not walked and .bak files that were not
+    made by the editor are left alone. The removals run on jobs threads.
+    Manifests are rewritten without the files removed, and deleted once
+    they are empty; the registry then drops the deleted manifests.
 
     Args:
         directory (str): The path to the directory to clean up.
+        journals (bool): Also remove the EXIF backup journals.
+        older_than (float): Only remove backups made at least this many
+            seconds ago.
+        dry_run (bool): Only count what would be removed.
+        jobs (int): The number of files to remove in parallel.
+        progress (callable): Called with RunStarted, then FileDone (removed),
+            FileSkipped (kept or already gone) or FileError per file, then
+            RunSummary.
+        walk (bool): Remove every *.bak file (and journal) below the
+            directory, as older versions did, whether or not a manifest
+            lists it. The manifests are still updated.
+
+    Returns:
+        CleanupSummary: The counts, also printed.
     """
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.bak'):
-                os.remove(os.path.join(root, file))
+    # manifest path -> {listed backup path: time it was made}
+    manifests = {path: read_manifest_entries(path) for path in find_manifests(directory, subdirectories=True,
+                                                                              ancestors=True)}
+    created = {path: made for listed in manifests.values() for path, made in listed.items()}
+    if walk:
+        paths = _walk_backups(directory, journals)
+    else:
+        top = os.path.abspath(directory)
+        # A manifest of a parent directory also lists backups elsewhere.
+        paths = [path for path in created if os.path.commonpath([top, path]) == top]
+
+    summary = CleanupSummary(dry_run)
+    kept = set()
+    if progress is not None:
+        # Sizes are only known once each file is stat'ed by its worker.
+        progress(RunStarted(directory, len(paths), 0))
+
+    candidates = []
+    for path in paths:
+        name = os.path.basename(path)
+        if not _is_backup_name(name) or (not journals and is_journal_file(name)):
+            summary.kept += 1
+            kept.add(path)
+            if progress is not None:
+                progress(FileSkipped(path, 0))
+        else:
+            candidates.append(path)
+
+    cutoff = time.time() - older_than if older_than is not None else None
+    pool = None
+    if jobs > 1 and len(candidates) > 1:
+        # Imported here: it pulls in logging, which a small
+        # cleanup does not need (see exif_cli).
+        import concurrent.futures
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+    try:
+        if pool is not None:
+            results = pool.map(_remove, candidates, [cutoff] * len(candidates), [dry_run] * len(candidates),
+                               [created.get(path) for path in candidates])
+        else:
+            results = (_remove(path, cutoff, dry_run, created.get(path)) for path in candidates)
+        for path, (outcome, size, error) in zip(candidates, results):
+            if outcome == 'removed':
+                summary.removed += 1
+                summary.bytes_reclaimed += size
+                if progress is not None:
+                    progress(FileDone(path, size, []))
+            elif outcome == 'error':
+                summary.failed += 1
+                kept.add(path)
+                if progress is not None:
+                    progress(FileError(path, size, error))
+            else:
+                if outcome == 'missing':
+                    summary.missing += 1
+                else:
+                    summary.kept += 1
+                    kept.add(path)
+                if progress is not None:
+                    progress(FileSkipped(path, size))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    if not dry_run:
+        selected = set(paths)
+        for manifest_path, listed in manifests.items():
+            remaining = {path: made for path, made in listed.items() if path in kept or path not in selected}
+            if not remaining:
+                os.remove(manifest_path)
+            elif len(remaining) < len(listed):
+                write_manifest(manifest_path, remaining)
+        if manifests:
+            prune_registry()
+
+    text = summary.format_text()
+    print(text)
+    if progress is not None:
+        progress(RunSummary(summary.total_files, summary.removed, summary.failed, summary.kept, text))
+    return summary
+
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Clean up backup files (.bak) in a directory.')
-    parser.add_argument('directory', help='The directory to clean up.')
-    args = parser.parse_args()
-    cleanup_backups(args.directory)
+    # The command line lives in exif_cli (`exif_cli.py cleanup`).
+    import sys
+    from exif_cli import main
+    sys.exit(main(['cleanup'] + sys.argv[1:]))
@@ -0,0 +1,205 @@
+import os
+import re
+import fnmatch
+import collections
+
+# Values of the symlinks option: ignore symlinks entirely, yield symlinked
+# files but do not enter symlinked directories (what os.walk does), or
+# also walk into symlinked directories.
+SYMLINK_POLICIES = ('skip', 'files', 'follow')
+
+
+def _compile_globs(patterns):
+    """
+    Compiles glob patterns into (name matcher, path matcher); either is
+    None when no pattern of that kind is given.
+
+    Patterns containing '/' are matched against the path relative to the
+    scanned directory; the others against the entry name only.
+    """
+    patterns = [p.strip() for p in patterns if p and p.strip()]
+    if not patterns:
+        return None, None
+    by_name = [fnmatch.translate(p) for p in patterns if '/' not in p]
+    by_path = [fnmatch.translate(p.strip('/')) for p in patterns if '/' in p]
+    return (re.compile('|'.join(by_name)).match if by_name else None,
+            re.compile('|'.join(by_path)).match if by_path else None)
+
+
+def _glob_match(matchers, name, relative_path):
+    by_name, by_path = matchers
+    return bool((by_name and by_name(name)) or (by_path and by_path(relative_path)))
+
+
+class FileFinder:
+    """
+    Finds files below a directory with os.scandir.
+
+    Everything that can be worked out up front is compiled once: the
+    suffixes become one lowercase tuple for str.endswith, the globs become
+    one regex each. The walk uses the file types reported by scandir
+    (d_type), so no entry is stat'ed unless it is a symlink, and entries
+    are yielded as each directory is read.
+
+    Args:
+        suffixes (iterable): File name endings to accept, e.g. ['.jpg'].
+            Matched case-insensitively. None accepts every file.
+        include (iterable): Glob patterns a file must match (any of them).
+        exclude (iterable): Glob patterns of files and directories to skip.
+            An excluded directory is not entered.
+        max_depth (int): How many directory levels below the top to enter.
+            0 only lists the top directory; None has no limit.
+        symlinks (str): One of SYMLINK_POLICIES.
+        hidden (bool): Whether to yield dot files and enter dot directories.
+    """
+
+    def __init__(self, suffixes=None, include=(), exclude=(), max_depth=None, symlinks='files', hidden=True):
+        if symlinks not in SYMLINK_POLICIES:
+            raise ValueError(f"Unknown symlinks policy '{symlinks}', expected one of {', '.join(SYMLINK_POLICIES)}.")
+        if suffixes is not None:
+            suffixes = tuple(sorted({s.strip().lower() for s in suffixes if s.strip()}))
+        self.suffixes = suffixes
+        self.include = _compile_globs(include)
+        self.exclude = _compile_globs(exclude)
+        self.max_depth = max_depth
+        self.symlinks = symlinks
+        self.hidden = hidden
+
+    def accepts(self, name, relative_path):
+        """Whether a file with this name and relative path is yielded."""
+        if self.suffixes is not None and not name.lower().endswith(self.suffixes):
+            return False
+        if self.include[0] or self.include[1]:
+            if not _glob_match(self.include, name, relative_path):
+                return False
+        return not _glob_match(self.exclude, name, relative_path)
+
+    def matches_path(self, relative_path):
+        """
+        Whether a walk would yield the file at a path relative to the top.
+
+        Applies the same depth, hidden-file, exclude and file rules as
+        scan, for callers that learn about single files some other way
+        (e.g. file system notifications). Symlinks are not checked.
+        """
+        parts = relative_path.replace(os.sep, '/').split('/')
+        if self.max_depth is not None and len(parts) - 1 > self.max_depth:
+            return False
+        if not self.hidden and any(part.startswith('.') for part in parts):
+            return False
+        for depth in range(1, len(parts)):
+            if _glob_match(self.exclude, parts[depth - 1], '/'.join(parts[:depth])):
+                return False
+        return self.accepts(parts[-1], '/'.join(parts))
+
+    def scan(self, directory_path, onerror=None, whole_directories=False):
+        """
+        Yields an os.DirEntry for every accepted file below a directory.
+
+        Directories are walked top-down and depth-first, in the order the
+        file system lists them, like os.walk. entry.stat() is cached on
+        the entry, so callers that need it pay for at most one stat.
+
+        Args:
+            directory_path (str): The directory to walk.
+            onerror (callable): Called with the OSError of a directory that
+                cannot be read. By default such directories are skipped.
+            whole_directories (bool): Finish reading each directory before
+                yielding its files, as os.walk does. Callers that create or
+                rename files in the walked directories need this, since a
+                directory listing that changes while it is being read may
+                skip or repeat entries.
+
+        Yields:
+            os.DirEntry: The accepted files.
+        """
+        # (path, path relative to the top, depth)
+        stack = collections.deque([(directory_path, '', 0)])
+        visited = set()
+        if self.symlinks == 'follow':
+            try:
+                st = os.stat(directory_path)
+                visited.add((st.st_dev, st.st_ino))
+            except OSError:
+                pass
+
+        while stack:
+            path, relative, depth = stack.pop()
+            subdirectories = []
+            files = []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if not self.hidden and name.startswith('.'):
+                            continue
+                        entry_relative = f'{relative}/{name}' if relative else name
+                        try:
+                            is_symlink = entry.is_symlink()
+                            if entry.is_dir(follow_symlinks=False):
+                                if self._enter(entry, entry_relative, depth, visited):
+                                    subdirectories.append((entry.path, entry_relative, depth + 1))
+                                continue
+                            if is_symlink:
+                                if self.symlinks == 'skip':
+                                    continue
+                                if entry.is_dir():
+                                    if self.symlinks == 'follow' and self._enter(entry, entry_relative, depth, visited):
+                                        subdirectories.append((entry.path, entry_relative, depth + 1))
+                                    continue
+                                if not entry.is_file():
+                                    continue
+                            elif not entry.is_file(follow_symlinks=False):
+                                continue
+                        except OSError:
+                            # e.g. a dangling symlink or an entry removed meanwhile.
+                            continue
+                        if self.accepts(name, entry_relative):
+                            if whole_directories:
+                                files.append(entry)
+                            else:
+                                yield entry
+            except OSError as e:
+                if onerror is not None:
+                    onerror(e)
+                continue
+            yield from files
+            # Reversed so the first listed subdirectory is walked first.
+            stack.extend(reversed(subdirectories))
+
+    def _enter(self, entry, relative_path, depth, visited):
+        if self.max_depth is not None and depth >= self.max_depth:
+            return False
+        if _glob_match(self.exclude, entry.name, relative_path):
+            return False
+        if self.symlinks == 'follow':
+            # Guards against symlink loops and directories reached twice.
+            try:
+                st = entry.stat()
+            except OSError:
+                return False
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                return False
+            visited.add(key)
+        return True
+
+
+def as_finder(target_extensions):
+    """
+    Returns a FileFinder for target_extensions: a list of file endings,
+    or a finder, which is returned as it is.
+    """
+    if isinstance(target_extensions, FileFinder):
+        return target_extensions
+    return FileFinder(target_extensions)
+
+
+def iter_files(directory_path, suffixes=None, **options):
+    """
+    Yields the paths of the files below a directory.
+
+    A shortcut for FileFinder(suffixes, **options).scan(directory_path).
+    """
+    for entry in FileFinder(suffixes, **options).scan(directory_path):
+        yield entry.path
@@ -0,0 +1,125 @@
+import os
+import logging
+
+# How hard a tagging run works to keep its writes across a power loss:
+#   none       leave it to the OS (the fastest; a crash can lose any file
+#              written in the last few seconds, or its backup)
+#   per-file   each backup, journal record and image is flushed, and its
+#              directory synced, before the next step of the file
+#   per-batch  the files are flushed as with per-file, but the directories
+#              are synced in batches, once per directory per batch
+#   end        the files are flushed as with per-file, and the directories
+#              once, when the run finishes
+# With every policy but none, a backup or journal record is on disk before
+# the image it protects is overwritten, and a rewritten image is on disk
+# before it is renamed over the original. Only the directory syncs, which
+# make new backups and renames durable, are deferred.
+DURABILITY_POLICIES = ('none', 'per-file', 'per-batch', 'end')
+
+# Written files per batch of the per-batch policy.
+DEFAULT_BATCH_SIZE = 256
+
+
+def check_policy(policy):
+    """
+    Returns a valid durability policy.
+
+    Raises:
+        ValueError: If policy is not one of DURABILITY_POLICIES.
+    """
+    if policy not in DURABILITY_POLICIES:
+        raise ValueError(f"Unknown durability '{policy}', expected one of {', '.join(DURABILITY_POLICIES)}.")
+    return policy
+
+
+def fsync_file(path):
+    """Flushes a file's data to disk; it does not need to be open."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_directory(path):
+    """
+    Makes the entries created or renamed in a directory durable.
+
+    Does nothing on Windows, where directories cannot be opened and renames
+    are flushed with the file.
+    """
+    if os.name == 'nt':
+        return
+    fsync_file(path)
+
+
+class SyncBatch:
+    """
+    Groups the directory syncs of a tagging run according to its policy.
+
+    The workers flush the data of every file they write themselves (see
+    update_exif_file), so a file's backup is on disk before the file is
+    overwritten. What is left are the directory entries of new backups,
+    journals and renamed files. The caller adds each finished file with
+    the paths the run wrote for it (the image and its .bak backup). With
+    'per-batch', once batch_size written files are pending, each of their
+    directories is synced once. With 'end' this happens only in flush().
+    With 'none' nothing is synced, and with 'per-file' the workers have
+    already synced each directory, so add only reports that.
+
+    Args:
+        policy (str): One of DURABILITY_POLICIES.
+        batch_size (int): Written files per batch ('per-batch' only).
+
+    Raises:
+        ValueError: If policy is unknown.
+    """
+
+    def __init__(self, policy='none', batch_size=DEFAULT_BATCH_SIZE):
+        self.policy = check_policy(policy)
+        self.batch_size = max(1, batch_size)
+        self._directories = set()
+        self._written = 0
+        self.directories_synced = 0
+        self.flushes = 0
+
+    @property
+    def deferred(self):
+        """Whether flushes are left to this object rather than the workers."""
+        return self.policy in ('per-batch', 'end')
+
+    def add(self, paths=()):
+        """
+        Adds one finished file.
+
+        Args:
+            paths (iterable): The files written for it; none if it was
+                left unchanged or failed.
+
+        Returns:
+            bool: True if every file added so far is now as durable as the
+            policy makes it, e.g. to checkpoint them.
+        """
+        if not self.deferred:
+            return True
+        paths = tuple(paths)
+        if paths:
+            self._written += 1
+            for path in paths:
+                self._directories.add(os.path.dirname(os.path.abspath(path)))
+        if self.policy == 'per-batch' and self._written >= self.batch_size:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Syncs the directories of the pending files, once each."""
+        if not self.deferred or not self._written:
+            return
+        for directory in sorted(self._directories):
+            fsync_directory(directory)
+        logging.info(f"Synced {len(self._directories)} directories")
+        self.directories_synced += len(self._directories)
+        self.flushes += 1
+        self._directories = set()
+        self._written = 0
@@ -0,0 +1,607 @@
+import os
+import copy
+import struct
+import logging
+import tarfile
+import tempfile
+import zipfile
+import piexif
+from exif_reader import read_exif_tags_from
+from exif_record import RecordSchema, record_schema
+from exif_writer import build_segment, locate_exif
+from discovery import as_finder
+from durability import fsync_directory, fsync_file
+
+ZIP_SUFFIXES = ('.zip',)
+# Tar suffixes and the tarfile compression they stand for.
+TAR_SUFFIXES = {
+    '.tar': '',
+    '.tar.gz': 'gz',
+    '.tgz': 'gz',
+    '.tar.bz2': 'bz2',
+    '.tbz2': 'bz2',
+    '.tar.xz': 'xz',
+    '.txz': 'xz',
+}
+ARCHIVE_SUFFIXES = ZIP_SUFFIXES + tuple(TAR_SUFFIXES)
+
+# The most bytes of a member kept in memory while looking for its EXIF
+# segment. The segments before it are at most 64 KB each, so this covers
+# any real camera file; members that need more are reported as errors.
+HEAD_LIMIT = 1024 * 1024
+
+# A tagged ZIP member is built in memory up to this size, and in a temp
+# file beyond it.
+SPOOL_LIMIT = 16 * 1024 * 1024
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+_SOI = b'\xff\xd8'
+
+# ZIP local file header: signature, flag bits, then the name and extra
+# field lengths (see zipfile.structFileHeader).
+_ZIP_LOCAL_HEADER = struct.Struct('<4s2xH18xHH')
+_ZIP_LOCAL_SIGNATURE = b'PK\x03\x04'
+_ZIP_DATA_DESCRIPTOR = 0x08
+_ZIP64_EXTRA_ID = 0x0001
+_EXTRA_HEADER = struct.Struct('<HH')
+
+
+def _suffix(path):
+    lower = path.lower()
+    return next((suffix for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True) if lower.endswith(suffix)),
+                None)
+
+
+def is_archive(path):
+    """Whether a path is a ZIP or tar file the archive functions can read."""
+    return _suffix(path) is not None and os.path.isfile(path)
+
+
+def archive_output_path(archive_path):
+    """Returns the default output of tag_archive, e.g. 'photos-tagged.zip' for 'photos.zip'."""
+    split = len(archive_path) - len(_suffix(archive_path))
+    return f'{archive_path[:split]}-tagged{archive_path[split:]}'
+
+
+class HeadBuffer:
+    """
+    A seekable file over the start of a forward-only stream.
+
+    Bytes are read from the stream only as far as the reader seeks, and at
+    most limit of them are kept, so the EXIF reader and locate_exif can
+    walk a member's header segments without the member ever being held in
+    memory or extracted. reader() then continues the stream from any
+    buffered position.
+
+    Args:
+        stream: A binary stream with read(size), e.g. an archive member.
+        limit (int): The most bytes to buffer.
+    """
+
+    def __init__(self, stream, limit=HEAD_LIMIT):
+        self._stream = stream
+        self._limit = limit
+        self._buffer = bytearray()
+        self._position = 0
+        self._eof = False
+
+    def _fill(self, end):
+        while len(self._buffer) < end and not self._eof:
+            if len(self._buffer) >= self._limit:
+                raise ValueError(f"No EXIF segment within the first {self._limit} bytes.")
+            data = self._stream.read(min(end, self._limit) - len(self._buffer))
+            if data:
+                self._buffer += data
+            else:
+                self._eof = True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence != os.SEEK_SET:
+            raise ValueError("HeadBuffer only seeks from the start or the current position.")
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        end = self._limit + 1 if size is None or size < 0 else self._position + size
+        self._fill(end)
+        data = bytes(self._buffer[self._position:end])
+        self._position += len(data)
+        return data
+
+    def reader(self, offset=None, length=0, replacement=b''):
+        """
+        Returns a stream of the whole member, from its first byte on.
+
+        With offset, the length bytes at offset are replaced; they must lie
+        within the part already read.
+        """
+        if offset is None:
+            chunks = [bytes(self._buffer)]
+        else:
+            chunks = [bytes(self._buffer[:offset]), replacement, bytes(self._buffer[offset + length:])]
+        return _ChainReader(chunks, self._stream)
+
+
+class _ChainReader:
+    """Reads some byte strings, then the rest of a stream."""
+
+    def __init__(self, chunks, stream):
+        self._chunks = [chunk for chunk in chunks if chunk]
+        self._stream = stream
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return b''.join(self._chunks) + self._stream.read()
+        parts = []
+        while size > 0 and self._chunks:
+            chunk = self._chunks[0]
+            parts.append(chunk[:size])
+            if len(chunk) > size:
+                self._chunks[0] = chunk[size:]
+            else:
+                self._chunks.pop(0)
+            size -= len(parts[-1])
+        if size > 0:
+            parts.append(self._stream.read(size))
+        return b''.join(parts)
+
+
+def _open_tar(archive_path):
+    # Seekable mode: members of an uncompressed tar that are not read are
+    # skipped without reading their data.
+    return tarfile.open(archive_path, 'r:*')
+
+
+def _next_member(tar):
+    member = tar.next()
+    # tarfile keeps every TarInfo it has read; drop them so that memory
+    # does not grow with the number of members.
+    tar.members.clear()
+    return member
+
+
+class _UnreadableMember:
+    """Stands in for a ZIP member that cannot be opened (e.g. an encrypted one); reading it raises the error."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def read(self, size=-1):
+        raise self.error
+
+
+def _iter_members(archive_path, finder):
+    """Yields (member name, size, open member stream) for the accepted files of an archive, in archive order."""
+    if _suffix(archive_path) in ZIP_SUFFIXES:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not finder.matches_path(info.filename):
+                    continue
+                try:
+                    stream = archive.open(info)
+                except Exception as e:
+                    yield info.filename, info.file_size, _UnreadableMember(e)
+                    continue
+                with stream:
+                    yield info.filename, info.file_size, stream
+        return
+    with _open_tar(archive_path) as archive:
+        member = _next_member(archive)
+        while member is not None:
+            if member.isfile() and finder.matches_path(member.name):
+                yield member.name, member.size, archive.extractfile(member)
+            member = _next_member(archive)
+
+
+def count_archive_members(archive_path, target_extensions, where=None):
+    """
+    Returns (number, total size) of the accepted files of an archive, for
+    progress totals.
+
+    With where (an exif_filter.ExifFilter), only the members it matches
+    are counted, which takes reading the head of each member.
+    """
+    finder = as_finder(target_extensions)
+    count = size = 0
+    if where is not None:
+        for name, member_size, stream in _iter_members(archive_path, finder):
+            if _member_matches(HeadBuffer(stream), where):
+                count += 1
+                size += member_size
+        return count, size
+    if _suffix(archive_path) in ZIP_SUFFIXES:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and finder.matches_path(info.filename):
+                    count += 1
+                    size += info.file_size
+        return count, size
+    with _open_tar(archive_path) as archive:
+        member = _next_member(archive)
+        while member is not None:
+            if member.isfile() and finder.matches_path(member.name):
+                count += 1
+                size += member.size
+            member = _next_member(archive)
+    return count, size
+
+
+def _member_matches(head, where):
+    """Whether the member behind a HeadBuffer matches a filter; rewinds it."""
+    try:
+        return read_exif_tags_from(head, where.tags, where=where) is not None
+    except Exception:
+        return False
+    finally:
+        head.seek(0)
+
+
+def iter_archive_summary(archive_path, target_extensions, fields=None, with_paths=False, where=None):
+    """
+    Yields a summary record for each image inside a ZIP or tar archive.
+
+    Members are read as streams, in archive order, and only up to the end
+    of their EXIF segment; nothing is extracted to disk. Member paths are
+    given as archive_path joined with the member name.
+
+    Args:
+        archive_path (str): The archive.
+        target_extensions (list or FileFinder): Selects the members, by
+            their path inside the archive.
+        fields (iterable or RecordSchema): The fields of the records.
+        with_paths (bool): Yield (member path, record) pairs.
+        where (ExifFilter): Optional filter; members it rejects, or that
+            cannot be read, are skipped (see exif_editor.summarize_file).
+
+    Yields:
+        ExifRecord: The summary record of one member.
+    """
+    schema = fields if isinstance(fields, RecordSchema) else record_schema(fields)
+    for name, _, stream in _iter_members(archive_path, as_finder(target_extensions)):
+        image_path = os.path.join(archive_path, name)
+        try:
+            tags = read_exif_tags_from(HeadBuffer(stream), schema.tags, where=where)
+            if tags is None:
+                continue
+            record = schema.record(os.path.basename(name), tags)
+        except Exception as e:
+            logging.warning(f"Could not read EXIF from {image_path}: {e}")
+            if where is not None:
+                continue
+            record = schema.failed(os.path.basename(name))
+        yield (image_path, record) if with_paths else record
+
+
+def _retag_member(stream, plan, where=None):
+    """
+    Works out the new EXIF segment of one member.
+
+    Returns:
+        tuple: (status, changes, error message or None, reader of the
+        member to write, change in size). status is None if where rejects
+        the member. The reader streams the original member if it is
+        unchanged, failed or rejected.
+    """
+    head = HeadBuffer(stream)
+    if where is not None and not _member_matches(head, where):
+        return None, [], None, head.reader(), 0
+    try:
+        if head.read(2) != _SOI:
+            raise ValueError("Only JPEG files can be tagged inside an archive.")
+        head.seek(0)
+        location = locate_exif(head)
+        exif_bytes = location.exif_bytes
+        if exif_bytes is None:
+            exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+        else:
+            exif_dict = piexif.load(exif_bytes)
+        changes = plan.apply(exif_dict)
+        if not changes:
+            return 'unchanged', changes, None, head.reader(), 0
+        segment = build_segment(piexif.dump(exif_dict))
+    except Exception as e:
+        return 'error', [], str(e), head.reader(), 0
+    return 'written', changes, None, head.reader(location.offset, location.length, segment), \
+        len(segment) - location.length
+
+
+def _copy_stream(reader, out):
+    while True:
+        data = reader.read(_COPY_CHUNK_SIZE)
+        if not data:
+            return
+        out.write(data)
+
+
+def _without_zip64_extra(extra):
+    """Drops the ZIP64 field from a member's extra data; it is written anew with the member's sizes."""
+    fields = []
+    position = 0
+    while position + _EXTRA_HEADER.size <= len(extra):
+        field_id, length = _EXTRA_HEADER.unpack_from(extra, position)
+        end = position + _EXTRA_HEADER.size + length
+        if field_id != _ZIP64_EXTRA_ID:
+            fields.append(extra[position:end])
+        position = end
+    return b''.join(fields)
+
+
+class _RawZipWriter:
+    """
+    Writes a ZIP file from the compressed bytes of members of other ZIPs.
+
+    zipfile can only add a member by compressing its data, so copying an
+    unchanged member with it means decompressing and compressing it again.
+    Here each member's local header is written from its ZipInfo (with its
+    CRC and sizes), its compressed bytes are copied as they are, and the
+    central directory is written by close(). Members that zipfile cannot
+    decompress, e.g. encrypted ones, are copied all the same.
+
+    Args:
+        out: The binary file to write, positioned at its start.
+    """
+
+    def __init__(self, out):
+        self._out = out
+        # (ZipInfo, local header offset, encoded name, flag bits)
+        self._members = []
+
+    def copy(self, raw, info):
+        """
+        Appends a member.
+
+        Args:
+            raw: The ZIP file the member is in, opened in binary mode.
+            info (ZipInfo): The member, from the central directory of raw.
+
+        Raises:
+            zipfile.BadZipFile: If the member's local header or data is
+                missing from raw.
+        """
+        raw.seek(info.header_offset)
+        signature, _, name_length, extra_length = _ZIP_LOCAL_HEADER.unpack(raw.read(_ZIP_LOCAL_HEADER.size))
+        if signature != _ZIP_LOCAL_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+        raw.seek(name_length + extra_length, os.SEEK_CUR)
+
+        member = copy.copy(info)
+        # The sizes and CRC go in the local header, so no data descriptor follows.
+        member.flag_bits &= ~_ZIP_DATA_DESCRIPTOR
+        member.extra = _without_zip64_extra(info.extra)
+        offset = self._out.tell()
+        header = member.FileHeader()
+        _, flag_bits, name_length, _ = _ZIP_LOCAL_HEADER.unpack_from(header)
+        self._out.write(header)
+        remaining = info.compress_size
+        while remaining:
+            data = raw.read(min(_COPY_CHUNK_SIZE, remaining))
+            if not data:
+                raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+            self._out.write(data)
+            remaining -= len(data)
+        name = header[_ZIP_LOCAL_HEADER.size:_ZIP_LOCAL_HEADER.size + name_length]
+        self._members.append((member, offset, name, flag_bits))
+
+    def close(self):
+        """Writes the central directory and the end records (ZIP64 ones where needed)."""
+        start = self._out.tell()
+        for member, offset, name, flag_bits in self._members:
+            dt = member.date_time
+            dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+            dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+            zip64 = []
+            file_size, compress_size = member.file_size, member.compress_size
+            if file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT:
+                zip64 += [file_size, compress_size]
+                file_size = compress_size = 0xffffffff
+            if offset > zipfile.ZIP64_LIMIT:
+                zip64.append(offset)
+                offset = 0xffffffff
+            extra = member.extra
+            if zip64:
+                extra = struct.pack(f'<HH{len(zip64)}Q', _ZIP64_EXTRA_ID, 8 * len(zip64), *zip64) + extra
+            self._out.write(struct.pack(
+                zipfile.structCentralDir, zipfile.stringCentralDir, member.create_version, member.create_system,
+                member.extract_version, member.reserved, flag_bits, member.compress_type, dostime, dosdate,
+                member.CRC, compress_size, file_size, len(name), len(extra), len(member.comment), 0,
+                member.internal_attr, member.external_attr, offset))
+            self._out.write(name + extra + member.comment)
+
+        end = self._out.tell()
+        count, size, start_offset = len(self._members), end - start, start
+        if count > zipfile.ZIP_FILECOUNT_LIMIT or start > zipfile.ZIP64_LIMIT or size > zipfile.ZIP64_LIMIT:
+            self._out.write(struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64,
+                                        44, 45, 45, 0, 0, count, count, size, start))
+            self._out.write(struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator,
+                                        0, end, 1))
+            count, size, start_offset = min(count, 0xffff), min(size, 0xffffffff), min(start, 0xffffffff)
+        self._out.write(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive,
+                                    0, 0, count, count, size, start_offset, 0))
+
+
+def _build_zip_member(info, reader, file_size):
+    """
+    Compresses a tagged member into a ZIP of its own, in a spooled temp
+    file, so that nothing of it reaches the copy unless all of it was read.
+
+    Returns:
+        tuple: (the spooled file, the member's ZipInfo in it).
+
+    Raises:
+        Exception: Whatever reading the member raised, or ValueError if
+            it came out at a different size than file_size.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_LIMIT)
+    try:
+        new_info = copy.copy(info)
+        new_info.file_size = file_size
+        new_info.extra = _without_zip64_extra(info.extra)
+        with zipfile.ZipFile(spool, 'w') as member_zip:
+            with member_zip.open(new_info, 'w') as out:
+                _copy_stream(reader, out)
+            built, = member_zip.infolist()
+        if built.file_size != file_size:
+            raise ValueError(f"Read {built.file_size} of {file_size} bytes.")
+    except BaseException:
+        spool.close()
+        raise
+    return spool, built
+
+
+def _member_failed(image_path, e):
+    logging.error(f"Could not read {image_path}: {e}")
+    return 'error', [], str(e), None, 0
+
+
+def _tag_zip(archive_path, output, plan_for, finder, where, dry_run):
+    with zipfile.ZipFile(archive_path) as source, open(archive_path, 'rb') as raw:
+        out = None if dry_run else open(output, 'wb')
+        target = None if out is None else _RawZipWriter(out)
+        try:
+            for info in source.infolist():
+                name = info.filename
+                image_path = os.path.join(archive_path, name)
+                if info.is_dir() or not finder.matches_path(name):
+                    # Copied without being decompressed, so even members
+                    # zipfile cannot read are kept as they are.
+                    if target is not None:
+                        target.copy(raw, info)
+                    continue
+                built = None
+                try:
+                    with source.open(info) as stream:
+                        status, changes, error, reader, growth = _retag_member(stream, plan_for(image_path), where)
+                        if status == 'written' and target is not None:
+                            built = _build_zip_member(info, reader, info.file_size + growth)
+                except Exception as e:
+                    # e.g. an encrypted member, or one whose data or CRC is
+                    # damaged. It is copied as it was.
+                    status, changes, error, _, _ = _member_failed(image_path, e)
+                if target is not None:
+                    if built is not None:
+                        spool, built_info = built
+                        with spool:
+                            target.copy(spool, built_info)
+                    else:
+                        target.copy(raw, info)
+                if status is None:
+                    continue
+                yield image_path, ('planned' if dry_run and status == 'written' else status, changes, None, error,
+                                   None)
+            if target is not None:
+                target.close()
+        finally:
+            if out is not None:
+                out.close()
+
+
+def _tag_tar(archive_path, output, plan_for, finder, where, dry_run):
+    compression = TAR_SUFFIXES.get(_suffix(output) if output else '.tar', '')
+    with _open_tar(archive_path) as source:
+        target = None if dry_run else tarfile.open(output, f'w:{compression}' if compression else 'w',
+                                                     format=tarfile.PAX_FORMAT)
+        try:
+            member = _next_member(source)
+            while member is not None:
+                image_path = os.path.join(archive_path, member.name)
+                if not member.isfile() or not finder.matches_path(member.name):
+                    if target is not None:
+                        target.addfile(member, source.extractfile(member) if member.isfile() else None)
+                    member = _next_member(source)
+                    continue
+                try:
+                    status, changes, error, reader, growth = _retag_member(source.extractfile(member),
+                                                                           plan_for(image_path), where)
+                except Exception as e:
+                    # Left out of the copy: nothing of it was written yet.
+                    status, changes, error, reader, growth = _member_failed(image_path, e)
+                if target is not None and reader is not None:
+                    new_member = copy.copy(member)
+                    new_member.size = member.size + growth
+                    target.addfile(new_member, reader)
+                member = _next_member(source)
+                if status is None:
+                    continue
+                yield image_path, ('planned' if dry_run and status == 'written' else status, changes, None, error,
+                                   None)
+        finally:
+            if target is not None:
+                target.close()
+
+
+def tag_archive(archive_path, output_path, plan, target_extensions, dry_run=False, fsync=False, where=None):
+    """
+    Writes a copy of a ZIP or tar archive with its images tagged.
+
+    The archive is read member by member and the copy is written as it
+    goes, so memory stays bounded however large the archive is: of each
+    image only the head up to its EXIF segment is held, and the rest is
+    streamed through. Images whose tags already match and all other
+    members are copied unchanged; in a ZIP their compressed bytes are
+    copied as they are, and a tagged member is compressed again with its
+    original method. A tar copy is compressed like output_path's suffix
+    says (e.g. .tar.gz).
+
+    The copy is written to a temp file next to output_path and renamed
+    over it only once complete. The source archive is never changed, so
+    no backups are made.
+
+    Args:
+        archive_path (str): The archive to read.
+        output_path (str): Where to write the tagged copy (see
+            archive_output_path).
+        plan (TagPlan or callable): The tags to write, or a function that
+            returns the TagPlan for a member path (archive_path joined with
+            the member name).
+        target_extensions (list or FileFinder): Selects the members to tag.
+        dry_run (bool): Only work out the changes; no copy is written.
+        fsync (bool): Flush the copy to disk before it is renamed, and its
+            directory after.
+        where (ExifFilter): Optional filter; members it rejects are copied
+            unchanged and not yielded.
+
+    Yields:
+        tuple: (member path, result), in archive order, like
+        exif_editor.tag_paths. result is (status, changes, None, error
+        message or None, None); status is 'written', 'unchanged', 'planned'
+        (dry run) or 'error'. Only the selected members are yielded. A
+        member whose tags could not be worked out is copied unchanged. A
+        selected ZIP member that cannot be read (e.g. it is encrypted or
+        damaged) is logged, yielded as 'error' and copied as it was; an
+        unreadable tar member is left out of the copy. Other members are
+        copied without being read in a ZIP.
+
+    Raises:
+        ValueError: If the input is not a supported archive.
+        zipfile.BadZipFile: If a ZIP member's data is missing; no copy is
+            written then.
+    """
+    if _suffix(archive_path) is None:
+        raise ValueError(f"{archive_path} is not a ZIP or tar archive.")
+    plan_for = plan if callable(plan) else (lambda image_path: plan)
+    finder = as_finder(target_extensions)
+    tag = _tag_zip if _suffix(archive_path) in ZIP_SUFFIXES else _tag_tar
+    if dry_run:
+        yield from tag(archive_path, None, plan_for, finder, where, True)
+        return
+
+    directory, name = os.path.split(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix=_suffix(output_path) or '.tmp', dir=directory)
+    os.close(fd)
+    try:
+        yield from tag(archive_path, temp_path, plan_for, finder, where, False)
+        if fsync:
+            fsync_file(temp_path)
+        os.replace(temp_path, output_path)
+        if fsync:
+            fsync_directory(directory)
+    except BaseException:
+        # Also reached when the caller stops early.
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
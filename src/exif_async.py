@@ -0,0 +1,229 @@
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import os
+from discovery import as_finder
+from exif_editor import summarize_file, tag_file, as_plan, written_paths
+from exif_record import record_schema
+from profiler import NULL_PROFILER
+from durability import SyncBatch
+
+# Paths fetched from the directory walk per executor call.
+_WALK_BATCH = 256
+
+
+class _ManagedExecutor:
+    """Uses the caller's executor, or owns a thread pool for one call."""
+
+    def __init__(self, executor, workers):
+        self.owned = executor is None
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers or min(32, (os.cpu_count() or 1) + 4))
+
+    def shutdown(self):
+        if self.owned:
+            # The running file operations have finished by now (see _drain).
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(executor, fn, *args):
+    """Submits fn to executor; returns (concurrent future, awaitable)."""
+    future = executor.submit(fn, *args)
+    return future, asyncio.wrap_future(future)
+
+
+async def _drain(futures):
+    """
+    Waits for the file operations that already started.
+
+    A thread cannot be interrupted, so on cancellation the files being
+    worked on are allowed to finish; this keeps every file either fully
+    written or untouched. Operations that did not start are cancelled.
+
+    Args:
+        futures (list): concurrent.futures.Future objects. The asyncio
+            wrappers cannot be used here: cancelling one reports success
+            even when the operation behind it is still running.
+    """
+    started = [future for future in futures if not future.cancel()]
+    if started:
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in started), return_exceptions=True)
+
+
+async def _iter_paths(directory_path, target_extensions):
+    # The walk gets its own thread, so a process pool can be used for the
+    # files and the file workers are never blocked behind a slow listing.
+    walker = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    entries = as_finder(target_extensions).scan(directory_path)
+    future = None
+    try:
+        while True:
+            future, batch = _submit(walker, lambda: [entry.path for entry in itertools.islice(entries, _WALK_BATCH)])
+            batch = await batch
+            if not batch:
+                return
+            for path in batch:
+                yield path
+    finally:
+        if future is not None:
+            await _drain([future])
+        entries.close()
+        walker.shutdown(wait=False)
+
+
+async def scan_directory(directory_path, target_extensions, concurrency=16, executor=None, workers=None,
+                         with_paths=False, fields=None):
+    """
+    Scans a directory for images and yields a summary record for each one.
+
+    The async counterpart of iter_exif_summary:
+
+        async for record in scan_directory('/photos', ['.jpg']):
+            ...
+
+    The walk and the EXIF reads run in an executor. At most concurrency
+    files are in flight; when the consumer stops pulling records, no new
+    files are started (backpressure). Records come in walk order.
+
+    Args:
+        directory_path (str): The path to the directory to scan.
+        target_extensions (list or FileFinder): The files to include.
+        concurrency (int): The maximum number of files in flight.
+        executor (concurrent.futures.Executor): The executor for the EXIF
+            reads; a thread or process pool. By default a thread pool is
+            created for the scan. The walk always runs in its own thread.
+        workers (int): Threads of the default executor. More files than
+            threads can be in flight; the rest wait in the executor.
+        with_paths (bool): Yield (image path, record) pairs.
+        fields (iterable): The fields of the records (see
+            exif_record.record_schema).
+
+    Yields:
+        ExifRecord: The summary record for one file (see summarize_file).
+    """
+    schema = record_schema(fields)
+    managed = _ManagedExecutor(executor, workers)
+    pending = collections.deque()
+    paths = _iter_paths(directory_path, target_extensions)
+    try:
+        async for image_path in paths:
+            pending.append((image_path, *_submit(managed.executor, summarize_file, image_path, NULL_PROFILER, schema)))
+            if len(pending) >= concurrency:
+                image_path, _, record = pending.popleft()
+                record = await record
+                yield (image_path, record) if with_paths else record
+        while pending:
+            image_path, _, record = pending.popleft()
+            record = await record
+            yield (image_path, record) if with_paths else record
+    finally:
+        # Also reached when the consumer breaks out early or is cancelled.
+        await paths.aclose()
+        await _drain([future for _, future, _ in pending])
+        managed.shutdown()
+
+
+async def _aiter(paths):
+    if hasattr(paths, '__aiter__'):
+        async for path in paths:
+            yield path
+    else:
+        for path in paths:
+            yield path
+
+
+async def tag_files(paths, plan, concurrency=16, backup_mode=None, journal=None, dry_run=False, executor=None,
+                    workers=None, on_result=None, manifest=None, durability='none'):
+    """
+    Tags files with a plan, at most concurrency at a time.
+
+    The async counterpart of process_directory's per-file work:
+
+        plan = compile_plan(config['EXIF'])
+        counts = await tag_files(paths, plan, backup_mode='copy', on_result=print)
+
+    paths may be a regular or an async iterable (e.g. scan_directory with
+    with_paths=True feeding a generator); it is consumed only as fast as
+    files finish, so a long path source is never read ahead.
+
+    When the awaiting task is cancelled, no new files are started, the
+    files already being written are finished, and CancelledError is
+    raised. A file is never left half-written.
+
+    durability works as in process_directory. With 'per-batch' and 'end'
+    the flushes run on a thread of their own, in order, so the event loop
+    is not blocked; the call returns once the last flush has finished.
+
+    Args:
+        paths (iterable or async iterable): The image paths.
+        plan (TagPlan or ConfigParser): The tags to write.
+        concurrency (int): The maximum number of files in flight.
+        backup_mode (str): None, or one of BACKUP_MODES.
+        journal (BackupJournal): The journal for backup_mode 'journal'.
+        dry_run (bool): Only work out the changes.
+        executor (concurrent.futures.Executor): The executor for blocking
+            I/O. By default a thread pool is created for the call.
+        workers (int): Threads of the default executor.
+        on_result (callable): Called with (path, status, changes, error
+            message or None) for each file as it completes. Results are
+            not kept, so a long run uses constant memory.
+        manifest (BackupManifest): Lists the backups made, for cleanup.
+        durability (str): One of durability.DURABILITY_POLICIES.
+
+    Returns:
+        collections.Counter: The number of files per status: 'written',
+        'unchanged', 'planned' or 'error'.
+    """
+    plan = as_plan(plan)
+    sync = SyncBatch(durability)
+    managed = _ManagedExecutor(executor, workers)
+    counts = collections.Counter()
+    # One thread, so the batch sees its adds and the final flush in order.
+    syncer = concurrent.futures.ThreadPoolExecutor(max_workers=1) if sync.deferred else None
+    # asyncio wrapper -> (path, concurrent future)
+    running = {}
+    source = _aiter(paths)
+
+    def start(image_path):
+        future, waiter = _submit(managed.executor, tag_file, image_path, plan, backup_mode, False, journal, dry_run,
+                                 False, manifest, durability)
+        running[waiter] = (image_path, future)
+
+    def finish(waiter):
+        image_path, _ = running.pop(waiter)
+        try:
+            status, changes, _, error, _ = waiter.result()
+        except Exception as e:
+            status, changes, error = 'error', [], str(e)
+        counts[status] += 1
+        if status == 'written' and syncer is not None:
+            syncer.submit(sync.add, written_paths(image_path, backup_mode))
+        if on_result is not None:
+            on_result((image_path, status, changes, error))
+
+    try:
+        async for image_path in source:
+            if len(running) >= concurrency:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in done:
+                    finish(waiter)
+            start(image_path)
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in done:
+                finish(waiter)
+    finally:
+        await source.aclose()
+        await _drain([future for _, future in running.values()])
+        managed.shutdown()
+        if syncer is not None:
+            # Files finished while cancelling are flushed as well.
+            for image_path, future in running.values():
+                if not future.cancelled() and future.exception() is None and future.result()[0] == 'written':
+                    syncer.submit(sync.add, written_paths(image_path, backup_mode))
+            try:
+                await asyncio.wrap_future(syncer.submit(sync.flush))
+            finally:
+                syncer.shutdown(wait=False)
+    return counts
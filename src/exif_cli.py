@@ -0,0 +1,328 @@
+import os
+import sys
+import argparse
+
+# Only the modules above are imported at startup. Each subcommand imports
+# its backend (piexif, the editor, tkinter, ...) in its handler, so
+# `--help` and light commands such as cleanup do not pay for the others.
+
+_CONFIG_PATH = 'config/config.ini'
+
+
+def _where(args, parser):
+    """Compiles the --where expressions of a command; None if there are none."""
+    if not args.where:
+        return None
+    from exif_filter import parse_where
+
+    try:
+        return parse_where(args.where)
+    except ValueError as e:
+        parser.error(f"argument --where: {e}")
+
+
+def _scan(args, parser):
+    from query_exif_cli import DEFAULT_FIELDS, parse_fields, query_directory_exif
+    from scan_index import ScanIndex
+    from profiler import Profiler, emit_report
+
+    try:
+        fields = parse_fields(args.fields) if args.fields else DEFAULT_FIELDS
+    except argparse.ArgumentTypeError as e:
+        parser.error(f"argument --fields: {e}")
+    where = _where(args, parser)
+    if args.limit is not None and args.limit < 1:
+        parser.error("argument --limit: must be at least 1")
+    profile = Profiler() if args.profile else None
+    try:
+        if args.no_cache:
+            count = query_directory_exif(args.directory, args.config, jobs=args.jobs, profile=profile,
+                                         output_format=args.format, fields=fields, where=where, limit=args.limit)
+        else:
+            with ScanIndex(args.cache_path) as index:
+                if args.rebuild_cache:
+                    index.clear(args.directory)
+                count = query_directory_exif(args.directory, args.config, jobs=args.jobs, index=index,
+                                             profile=profile, output_format=args.format, fields=fields,
+                                             where=where, limit=args.limit)
+        if profile is not None:
+            emit_report(profile, args.profile, sys.stdout if args.format == 'table' else sys.stderr)
+    except BrokenPipeError:
+        # The reader (e.g. head) closed the pipe; stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0 if count is not None else 1
+
+
+def _tag(args, parser):
+    from exif_editor import process_directory
+    from scan_index import ScanIndex
+    from profiler import Profiler, emit_report
+
+    where = _where(args, parser)
+    profile = Profiler() if args.profile else None
+    if args.no_cache:
+        summary = process_directory(args.directory, args.config, jobs=args.jobs, executor=args.executor,
+                                    dry_run=args.dry_run, profile=profile, mapping=args.mapping,
+                                    durability=args.durability, output_path=args.output, where=where)
+    else:
+        with ScanIndex(args.cache_path) as index:
+            summary = process_directory(args.directory, args.config, index=index, jobs=args.jobs,
+                                        executor=args.executor, dry_run=args.dry_run, profile=profile,
+                                        mapping=args.mapping, durability=args.durability, output_path=args.output,
+                                        where=where)
+    if profile is not None:
+        emit_report(profile, args.profile)
+    return 0 if summary is not None and not summary.error_count else 1
+
+
+def _cleanup(args, parser):
+    from cleanup_backups import cleanup_backups, parse_age
+
+    try:
+        older_than = parse_age(args.older_than) if args.older_than is not None else None
+    except ValueError as e:
+        parser.error(f"argument --older-than: {e}")
+    cleanup_backups(args.directory, journals=not args.keep_journals, older_than=older_than,
+                    dry_run=args.dry_run, jobs=args.jobs, walk=args.walk)
+    return 0
+
+
+def _watch(args, parser):
+    from watch import DirectoryWatch
+
+    where = _where(args, parser)
+    try:
+        watch = DirectoryWatch(args.directory, args.config, args.state, settle=args.settle, polling=args.polling,
+                               interval=args.interval, jobs=args.jobs, where=where, durability=args.durability)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    watch.run()
+    return 0
+
+
+def _batch(args, parser):
+    from batch_job import create_job, run_job, merge_job
+
+    try:
+        if args.batch_command == 'create':
+            print(f"Listed {create_job(args.job, args.directory, args.config)} files in {args.job}")
+        elif args.batch_command == 'run':
+            totals = run_job(args.job, args.shard, args.shards, resume=args.resume, jobs=args.jobs,
+                             executor=args.executor, directory_path=args.directory, durability=args.durability)
+            return 1 if totals['error_count'] else 0
+        else:
+            _, missing = merge_job(args.job, args.shards)
+            return 1 if missing else 0
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _restore(args, parser):
+    from backup_journal import find_journals, read_journal, restore
+
+    if args.list:
+        for journal_path in find_journals(args.directory, args.run):
+            print(f"{journal_path}: {sum(1 for _ in read_journal(journal_path))} files")
+        return 0
+    restored, failed = restore(args.directory, args.run)
+    print(f"Restored: {restored}\nFailed: {failed}")
+    return 1 if failed else 0
+
+
+def _report(args, parser):
+    from exif_report import DEFAULT_GROUP_BY, parse_columns, report_directory
+    from scan_index import ScanIndex
+
+    try:
+        group_by = parse_columns(args.group_by) if args.group_by else DEFAULT_GROUP_BY
+        missing = parse_columns(args.missing) if args.missing else None
+    except argparse.ArgumentTypeError as e:
+        parser.error(f"argument --group-by/--missing: {e}")
+    if args.no_cache:
+        report = report_directory(args.directory, args.config, group_by, missing, args.format, jobs=args.jobs)
+    else:
+        with ScanIndex(args.cache_path) as index:
+            report = report_directory(args.directory, args.config, group_by, missing, args.format, jobs=args.jobs,
+                                      index=index)
+    return 0 if report is not None else 1
+
+
+def _gui(args, parser):
+    from gui import ExifEditorGUI
+
+    ExifEditorGUI().mainloop()
+    return 0
+
+
+def build_parser():
+    """
+    Returns the parser of the command line and its subcommands.
+
+    Each subcommand parser has a handler default: a function of (args,
+    subcommand parser) that imports what it needs and returns the exit
+    status. Arguments whose checks need a backend (e.g. --fields, which
+    looks up EXIF tag names) are parsed as text and checked by the handler.
+    """
+    parser = argparse.ArgumentParser(description='Scan, tag and clean up the EXIF data of images.')
+    parser.add_argument('--log-file', default=None, metavar='PATH',
+                        help='Append a log of the run to PATH. Without it, only warnings are shown, on stderr.')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+
+    scan = commands.add_parser('scan', help='List the EXIF summary of the images in a directory.',
+                               description='查詢目錄中圖片的 EXIF 資訊摘要。')
+    scan.add_argument('directory', help='包含圖片的目錄路徑，或 ZIP / tar 壓縮檔')
+    scan.add_argument('--config', default=_CONFIG_PATH, help='設定檔的路徑')
+    scan.add_argument('--jobs', type=int, default=1, help='同時解析的檔案數量')
+    scan.add_argument('--no-cache', action='store_true', help='不使用掃描索引，重新解析所有檔案')
+    scan.add_argument('--rebuild-cache', action='store_true', help='清除此目錄的掃描索引後重新建立')
+    scan.add_argument('--cache-path', default=None, help='掃描索引檔案的路徑')
+    scan.add_argument('--format', choices=('table', 'ndjson', 'csv'), default='table',
+                      help='輸出格式；ndjson 與 csv 會在解析每個檔案後立即輸出一行')
+    scan.add_argument('--fields', default=None,
+                      help='以逗號分隔的輸出欄位（可用：path、filename、make、model、lens_model 或任何 EXIF 標籤名稱；'
+                           '預設：path,make,model,lens_model）')
+    scan.add_argument('--where', action='append', default=[], metavar='EXPR',
+                      help='只列出符合條件的檔案，可重複指定（須全部符合）：make=Canon、model^=EOS、'
+                           'lens_model~=(?i)macro、fnumber!=28/10、missing=lensmodel、present=gpslatitude')
+    scan.add_argument('--limit', type=int, default=None, metavar='N', help='列出 N 個檔案後即停止掃描')
+    scan.add_argument('--profile', nargs='?', const='-', default=None, metavar='PATH',
+                      help='輸出各階段的時間、讀取量與最慢的檔案；指定 PATH 則寫入檔案（.json 結尾為 JSON）')
+    scan.set_defaults(handler=_scan, command_parser=scan)
+
+    tag = commands.add_parser('tag', help='Add EXIF tags to the images in a directory.',
+                              description='Add EXIF tags to images in a directory.')
+    tag.add_argument('directory', help='The directory (or ZIP / tar archive) containing the images to process.')
+    tag.add_argument('--config', default=_CONFIG_PATH, help='The path to the config file.')
+    tag.add_argument('--no-cache', action='store_true', help='Do not update the scan index.')
+    tag.add_argument('--cache-path', default=None, help='The path to the scan index file.')
+    tag.add_argument('--jobs', type=int, default=1, help='The number of files to process in parallel.')
+    tag.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                     help='Run the parallel workers as threads or processes.')
+    tag.add_argument('--dry-run', action='store_true', help='List the planned changes without writing.')
+    tag.add_argument('--durability', choices=('none', 'per-file', 'per-batch', 'end'), default=None,
+                     help="How the written files and backups are flushed to disk (default: the config's, or none).")
+    tag.add_argument('--output', default=None, metavar='PATH',
+                     help="When DIRECTORY is a ZIP or tar archive, where to write the tagged copy "
+                          "(default: the archive name with '-tagged' added).")
+    tag.add_argument('--mapping', default=None, metavar='PATH',
+                     help='A CSV or JSON lines file of per-file tag values, keyed by relative path or glob.')
+    tag.add_argument('--where', action='append', default=[], metavar='EXPR',
+                     help='Only tag the files that match, e.g. missing=model or make=Canon. '
+                          'May be repeated; a file must match all of them.')
+    tag.add_argument('--profile', nargs='?', const='-', default=None, metavar='PATH',
+                     help='Report time and bytes per phase and the slowest files. '
+                          'Printed, or written to PATH (JSON if it ends in .json).')
+    tag.set_defaults(handler=_tag, command_parser=tag)
+
+    cleanup = commands.add_parser('cleanup', help='Remove backup files (.bak) and backup journals.',
+                                  description='Clean up backup files (.bak) and backup journals in a directory.')
+    cleanup.add_argument('directory', help='The directory to clean up.')
+    cleanup.add_argument('--keep-journals', action='store_true', help='Do not remove the EXIF backup journals.')
+    cleanup.add_argument('--older-than', default=None, metavar='AGE',
+                         help='Only remove backups older than AGE: days, or a number with s/m/h/d/w (e.g. 12h).')
+    cleanup.add_argument('--dry-run', action='store_true', help='Only report what would be removed.')
+    cleanup.add_argument('--jobs', type=int, default=8, help='The number of files to remove in parallel.')
+    cleanup.add_argument('--walk', action='store_true',
+                         help='Remove every .bak file below the directory, listed in a run manifest or not.')
+    cleanup.set_defaults(handler=_cleanup, command_parser=cleanup)
+
+    watch = commands.add_parser('watch', help='Tag new and modified images as they land in a directory.',
+                                description='Tag new and modified images as they land in a directory.')
+    watch.add_argument('directory', help='The directory to watch.')
+    watch.add_argument('--config', default=_CONFIG_PATH, help='The path to the config file.')
+    watch.add_argument('--state', default=None,
+                       help='The state file (default: DIRECTORY/.exif_watch_state.json).')
+    watch.add_argument('--settle', type=float, default=0.5,
+                       help='Seconds a file must stay unchanged before it is tagged.')
+    watch.add_argument('--polling', action='store_true', help='Poll for changes instead of using inotify.')
+    watch.add_argument('--interval', type=float, default=1.0, help='Seconds between polls.')
+    watch.add_argument('--jobs', type=int, default=1, help='The number of files to tag in parallel.')
+    watch.add_argument('--where', action='append', default=[], metavar='EXPR',
+                       help='Only tag the files that match, e.g. missing=artist. '
+                            'May be repeated; a file must match all of them.')
+    watch.add_argument('--durability', choices=('none', 'per-file', 'per-batch', 'end'), default=None,
+                       help="How the written files are flushed to disk (default: the config's, or none). "
+                            "per-batch and end flush before each save of the state file.")
+    watch.set_defaults(handler=_watch, command_parser=watch)
+
+    batch = commands.add_parser('batch', help='Checkpointed, resumable and shardable tagging jobs.',
+                                description='Checkpointed, resumable and shardable EXIF tagging jobs.')
+    batch_commands = batch.add_subparsers(dest='batch_command', required=True, metavar='STEP')
+    create = batch_commands.add_parser('create', help='List the target files of a directory into a new job.')
+    create.add_argument('job', help='The job directory.')
+    create.add_argument('directory', help='The directory containing the images to process.')
+    create.add_argument('--config', default=_CONFIG_PATH, help='The path to the config file.')
+    create.set_defaults(handler=_batch, command_parser=create)
+    run = batch_commands.add_parser('run', help='Process one shard of a job.')
+    run.add_argument('job', help='The job directory.')
+    run.add_argument('--shard', type=int, default=0, help='The shard to process, from 0.')
+    run.add_argument('--shards', type=int, default=1, help='The number of shards the job is split into.')
+    run.add_argument('--resume', action='store_true', help='Skip the files the checkpoint log lists as done.')
+    run.add_argument('--jobs', type=int, default=1, help='The number of files to process in parallel.')
+    run.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                     help='Run the parallel workers as threads or processes.')
+    run.add_argument('--directory', default=None,
+                     help="Where the job's images are mounted on this machine, if not at the original path.")
+    run.add_argument('--durability', choices=('none', 'per-file', 'per-batch', 'end'), default=None,
+                     help="How the written files are flushed to disk (default: the config's, or none).")
+    run.set_defaults(handler=_batch, command_parser=run)
+    merge = batch_commands.add_parser('merge', help='Combine the shard summaries into one report.')
+    merge.add_argument('job', help='The job directory.')
+    merge.add_argument('--shards', type=int, default=1, help='The number of shards the job was split into.')
+    merge.set_defaults(handler=_batch, command_parser=merge)
+
+    restore = commands.add_parser('restore', help='Restore images from the EXIF backup journals.',
+                                  description='Restore the original files from the EXIF backup journals.')
+    restore.add_argument('directory', help='The directory to restore.')
+    restore.add_argument('--run', default=None, help='Only restore (or list) the changes of this run.')
+    restore.add_argument('--list', action='store_true', help='List the journals instead of restoring.')
+    restore.set_defaults(handler=_restore, command_parser=restore)
+
+    report = commands.add_parser('report', help='Count makes, models and lenses, and missing tags.',
+                                 description='Count EXIF makes, models and lenses, and missing tags, '
+                                             'over the images in a directory.')
+    report.add_argument('directory', help='The directory containing the images.')
+    report.add_argument('--config', default=_CONFIG_PATH, help='The path to the config file.')
+    report.add_argument('--group-by', default=None,
+                        help='Comma-separated columns to group by, from make, model and lens_model '
+                             '(default: make,model).')
+    report.add_argument('--missing', default=None,
+                        help='Columns whose missing tags are counted per group. '
+                             'Defaults to the columns not grouped by.')
+    report.add_argument('--format', choices=('table', 'json', 'csv'), default='table', help='The output format.')
+    report.add_argument('--jobs', type=int, default=1, help='The number of files to parse in parallel.')
+    report.add_argument('--no-cache', action='store_true', help='Do not use the scan index.')
+    report.add_argument('--cache-path', default=None, help='The path to the scan index file.')
+    report.set_defaults(handler=_report, command_parser=report)
+
+    gui = commands.add_parser('gui', help='Open the desktop editor.', description='Open the desktop editor.')
+    gui.set_defaults(handler=_gui, command_parser=gui)
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the command line.
+
+    Args:
+        argv (list): The arguments, without the program name. Defaults to
+            sys.argv[1:].
+
+    Returns:
+        int: The exit status.
+    """
+    args = build_parser().parse_args(argv)
+    if args.log_file is not None:
+        # Imported here: cleanup and --help do not need logging (see above).
+        import logging
+        logging.basicConfig(filename=args.log_file, level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+    return args.handler(args, args.command_parser)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,164 +2,858 @@ import os
 import shutil
 import configparser
 import piexif
-import piexif.helper
-import argparse
 import logging
+import collections
+import io
+import itertools
+import time
+import concurrent.futures
+from exif_reader import ReadStats, read_exif_tags
+from exif_record import RecordSchema, record_schema
+from discovery import FileFinder, as_finder
+from exif_writer import WriteStats, is_jpeg, locate_exif, replace_file, write_exif
+from backup_journal import BackupJournal, clone_file
+from backup_manifest import BackupManifest
+from durability import SyncBatch, check_policy, fsync_directory, fsync_file
+from exif_filter import parse_where
+from tag_registry import TagPlan, compile_plan
+from tag_mapping import TagMapping, load_mapping
+from profiler import NULL_PROFILER, Profiler, timed
+from progress import RunStarted, FileStarted, FileDone, FileSkipped, FileError, RunSummary, RunError, ProfileReport
 
+# Values of [Settings] backup_mode: a full .bak copy, a copy-on-write
+# .bak clone, or a per-directory journal of the original EXIF segments.
+BACKUP_MODES = ('copy', 'reflink', 'journal')
 
-def get_exif_summary_from_directory(directory_path, target_extensions):
+
+def summarize_file(image_path, profile=NULL_PROFILER, fields=None, where=None):
+    """
+    Reads the summary EXIF tags of a single image file.
+
+    Only the EXIF header of the file is read (see exif_reader), so the
+    cost does not grow with the image size.
+
+    Args:
+        image_path (str): The path to the image file.
+        profile (Profiler): Optional profiler for the 'read' phase.
+        fields (iterable or RecordSchema): The fields to read (see
+            exif_record.record_schema). Defaults to make, model and
+            lens_model.
+        where (ExifFilter): Optional filter (see exif_filter). Only its
+            tags are read from a file it rejects.
+
+    Returns:
+        ExifRecord: The summary record for the file. Values are decoded
+        when read; a file that could not be read shows READ_ERROR in
+        every field. None if where rejects the file, or if where is given
+        and the file could not be read.
+    """
+    schema = fields if isinstance(fields, RecordSchema) else record_schema(fields)
+    file = os.path.basename(image_path)
+    try:
+        with profile.phase('read') as timer:
+            stats = ReadStats() if profile.enabled else None
+            tags = read_exif_tags(image_path, schema.tags, stats, where)
+            if stats is not None:
+                timer.bytes_read = stats.bytes_read
+        return None if tags is None else schema.record(file, tags)
+    except Exception as e:
+        logging.warning(f"Could not read EXIF from {image_path}: {e}")
+        # Whether it matches where cannot be told.
+        return None if where is not None else schema.failed(file)
+
+
+def make_finder(config, target_extensions):
+    """
+    Returns the FileFinder for the target files of a config.
+
+    Besides target_extensions, these optional [Settings] options shape the
+    walk: include and exclude (comma-separated glob patterns), max_depth,
+    skip_hidden and symlinks ('skip', 'files' or 'follow').
+
+    Args:
+        config (ConfigParser): The configuration object.
+        target_extensions (list): A list of file extensions to look for.
+
+    Raises:
+        ValueError: If one of the options is invalid.
+    """
+    def globs(option):
+        return config.get('Settings', option, fallback='').split(',')
+
+    max_depth = config.get('Settings', 'max_depth', fallback='').strip()
+    return FileFinder(
+        target_extensions,
+        include=globs('include'),
+        exclude=globs('exclude'),
+        max_depth=int(max_depth) if max_depth else None,
+        symlinks=config.get('Settings', 'symlinks', fallback='files').strip(),
+        hidden=not config.getboolean('Settings', 'skip_hidden', fallback=False))
+
+
+def _profiled_summary(image_path, fields=None, where=None):
+    """summarize_file with a per-file profiler, for profiled scans."""
+    profile = Profiler()
+    start = time.perf_counter()
+    record = summarize_file(image_path, profile, fields, where)
+    profile.file_done(image_path, time.perf_counter() - start)
+    return record, profile
+
+
+def _archive_module(path):
+    """
+    Returns the exif_archive module if path is a ZIP or tar archive, else
+    None. It is only imported then, so runs on a directory do not load
+    zipfile and tarfile.
+    """
+    if not os.path.isfile(path):
+        return None
+    import exif_archive
+    return exif_archive if exif_archive.is_archive(path) else None
+
+
+def _create_executor(executor, jobs):
+    if executor == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+    if executor == 'process':
+        return concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'.")
+
+
+def iter_exif_summary(directory_path, target_extensions, jobs=1, executor='thread', max_in_flight=None,
+                      index=None, profile=None, with_paths=False, fields=None, where=None, limit=None):
+    """
+    Scans a directory for images and yields a summary record for each one.
+
+    Records are yielded as soon as they are parsed, in directory walk
+    order. With jobs > 1 the files are parsed by a worker pool while the
+    walk goes on, so storage latency overlaps; at most max_in_flight files
+    are queued at any time, which keeps memory flat on very large trees.
+
+    directory_path may also be a ZIP or tar archive, whose members are
+    then read in archive order without being extracted (see
+    exif_archive.iter_archive_summary). An archive is one stream, so it
+    is read by the calling thread and neither workers nor the index are
+    used.
+
+    With where, files that do not match the filter are dropped while they
+    are read: only the filter's tags are decoded for them and no record is
+    built. With limit, the walk stops as soon as that many records have
+    been yielded.
+
+    Args:
+        directory_path (str): The path to the directory (or archive) to scan.
+        target_extensions (list or FileFinder): A list of file extensions
+            to check, or a finder that selects the files.
+        jobs (int): The number of workers. 1 parses in the calling thread.
+        executor (str): 'thread' or 'process'.
+        max_in_flight (int): The maximum number of queued files.
+            Defaults to four per worker.
+        index (ScanIndex): Optional scan index. Files whose size, mtime and
+            inode are unchanged are served from it instead of being parsed,
+            and freshly parsed files are added to it.
+        profile (Profiler): Optional profiler that receives the 'walk',
+            'index' and 'read' phases and the slowest files.
+        with_paths (bool): Yield (image path, record) pairs instead of
+            bare records.
+        fields (iterable): The fields of the records (see
+            exif_record.record_schema). The index only caches the default
+            summary fields, so it is not used when fields are given.
+        where (ExifFilter): Optional filter (see exif_filter). Files served
+            from the index are matched against their cached record, so the
+            index is not used when the filter needs other fields.
+        limit (int): The most records to yield. None yields them all.
+
+    Yields:
+        ExifRecord: The summary record for one file (see summarize_file).
+
+    Raises:
+        ValueError: If a field is not a known tag.
+    """
+    schema = record_schema(fields)
+    archive = _archive_module(directory_path)
+    if archive is not None:
+        records = archive.iter_archive_summary(directory_path, target_extensions, schema, with_paths, where)
+    else:
+        records = _iter_directory_summary(directory_path, target_extensions, jobs, executor, max_in_flight, index,
+                                          profile, with_paths, schema, where)
+    try:
+        yield from itertools.islice(records, limit)
+    finally:
+        # Stops the walk and the workers when the limit is reached.
+        records.close()
+
+
+def _iter_directory_summary(directory_path, target_extensions, jobs, executor, max_in_flight, index, profile,
+                            with_paths, schema, where):
+    """The directory walk of iter_exif_summary."""
+    if schema is not record_schema() or (where is not None and not set(where.tags) <= set(schema.tags)):
+        index = None
+    limit = max_in_flight or jobs * 4 if jobs > 1 else 1
+    pool = _create_executor(executor, jobs) if jobs > 1 else None
+    pending = collections.deque()
+
+    profile = profile or NULL_PROFILER
+    summarize = _profiled_summary if profile.enabled else summarize_file
+
+    def finish(image_path, stat_result, record, cached):
+        if isinstance(record, concurrent.futures.Future):
+            record = record.result()
+        if cached:
+            record = schema.from_mapping(record)
+            if where is not None and not where.matches_record(record):
+                return None
+        elif profile.enabled:
+            record, file_profile = record
+            profile.merge(file_profile)
+        if record is None:
+            return None
+        if index is not None and not cached and stat_result is not None and not record.failed:
+            index.put(image_path, record, stat_result)
+        return (image_path, record) if with_paths else record
+
+    try:
+        for entry in timed(as_finder(target_extensions).scan(directory_path), profile, 'walk'):
+            image_path = entry.path
+            stat_result = record = None
+            if index is not None:
+                with profile.phase('index'):
+                    try:
+                        stat_result = entry.stat()
+                        record = index.get(image_path, stat_result)
+                    except OSError:
+                        stat_result = None
+            cached = record is not None
+            if not cached:
+                record = (pool.submit(summarize, image_path, fields=schema, where=where) if pool
+                          else summarize(image_path, fields=schema, where=where))
+            pending.append((image_path, stat_result, record, cached))
+            if len(pending) >= limit:
+                found = finish(*pending.popleft())
+                if found is not None:
+                    yield found
+        while pending:
+            found = finish(*pending.popleft())
+            if found is not None:
+                yield found
+    finally:
+        # Also reached when the caller stops iterating early.
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def get_exif_summary_from_directory(directory_path, target_extensions, jobs=1, executor='thread', index=None,
+                                    profile=None, fields=None):
     """
     Scans a directory for images and returns a summary of their EXIF data.
 
     Args:
         directory_path (str): The path to the directory to scan.
         target_extensions (list): A list of file extensions to check.
+        jobs (int): The number of workers (see iter_exif_summary).
+        executor (str): 'thread' or 'process'.
+        index (ScanIndex): Optional scan index to skip unchanged files.
+        profile (Profiler): Optional profiler (see iter_exif_summary).
+        fields (iterable): The fields of the records (see iter_exif_summary).
 
     Returns:
-        list: A list of dictionaries, each containing info for one file.
+        list: A list of ExifRecord mappings, one per file.
     """
-    summary_data = []
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            if any(file.lower().endswith(ext.lower()) for ext in target_extensions):
-                image_path = os.path.join(root, file)
-                try:
-                    exif_dict = piexif.load(image_path)
-                    make = exif_dict.get("0th", {}).get(piexif.ImageIFD.Make, b'').decode('utf-8', 'ignore')
-                    model = exif_dict.get("0th", {}).get(piexif.ImageIFD.Model, b'').decode('utf-8', 'ignore')
-                    lens_model = exif_dict.get("Exif", {}).get(piexif.ExifIFD.LensModel, b'').decode('utf-8', 'ignore')
-
-                    summary_data.append({
-                        'filename': file,
-                                    'make': make if make else 'N/A',
-                                    'model': model if model else 'N/A',
-                                    'lens_model': lens_model if lens_model else 'N/A'                    })
-                except Exception as e:
-                    logging.warning(f"Could not read EXIF from {image_path}: {e}")
-                    summary_data.append({
-                        'filename': file,
-                        'make': '讀取失敗',
-                        'model': '讀取失敗',
-                        'lens_model': '讀取失敗'
-                    })
-    return summary_data
-
-
-def add_exif_tags_to_file(image_path, config):
+    return list(iter_exif_summary(directory_path, target_extensions, jobs=jobs, executor=executor, index=index,
+                                  profile=profile, fields=fields))
+
+
+def as_plan(config):
+    """Returns config as a TagPlan, compiling its [EXIF] section if needed."""
+    if isinstance(config, TagPlan):
+        return config
+    return compile_plan(config['EXIF'])
+
+
+def tag_name(ifd_name, tag):
+    """Returns the EXIF name of a tag, e.g. 'Artist'."""
+    return piexif.TAGS['Image' if ifd_name in ('0th', '1st') else ifd_name][tag]['name']
+
+
+def update_exif_file(image_path, config, journal=None, backup=None, dry_run=False, profile=NULL_PROFILER,
+                     durability='none'):
     """
-    Adds EXIF tags to a single image file based on the provided config.
+    Brings the EXIF tags of a single image file in line with the config.
+
+    The tags already in the file are compared with the config first. When
+    they all match, nothing is backed up or written.
 
     Args:
         image_path (str): The path to the image file.
-        config (ConfigParser): The configuration object with EXIF tags.
-    
+        config (ConfigParser or TagPlan): The configuration object with EXIF
+            tags, or a plan already compiled from it.
+        journal (BackupJournal): Optional journal that receives the original
+            EXIF segment before the file is changed. Files that are not JPEG
+            get a full .bak copy instead.
+        backup (callable): Optional function called right before the file
+            is changed, e.g. to copy it. It may return the number of bytes
+            it wrote, for the profile.
+        dry_run (bool): Only work out the changes, do not write anything.
+        profile (Profiler): Optional profiler for the 'locate', 'load',
+            'backup', 'journal', 'dump', 'write' and 'insert' phases.
+        durability (str): One of durability.DURABILITY_POLICIES. With any
+            policy but 'none', the journal record is flushed to disk before
+            the file is changed and the file's data before it is renamed
+            into place or the call returns; with 'per-file' its directory
+            is synced too, while the other policies leave the directories
+            to a SyncBatch. The backup callable is expected to flush its
+            own copy.
+
     Returns:
-        bool: True if successful, False otherwise.
+        tuple: (status, changes). status is 'written', 'unchanged' or
+        'planned' (dry run); changes is a list of
+        (IFD name, tag, old value or None, new value).
+
+    Raises:
+        ValueError: If config has unknown EXIF tags or invalid values.
+        Exception: Whatever reading or writing the file raised.
     """
-    try:
-        logging.info(f"Processing: {image_path}")
+    plan = as_plan(config)
+    location = None
+    if is_jpeg(image_path):
+        # Only the EXIF segment is read; the image data is never loaded.
+        stats = WriteStats()
+        with profile.phase('locate') as timer:
+            with open(image_path, 'rb') as f:
+                location = locate_exif(f, stats)
+            timer.bytes_read = stats.bytes_read
+        exif_bytes = location.exif_bytes
+        if exif_bytes is None:
+            exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+        else:
+            with profile.phase('load'):
+                exif_dict = piexif.load(exif_bytes)
+    else:
         try:
-            exif_dict = piexif.load(image_path)
+            with profile.phase('load'):
+                exif_dict = piexif.load(image_path)
         except piexif.InvalidImageDataError:
             # If the image does not contain EXIF data, create a new EXIF dictionary.
             exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
 
-        # Ensure the '0th' and 'Exif' IFD dictionaries exist.
-        if '0th' not in exif_dict:
-            exif_dict['0th'] = {}
-        if 'Exif' not in exif_dict:
-            exif_dict['Exif'] = {}
-
-        for key, value in config['EXIF'].items():
-            if not value:  # Skip if the value is empty
-                continue
-
-            if key.lower() == 'artist':
-                exif_dict['0th'][piexif.ImageIFD.Artist] = value.encode('utf-8')
-            elif key.lower() == 'copyright':
-                exif_dict['0th'][piexif.ImageIFD.Copyright] = value.encode('utf-8')
-            elif key.lower() == 'make':
-                exif_dict['0th'][piexif.ImageIFD.Make] = value.encode('utf-8')
-            elif key.lower() == 'model':
-                exif_dict['0th'][piexif.ImageIFD.Model] = value.encode('utf-8')
-            elif key.lower() == 'software':
-                exif_dict['0th'][piexif.ImageIFD.Software] = value.encode('utf-8')
-            elif key.lower() == 'datetimeoriginal':
-                exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal] = value.encode('utf-8')
-            elif key.lower() == 'usercomment':
-                exif_dict['Exif'][piexif.ExifIFD.UserComment] = piexif.helper.UserComment.dump(value, encoding="unicode")
-            elif key.lower() == 'lensmake':
-                exif_dict['Exif'][piexif.ExifIFD.LensMake] = value.encode('utf-8')
-            elif key.lower() == 'lensmodel':
-                exif_dict['Exif'][piexif.ExifIFD.LensModel] = value.encode('utf-8')
+    changes = plan.apply(exif_dict)
+    if not changes:
+        return 'unchanged', changes
+    if dry_run:
+        return 'planned', changes
 
+    flush = durability != 'none'
+    if backup is not None:
+        with profile.phase('backup') as timer:
+            timer.bytes_written = backup() or 0
+    with profile.phase('dump'):
         exif_bytes = piexif.dump(exif_dict)
-        piexif.insert(exif_bytes, image_path)
+    if location is not None:
+        if journal is not None:
+            with profile.phase('journal') as timer:
+                journal.record(image_path, location, fsync=flush)
+                timer.bytes_written = location.length
+        read_before = stats.bytes_read
+        with profile.phase('write') as timer:
+            write_exif(image_path, exif_bytes, location, stats, fsync=flush)
+            if durability == 'per-file' and not stats.in_place:
+                fsync_directory(os.path.dirname(os.path.abspath(image_path)))
+            timer.bytes_read = stats.bytes_read - read_before
+            timer.bytes_written = stats.bytes_written
+        logging.info(f"Wrote EXIF to {image_path} ({'in place' if stats.in_place else 'rewritten'}): "
+                     f"{stats.bytes_read} bytes read, {stats.bytes_written} bytes written")
+    else:
+        if journal is not None:
+            with profile.phase('backup') as timer:
+                shutil.copy2(image_path, image_path + '.bak')
+                _flush_new_file(image_path + '.bak', durability)
+                timer.bytes_written = os.path.getsize(image_path)
+            if journal.manifest is not None:
+                journal.manifest.record(image_path + '.bak')
+        with profile.phase('insert'):
+            # piexif would rewrite the file in place; a temp file and a
+            # rename keep it whole if the run is cut short.
+            with io.BytesIO() as new_file:
+                piexif.insert(exif_bytes, image_path, new_file)
+                replace_file(image_path, new_file.getvalue(), fsync=flush)
+            if durability == 'per-file':
+                fsync_directory(os.path.dirname(os.path.abspath(image_path)))
+    return 'written', changes
+
+
+def add_exif_tags_to_file(image_path, config, index=None, journal=None, profile=None):
+    """
+    Adds EXIF tags to a single image file based on the provided config.
+
+    Files whose tags already match the config are left untouched.
+
+    Args:
+        image_path (str): The path to the image file.
+        config (ConfigParser or TagPlan): The configuration object with EXIF
+            tags, or a plan already compiled from it.
+        index (ScanIndex): Optional scan index whose entry for the file is
+            refreshed after the write.
+        journal (BackupJournal): Optional journal that receives the original
+            EXIF segment before the file is changed.
+        profile (Profiler): Optional profiler for the tagging phases.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    profile = profile or NULL_PROFILER
+    start = time.perf_counter() if profile.enabled else None
+    try:
+        logging.info(f"Processing: {image_path}")
+        status, _ = update_exif_file(image_path, config, journal=journal, profile=profile)
+        if status == 'unchanged':
+            logging.info(f"Skipped {image_path}: tags already up to date")
+        elif index is not None:
+            index.put(image_path, summarize_file(image_path))
         return True
     except Exception as e:
         logging.error(f"Error processing file {image_path}: {e}")
         return False
+    finally:
+        if start is not None:
+            profile.file_done(image_path, time.perf_counter() - start)
+
 
-def process_directory(directory_path, config_path):
+def _flush_new_file(path, durability):
+    """Flushes a new file under any policy but 'none', and with 'per-file' its directory entry too."""
+    if durability != 'none':
+        fsync_file(path)
+    if durability == 'per-file':
+        fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def _backup_file(image_path, backup_mode, manifest=None, durability='none'):
+    """Makes the .bak backup of a file and returns the bytes it copied."""
+    copied = 0
+    if backup_mode == 'copy':
+        shutil.copy2(image_path, image_path + '.bak')
+        copied = os.path.getsize(image_path)
+    elif backup_mode == 'reflink':
+        # A clone shares the data blocks; nothing is copied.
+        clone_file(image_path, image_path + '.bak')
+    else:
+        return 0
+    # The backup has to be on disk before the image is changed in place.
+    _flush_new_file(image_path + '.bak', durability)
+    if manifest is not None:
+        manifest.record(image_path + '.bak')
+    return copied
+
+
+def tag_file(image_path, plan, backup_mode, refresh_summary=False, journal=None, dry_run=False, profiled=False,
+              manifest=None, durability='none'):
     """
-    Processes all images in a directory, adding EXIF tags based on a config file.
+    Backs up and tags a single file. Runs in the workers of
+    process_directory, batch jobs, the watch mode and the async API.
 
     Args:
-        directory_path (str): The path to the directory containing images.
-        config_path (str): The path to the configuration file.
+        image_path (str): The path to the image file.
+        plan (TagPlan): The tags to write.
+        backup_mode (str): None, or one of BACKUP_MODES.
+        refresh_summary (bool): Also return the file's new summary record.
+        journal (BackupJournal): The journal for backup_mode 'journal'.
+        dry_run (bool): Only work out the changes.
+        profiled (bool): Profile the file and return its Profiler.
+        manifest (BackupManifest): Lists the backups made, for cleanup.
+        durability (str): How the file and its backup are flushed (see
+            update_exif_file).
+
+    Returns:
+        tuple: (status, changes, the file's new summary record or None,
+        error message or None, Profiler of this file or None). status is
+        'error' or one of the update_exif_file statuses.
+    """
+    profile = Profiler() if profiled else NULL_PROFILER
+    start = time.perf_counter() if profiled else None
+    record = error = None
+    try:
+        logging.info(f"Processing: {image_path}")
+        status, changes = update_exif_file(
+            image_path, plan, journal=journal, dry_run=dry_run, profile=profile, durability=durability,
+            backup=lambda: _backup_file(image_path, backup_mode, manifest, durability))
+        if status == 'unchanged':
+            logging.info(f"Skipped {image_path}: tags already up to date")
+        if status == 'written' and refresh_summary:
+            record = summarize_file(image_path, profile)
+    except Exception as e:
+        logging.error(f"Error processing file {image_path}: {e}")
+        status, changes, error = 'error', [], str(e)
+
+    if not profiled:
+        return status, changes, record, error, None
+    profile.file_done(image_path, time.perf_counter() - start)
+    return status, changes, record, error, profile
+
+
+def written_paths(image_path, backup_mode):
+    """Returns the files a run may have written for a tagged image: it and its .bak backup."""
+    return (image_path, image_path + '.bak') if backup_mode else (image_path,)
+
+
+def format_changes(image_path, changes):
+    """Formats the planned changes of one file for the dry-run listing."""
+    lines = [f"{image_path}:"]
+    for ifd_name, tag, old_value, new_value in changes:
+        lines.append(f"  {tag_name(ifd_name, tag)}: {old_value!r} -> {new_value!r}")
+    return '\n'.join(lines)
+
+
+def file_size(path):
+    """Returns the size of a file, or 0 if it cannot be read, for progress events."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def tag_paths(paths, plan, backup_mode, jobs=1, executor='thread', max_in_flight=None, refresh_summary=False,
+              journal=None, dry_run=False, profiled=False, manifest=None, on_start=None, durability='none'):
+    """
+    Backs up and tags files, yielding each result in the order of paths.
+
+    The per-file loop of process_directory. With jobs > 1 the files run in
+    a worker pool with at most max_in_flight queued; paths is consumed only
+    as fast as that window allows.
+
+    Args:
+        paths (iterable): The image paths.
+        plan (TagPlan or callable): The tags to write, or a function that
+            returns the TagPlan of an image path. It is called here, so
+            workers only ever receive plain plans.
+        backup_mode (str): None, or one of BACKUP_MODES.
+        on_start (callable): Called with each path as it is handed out.
+        durability (str): How each file is flushed in its worker (see
+            update_exif_file).
+        The other arguments are those of process_directory and tag_file.
+
+    Yields:
+        tuple: (image path, result of tag_file). A worker that failed
+        outright gives an 'error' result.
     """
-    logging.basicConfig(filename='exif_editor.log', 
-                        level=logging.INFO, 
-                        format='%(asctime)s - %(levelname)s - %(message)s')
+    limit = max_in_flight or jobs * 4 if jobs > 1 else 1
+    pool = _create_executor(executor, jobs) if jobs > 1 else None
+    pending = collections.deque()
+    plan_for = plan if callable(plan) else None
+
+    def finish(image_path, result):
+        if isinstance(result, concurrent.futures.Future):
+            try:
+                result = result.result()
+            except Exception as e:
+                logging.error(f"Error processing file {image_path}: {e}")
+                result = ('error', [], None, str(e), None)
+        return image_path, result
+
+    try:
+        for image_path in paths:
+            if on_start is not None:
+                on_start(image_path)
+            if plan_for is not None:
+                plan = plan_for(image_path)
+            if pool is not None:
+                result = pool.submit(tag_file, image_path, plan, backup_mode, refresh_summary, journal, dry_run,
+                                     profiled, manifest, durability)
+            else:
+                result = tag_file(image_path, plan, backup_mode, refresh_summary, journal, dry_run, profiled,
+                                   manifest, durability)
+            pending.append((image_path, result))
+            if len(pending) >= limit:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        # Also reached when the caller stops early.
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def format_summary(total_files, success_count, error_count, unchanged_count, dry_run=False):
+    """Formats the totals report printed at the end of a run."""
+    summary = (f"\n--- Processing Summary ---\nTotal files processed: {total_files}\nSuccessful: {success_count}\n"
+               f"Errors: {error_count}\nUnchanged: {unchanged_count}\n")
+    if dry_run:
+        summary += f"Would change: {success_count - unchanged_count}\n"
+    summary += "--------------------------"
+    return summary
+
+
+class RunConfig:
+    """
+    The parts of a config file a tagging run needs, validated and compiled.
+
+    Attributes:
+        finder (FileFinder): Selects the target files.
+        plan (TagPlan): The tags to write; immutable and picklable, so it
+            can be shared by worker threads or sent to worker processes.
+        backup_mode (str): None (no backups) or one of BACKUP_MODES.
+        durability (str): One of durability.DURABILITY_POLICIES.
+    """
+
+    __slots__ = ('finder', 'plan', 'backup_mode', 'durability')
+
+    def __init__(self, finder, plan, backup_mode, durability='none'):
+        self.finder = finder
+        self.plan = plan
+        self.backup_mode = backup_mode
+        self.durability = durability
+
+
+def load_run_config(config_path):
+    """
+    Reads and validates a config file for a tagging run.
+
+    Args:
+        config_path (str): The path to the configuration file.
+
+    Returns:
+        RunConfig: The compiled settings.
 
+    Raises:
+        ValueError: With a message for the user if the config is missing
+            or invalid.
+    """
     config = configparser.ConfigParser()
     if not os.path.exists(config_path):
-        logging.error(f"Config file not found at {config_path}")
-        print(f"Error: Config file not found at {config_path}")
-        return
+        raise ValueError(f"Config file not found at {config_path}")
 
     config.read(config_path)
 
     if not config.has_section('Settings') or not config.has_section('EXIF'):
-        logging.error("Config file must contain [Settings] and [EXIF] sections.")
-        print("Error: Config file must contain [Settings] and [EXIF] sections.")
-        return
+        raise ValueError("Config file must contain [Settings] and [EXIF] sections.")
 
     if not config.has_option('Settings', 'target_extensions') or not config.get('Settings', 'target_extensions'):
-        logging.error("'target_extensions' is not defined or is empty in the [Settings] section.")
-        print("Error: 'target_extensions' is not defined or is empty in the [Settings] section.")
-        return
+        raise ValueError("'target_extensions' is not defined or is empty in the [Settings] section.")
 
     target_extensions = [ext.strip() for ext in config.get('Settings', 'target_extensions').split(',')]
-    
+    try:
+        finder = make_finder(config, target_extensions)
+    except ValueError as e:
+        raise ValueError(f"Invalid [Settings] section: {e}")
+
+    backup_mode = None
+    if config.getboolean('Settings', 'create_backup'):
+        backup_mode = config.get('Settings', 'backup_mode', fallback='copy').strip()
+        if backup_mode not in BACKUP_MODES:
+            raise ValueError(f"Unknown backup_mode '{backup_mode}', expected one of {', '.join(BACKUP_MODES)}.")
+    durability = check_policy(config.get('Settings', 'durability', fallback='none').strip())
+
+    try:
+        plan = compile_plan(config['EXIF'])
+    except ValueError as e:
+        raise ValueError(f"Invalid [EXIF] section: {e}")
+    return RunConfig(finder, plan, backup_mode, durability)
+
+
+def process_directory(directory_path, config_path, index=None, jobs=1, executor='thread', max_in_flight=None,
+                      dry_run=False, progress=None, profile=None, mapping=None, durability=None, output_path=None,
+                      where=None):
+    """
+    Processes all images in a directory, adding EXIF tags based on a config file.
+
+    Files whose tags already match the config are neither backed up nor
+    rewritten, so re-running on the same directory only touches the files
+    that changed. With dry_run, the planned changes are listed per file and
+    nothing is written.
+
+    With jobs > 1 the backup and tagging of each file run in a worker pool.
+    At most max_in_flight files are queued at a time, and a failing file is
+    counted as an error without stopping the others, so the summary is the
+    same as for a serial run.
+
+    Args:
+        directory_path (str): The path to the directory containing images.
+        config_path (str): The path to the configuration file.
+        index (ScanIndex): Optional scan index to keep up to date.
+        jobs (int): The number of workers. 1 processes in the calling thread.
+        executor (str): 'thread' or 'process'.
+        max_in_flight (int): The maximum number of queued files.
+            Defaults to four per worker.
+        dry_run (bool): List the planned changes without writing.
+        progress (callable): Optional callback that receives the typed
+            events from the progress module (RunStarted, FileStarted,
+            FileDone, FileSkipped, FileError, RunSummary, RunError). It is
+            called on the thread running process_directory; pass e.g.
+            queue.put to hand the events to another thread.
+        profile (Profiler): Optional profiler that receives the per-phase
+            timings of the run (see update_exif_file) and the 'walk'
+            phase. Its report is also sent to progress as a ProfileReport.
+        mapping (str or TagMapping): Optional per-file tag values (see
+            tag_mapping), as a CSV / JSON lines file. Each file gets the
+            config's [EXIF] tags merged with its mapping rows, in one write.
+            The whole mapping is validated before any file is touched.
+        durability (str): How the written files and backups are flushed to
+            disk, one of durability.DURABILITY_POLICIES. Defaults to the
+            config's [Settings] durability, or 'none'.
+        output_path (str): When directory_path is a ZIP or tar archive,
+            where to write the tagged copy (see exif_archive.tag_archive).
+            Defaults to the archive name with '-tagged' added. Archives are
+            never changed in place, so no backups are made.
+        where (ExifFilter or iterable): Optional filter, or --where
+            expressions (see exif_filter), that selects the files to tag,
+            e.g. ['missing=model']. Only the filter's tags are read to
+            select a file, on the calling thread as the walk goes; files
+            that do not match are left out of the run and its totals. Each
+            file is matched once: with progress, the counting walk keeps
+            the matching paths for the run. The progress total of an
+            archive counts all its candidate members, since they are
+            matched as the copy is written.
+
+    Returns:
+        RunSummary: The counts of the run, also printed and sent to
+        progress. None if the run could not start.
+    """
+    def fail(message):
+        logging.error(message)
+        print(f"Error: {message}")
+        if progress is not None:
+            progress(RunError(message))
+
+    try:
+        run_config = load_run_config(config_path)
+        durability = check_policy(durability or run_config.durability)
+    except ValueError as e:
+        fail(str(e))
+        return
+    finder, plan = run_config.finder, run_config.plan
+    try:
+        where = parse_where(where) if where is not None else None
+    except ValueError as e:
+        fail(str(e))
+        return
+    if mapping is not None:
+        try:
+            if not isinstance(mapping, TagMapping):
+                mapping = load_mapping(mapping, plan)
+        except (OSError, ValueError) as e:
+            fail(str(e))
+            return
+        def plan(image_path):
+            return mapping.plan_for(os.path.relpath(image_path, directory_path))
+
     logging.info(f"Starting to process files in: {directory_path}")
     print(f"Starting to process files in: {directory_path}")
     
+    archive = _archive_module(directory_path)
+    backup_mode = None if dry_run or archive is not None else run_config.backup_mode
+    # Lists the backups of this run for cleanup_backups.
+    manifest = BackupManifest(directory_path) if backup_mode else None
+    journal = BackupJournal(manifest=manifest) if backup_mode == 'journal' else None
+    # An archive copy is flushed as a whole by tag_archive.
+    sync = SyncBatch('none' if archive is not None else durability)
+    refresh_summary = index is not None
+    profiled = profile is not None
+    profile = profile or NULL_PROFILER
+
+    # The paths that matched where in the counting walk, so the run does
+    # not read their headers a second time.
+    matched = None
+    if progress is not None:
+        # A counting walk first, so the progress can show totals and an ETA.
+        total = total_bytes = 0
+        if archive is not None:
+            total, total_bytes = archive.count_archive_members(directory_path, finder)
+        else:
+            if where is not None:
+                matched = []
+            for entry in finder.scan(directory_path):
+                if where is not None:
+                    if not where.matches_file(entry.path):
+                        continue
+                    matched.append(entry.path)
+                total += 1
+                try:
+                    total_bytes += entry.stat().st_size
+                except OSError:
+                    pass
+        progress(RunStarted(directory_path, total, total_bytes))
+
     total_files = 0
     success_count = 0
     error_count = 0
+    unchanged_count = 0
 
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            if any(file.lower().endswith(ext.lower()) for ext in target_extensions):
-                total_files += 1
-                image_path = os.path.join(root, file)
-                
-                if config.getboolean('Settings', 'create_backup'):
-                    shutil.copy2(image_path, image_path + '.bak')
-                
-                if add_exif_tags_to_file(image_path, config):
-                    success_count += 1
-                else:
-                    error_count += 1
-    
-    summary = f"\n--- Processing Summary ---\nTotal files processed: {total_files}\nSuccessful: {success_count}\nErrors: {error_count}\n--------------------------"
+    def finish(image_path, result):
+        nonlocal total_files, success_count, error_count, unchanged_count
+        total_files += 1
+        status, changes, record, error, file_profile = result
+        if file_profile is not None:
+            profile.merge(file_profile)
+        if status == 'error':
+            error_count += 1
+        else:
+            success_count += 1
+            if status == 'unchanged':
+                unchanged_count += 1
+            elif status == 'planned':
+                print(format_changes(image_path, changes))
+            else:
+                sync.add(written_paths(image_path, backup_mode))
+            if record is not None:
+                index.put(image_path, record)
+
+        if progress is not None:
+            size = file_size(image_path)
+            if status == 'error':
+                progress(FileError(image_path, size, error))
+            elif status == 'unchanged':
+                progress(FileSkipped(image_path, size))
+            else:
+                progress(FileDone(image_path, size, changes))
+
+    def started(image_path):
+        progress(FileStarted(image_path))
+
+    try:
+        if archive is not None:
+            output_path = output_path or archive.archive_output_path(directory_path)
+            tagged = archive.tag_archive(directory_path, output_path, plan, finder, dry_run=dry_run,
+                                 fsync=durability != 'none', where=where)
+        else:
+            if matched is not None:
+                paths = matched
+            else:
+                # Backups and rewritten files are created next to the images, so
+                # each directory is listed in full before its files are tagged.
+                paths = (entry.path
+                         for entry in timed(finder.scan(directory_path, whole_directories=True), profile, 'walk')
+                         if where is None or where.matches_file(entry.path))
+            tagged = tag_paths(paths, plan, backup_mode, jobs=jobs, executor=executor, max_in_flight=max_in_flight,
+                               refresh_summary=refresh_summary, journal=journal, dry_run=dry_run, profiled=profiled,
+                               manifest=manifest, on_start=started if progress is not None else None,
+                               durability=durability)
+        for image_path, result in tagged:
+            finish(image_path, result)
+    finally:
+        # Waits for the workers before the journal is closed.
+        tagged.close()
+        sync.flush()
+        if journal is not None:
+            journal.close()
+        if manifest is not None:
+            manifest.close()
+
+    if archive is not None and not dry_run:
+        logging.info(f"Wrote the tagged archive {output_path}")
+        print(f"Wrote the tagged archive: {output_path}")
+    summary = format_summary(total_files, success_count, error_count, unchanged_count, dry_run)
     logging.info(summary)
     print(summary)
+    if profiled:
+        profile.stop()
+        if progress is not None:
+            progress(ProfileReport(profile.format_text(), profile.report()))
+    result = RunSummary(total_files, success_count, error_count, unchanged_count, summary)
+    if progress is not None:
+        progress(result)
+    return result
+
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Add EXIF tags to images in a directory.')
-    parser.add_argument('directory', help='The directory containing the images to process.')
-    parser.add_argument('--config', default='config/config.ini', help='The path to the config file.')
-    args = parser.parse_args()
-    process_directory(args.directory, args.config)
\ No newline at end of file
+    # The command line lives in exif_cli (`exif_cli.py tag`).
+    import sys
+    from exif_cli import main
+    sys.exit(main(['tag'] + sys.argv[1:]))
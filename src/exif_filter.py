@@ -0,0 +1,143 @@
+import re
+import logging
+from exif_reader import read_exif_tags
+from exif_record import MISSING, NOT_AVAILABLE, decode_value, field_tag
+
+# Predicates of a --where expression, one per expression:
+#   missing=FIELD      the file has no such tag (or an empty one)
+#   present=FIELD      the file has the tag
+#   FIELD=VALUE        the value is VALUE
+#   FIELD!=VALUE       the value is not VALUE (a missing tag is not VALUE)
+#   FIELD^=PREFIX      the value starts with PREFIX
+#   FIELD~=REGEX       the value contains a match of REGEX (re.search)
+# FIELD is a summary field (make, model, lens_model) or any tag name from
+# the tag registry (e.g. lensmodel, fnumber, gps.gpslatitude). Values are
+# compared as displayed by the summary (e.g. '28/10' for a rational), with
+# surrounding spaces removed.
+_EXPRESSION = re.compile(r'\s*([\w.]+)\s*(!=|\^=|~=|=)(.*)', re.DOTALL)
+_PRESENCE = ('missing', 'present')
+
+
+def _compile(expression):
+    """Compiles one expression into (operator, (IFD name, tag id), tag type, operand)."""
+    match = _EXPRESSION.fullmatch(expression)
+    if match is None:
+        raise ValueError(f"Invalid filter '{expression}', expected e.g. make=Canon or missing=lensmodel.")
+    name, operator, operand = match.group(1).lower(), match.group(2), match.group(3).strip()
+    if name in _PRESENCE and operator == '=':
+        name, operator, operand = operand.lower(), name, None
+    try:
+        ifd, tag, value_type = field_tag(name)
+    except KeyError:
+        raise ValueError(f"Unknown EXIF field '{name}' in filter '{expression}'.")
+    if operator == '~=':
+        try:
+            operand = re.compile(operand)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression in filter '{expression}': {e}")
+    return operator, (ifd, tag), value_type, operand
+
+
+class ExifFilter:
+    """
+    A compiled set of --where expressions; a file must match all of them.
+
+    The filter knows which tags it needs, so the scanner reads those first
+    and drops a file that does not match before reading anything else or
+    building its record (see exif_reader.read_exif_tags). It is immutable
+    and picklable, so worker processes can receive it.
+
+    Args:
+        expressions (iterable): Expressions such as 'make=Canon',
+            'model^=EOS', 'lensmodel~=(?i)macro' or 'missing=lensmodel'.
+
+    Raises:
+        ValueError: If an expression is invalid or names an unknown field.
+    """
+
+    __slots__ = ('expressions', 'tags', '_predicates')
+
+    def __init__(self, expressions):
+        self.expressions = tuple(expressions)
+        self._predicates = tuple(_compile(expression) for expression in self.expressions)
+        self.tags = tuple(dict.fromkeys(key for _, key, _, _ in self._predicates))
+
+    def __reduce__(self):
+        return ExifFilter, (self.expressions,)
+
+    def __repr__(self):
+        return f'ExifFilter({list(self.expressions)!r})'
+
+    def matches(self, values):
+        """
+        Whether a file matches every expression.
+
+        Args:
+            values (Mapping): {(IFD name, tag id): raw value} with at least
+                the filter's tags, as read by exif_reader.read_exif_tags.
+                Absent keys and MISSING values are missing tags.
+        """
+        for operator, key, value_type, operand in self._predicates:
+            text = decode_value(values.get(key, MISSING), value_type).strip()
+            missing = text in ('', NOT_AVAILABLE)
+            if operator == 'missing':
+                matched = missing
+            elif operator == 'present':
+                matched = not missing
+            elif operator == '=':
+                matched = text == operand
+            elif operator == '!=':
+                matched = text != operand
+            elif missing:
+                matched = False
+            elif operator == '^=':
+                matched = text.startswith(operand)
+            else:
+                matched = operand.search(text) is not None
+            if not matched:
+                return False
+        return True
+
+    def matches_record(self, record):
+        """
+        Like matches, on an ExifRecord whose fields include every tag of
+        the filter (e.g. one served from the scan index).
+        """
+        if record.failed:
+            return False
+        schema = record.schema
+        return self.matches({tag: record.raw(field) for field, tag in zip(schema.fields, schema.tags)})
+
+    def matches_file(self, image_path):
+        """
+        Whether an image file matches, reading only the filter's tags.
+
+        A file that cannot be read matches no filter.
+        """
+        try:
+            return self.matches(read_exif_tags(image_path, self.tags))
+        except Exception as e:
+            logging.warning(f"Could not read EXIF from {image_path}: {e}")
+            return False
+
+
+def parse_where(expressions):
+    """
+    Compiles --where expressions into an ExifFilter.
+
+    Args:
+        expressions (str or iterable): One expression or several, which
+            must all match.
+
+    Returns:
+        ExifFilter: The filter, or None if there are no expressions.
+
+    Raises:
+        ValueError: If an expression is invalid.
+    """
+    if isinstance(expressions, ExifFilter):
+        return expressions
+    if isinstance(expressions, str):
+        expressions = [expressions]
+    expressions = [expression for expression in expressions if expression.strip()]
+    return ExifFilter(expressions) if expressions else None
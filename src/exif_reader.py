@@ -0,0 +1,287 @@
+import struct
+import piexif
+
+
+# Tags shown by the directory summary, as (IFD name, tag id) pairs.
+SUMMARY_TAGS = (
+    ('0th', piexif.ImageIFD.Make),
+    ('0th', piexif.ImageIFD.Model),
+    ('Exif', piexif.ExifIFD.LensModel),
+)
+
+# Size of the first read. It covers SOI, APP0 and the start of APP1 in
+# nearly every camera JPEG, so most files need only one more read.
+HEAD_CHUNK_SIZE = 4096
+
+_SOI = b'\xff\xd8'
+_SOS = 0xda
+_EOI = 0xd9
+_APP1 = 0xe1
+_EXIF_HEADER = b'Exif\x00\x00'
+_TIFF_MAGIC = (b'II', b'MM')
+
+# TIFF value types: (struct format of one item, item size).
+_TYPE_FORMATS = {
+    piexif.TYPES.Byte: ('B', 1),
+    piexif.TYPES.Ascii: (None, 1),
+    piexif.TYPES.Short: ('H', 2),
+    piexif.TYPES.Long: ('L', 4),
+    piexif.TYPES.Rational: ('LL', 8),
+    piexif.TYPES.SByte: ('b', 1),
+    piexif.TYPES.Undefined: (None, 1),
+    piexif.TYPES.SShort: ('h', 2),
+    piexif.TYPES.SLong: ('l', 4),
+    piexif.TYPES.SRational: ('ll', 8),
+    piexif.TYPES.Float: ('f', 4),
+    piexif.TYPES.DFloat: ('d', 8),
+}
+
+# Pointer tags leading from one IFD to another.
+_IFD_POINTERS = {
+    'Exif': ('0th', piexif.ImageIFD.ExifTag),
+    'GPS': ('0th', piexif.ImageIFD.GPSTag),
+    'Interop': ('Exif', piexif.ExifIFD.InteroperabilityTag),
+}
+
+
+class ReadStats:
+    """Counts the bytes and read calls used by the header-only reader."""
+
+    __slots__ = ('bytes_read', 'reads')
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.reads = 0
+
+
+class FileSource:
+    """Random-access reads on a file, with the first chunk kept in memory."""
+
+    def __init__(self, f, stats=None):
+        self._f = f
+        self._stats = stats
+        self.head = self._read_raw(0, HEAD_CHUNK_SIZE)
+
+    def _read_raw(self, offset, size):
+        self._f.seek(offset)
+        data = self._f.read(size)
+        if self._stats is not None:
+            self._stats.bytes_read += len(data)
+            self._stats.reads += 1
+        return data
+
+    def read_at(self, offset, size):
+        end = offset + size
+        if end <= len(self.head):
+            return self.head[offset:end]
+        return self._read_raw(offset, size)
+
+
+class BytesSource:
+    """The same interface as FileSource over an in-memory buffer."""
+
+    def __init__(self, data, base=0):
+        self._data = data
+        self._base = base
+
+    def read_at(self, offset, size):
+        start = self._base + offset
+        return self._data[start:start + size]
+
+
+def find_exif_segment(source):
+    """
+    Walks the JPEG marker segments until the APP1/Exif segment is found.
+
+    Only the 4-byte marker headers are read for other segments; their
+    payloads are skipped. The walk stops at the start of scan (SOS), so the
+    compressed image data is never touched.
+
+    Args:
+        source: An object with a read_at(offset, size) method.
+
+    Returns:
+        tuple: (offset, length) of the whole APP1 segment including its
+        marker, or None if the image has no EXIF segment.
+    """
+    pos = 2
+    while True:
+        head = source.read_at(pos, 4)
+        if len(head) < 4 or head[0] != 0xff:
+            return None
+        marker = head[1]
+        if marker == _SOS or marker == _EOI:
+            return None
+        length = struct.unpack('>H', head[2:4])[0]
+        if marker == _APP1 and source.read_at(pos + 4, 6) == _EXIF_HEADER:
+            return pos, length + 2
+        pos += length + 2
+
+
+class _TiffReader:
+    """Decodes selected IFD entries from a TIFF block, reading lazily."""
+
+    def __init__(self, source):
+        self._source = source
+        header = source.read_at(0, 8)
+        if len(header) < 8 or header[0:2] not in _TIFF_MAGIC:
+            raise piexif.InvalidImageDataError("Wrong TIFF header in EXIF data.")
+        self._endian = '<' if header[0:2] == b'II' else '>'
+        self._zeroth_offset = struct.unpack(self._endian + 'L', header[4:8])[0]
+        self._entries = {}
+
+    def _ifd_entries(self, ifd_name):
+        """Returns {tag: raw 12-byte entry} for one IFD, or None if absent."""
+        if ifd_name in self._entries:
+            return self._entries[ifd_name]
+
+        if ifd_name == '0th':
+            offset = self._zeroth_offset
+        elif ifd_name == '1st':
+            self._ifd_entries('0th')
+            offset = self._next_ifd_offset
+        else:
+            parent_name, pointer_tag = _IFD_POINTERS[ifd_name]
+            parent = self._ifd_entries(parent_name)
+            if parent is None or pointer_tag not in parent:
+                offset = None
+            else:
+                offset = self._decode(parent[pointer_tag])
+
+        entries = None
+        if offset:
+            count = struct.unpack(self._endian + 'H', self._source.read_at(offset, 2))[0]
+            table = self._source.read_at(offset + 2, 12 * count + 4)
+            entries = {}
+            for i in range(count):
+                entry = table[12 * i:12 * i + 12]
+                tag = struct.unpack(self._endian + 'H', entry[0:2])[0]
+                entries[tag] = entry
+            if ifd_name == '0th':
+                self._next_ifd_offset = struct.unpack(
+                    self._endian + 'L', table[12 * count:12 * count + 4])[0]
+        elif ifd_name == '0th':
+            self._next_ifd_offset = 0
+        self._entries[ifd_name] = entries
+        return entries
+
+    def _decode(self, entry):
+        """Converts one IFD entry to the same Python value piexif returns."""
+        value_type, count = struct.unpack(self._endian + 'HL', entry[2:8])
+        if value_type not in _TYPE_FORMATS:
+            raise ValueError(f"Exif might be wrong. Got incorrect value type {value_type}.")
+        fmt, size = _TYPE_FORMATS[value_type]
+        value = entry[8:12]
+        total = count * size
+        if total > 4 or value_type in (piexif.TYPES.Rational, piexif.TYPES.SRational,
+                                       piexif.TYPES.DFloat):
+            pointer = struct.unpack(self._endian + 'L', value)[0]
+            data = self._source.read_at(pointer, total)
+        else:
+            data = value[0:total]
+
+        if value_type == piexif.TYPES.Ascii:
+            # piexif drops the last byte (the NUL terminator) unconditionally.
+            return data[0:count - 1] if total > 4 else value[0:count - 1]
+        if value_type == piexif.TYPES.Undefined:
+            return data
+        items = struct.unpack(self._endian + fmt * count, data)
+        if len(fmt) == 2:
+            items = tuple(zip(items[0::2], items[1::2]))
+        return items[0] if len(items) == 1 else items
+
+    def get(self, ifd_name, tag):
+        # Like piexif.load, tags unknown to piexif are never returned.
+        if tag not in piexif.TAGS['Image' if ifd_name in ('0th', '1st') else ifd_name]:
+            return None
+        entries = self._ifd_entries(ifd_name)
+        if entries is None or tag not in entries:
+            return None
+        return self._decode(entries[tag])
+
+
+class _PiexifReader:
+    """The get() of _TiffReader over a whole file loaded by piexif."""
+
+    def __init__(self, data):
+        self._exif_dict = piexif.load(data)
+
+    def get(self, ifd_name, tag):
+        return (self._exif_dict.get(ifd_name) or {}).get(tag)
+
+
+def _read_into(values, reader, tags):
+    for ifd_name, tag in tags:
+        if (ifd_name, tag) not in values:
+            value = reader.get(ifd_name, tag)
+            if value is not None:
+                values[(ifd_name, tag)] = value
+
+
+def _read_tags(reader, tags, where=None):
+    values = {}
+    if where is not None:
+        # The filter's tags first: a file it rejects never has the IFDs
+        # that only the other tags live in parsed.
+        _read_into(values, reader, where.tags)
+        if not where.matches(values):
+            return None
+    _read_into(values, reader, tags)
+    return values
+
+
+def read_exif_tags(image_path, tags=SUMMARY_TAGS, stats=None, where=None):
+    """
+    Reads selected EXIF tags from an image without loading the whole file.
+
+    JPEG files are walked marker by marker up to the APP1/Exif segment and
+    TIFF files are read IFD by IFD, so only a few KB are read per file no
+    matter how large the image is. Other formats piexif understands (WebP)
+    fall back to piexif.load.
+
+    Args:
+        image_path (str): The path to the image file.
+        tags (iterable): (IFD name, tag id) pairs to read, e.g.
+            ('0th', piexif.ImageIFD.Make).
+        stats (ReadStats): Optional counters for bytes and reads.
+        where (ExifFilter): Optional filter (see exif_filter). Its tags are
+            read first, and the other tags only if the file matches.
+
+    Returns:
+        dict: {(IFD name, tag id): value} for the tags present in the file,
+        or None if where rejects the file. Values have the same types
+        piexif.load returns.
+
+    Raises:
+        piexif.InvalidImageDataError: If the file is not a supported image.
+    """
+    with open(image_path, 'rb') as f:
+        return read_exif_tags_from(f, tags, stats, where)
+
+
+def read_exif_tags_from(f, tags=SUMMARY_TAGS, stats=None, where=None):
+    """
+    Like read_exif_tags, on an open binary file object with seek and read
+    (e.g. an archive member wrapped by exif_archive.HeadBuffer).
+    """
+    source = FileSource(f, stats)
+    magic = source.head[0:2]
+    if magic == _SOI:
+        segment = find_exif_segment(source)
+        if segment is None:
+            return {} if where is None or where.matches({}) else None
+        offset, length = segment
+        app1 = source.read_at(offset, length)
+        # Skip the marker, the length field and the "Exif\0\0" header.
+        reader = _TiffReader(BytesSource(app1, 10))
+        return _read_tags(reader, tags, where)
+    if magic in _TIFF_MAGIC:
+        return _read_tags(_TiffReader(source), tags, where)
+    if source.head[0:4] == b'RIFF' and source.head[8:12] == b'WEBP':
+        f.seek(0)
+        data = f.read()
+        if stats is not None:
+            stats.bytes_read += len(data)
+            stats.reads += 1
+        return _read_tags(_PiexifReader(data), tags, where)
+    raise piexif.InvalidImageDataError("Given file is neither JPEG nor TIFF.")
@@ -0,0 +1,240 @@
+from collections.abc import Mapping
+import piexif
+from tag_registry import lookup_tag
+
+# What a record shows for a tag the file does not have, and for every
+# tag of a file that could not be read.
+NOT_AVAILABLE = 'N/A'
+READ_ERROR = '讀取失敗'
+
+# Raw values shared between records are kept once per schema, up to this
+# many distinct values (camera makes and models repeat; serials do not).
+_INTERN_LIMIT = 65536
+
+
+class _Sentinel:
+    """A named marker stored in place of a value; pickles to the same object."""
+
+    __slots__ = ('_name',)
+
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return self._name
+
+    def __reduce__(self):
+        return self._name
+
+
+# Stored for a tag the file does not have.
+MISSING = _Sentinel('MISSING')
+# Stored instead of the values of a file that could not be read.
+READ_FAILED = _Sentinel('READ_FAILED')
+
+# The summary fields and their tags; other fields are looked up by tag
+# name in the tag registry (e.g. 'fnumber', 'gps.gpsaltitude').
+SUMMARY_FIELDS = {
+    'make': ('0th', piexif.ImageIFD.Make),
+    'model': ('0th', piexif.ImageIFD.Model),
+    'lens_model': ('Exif', piexif.ExifIFD.LensModel),
+}
+
+
+_RATIONAL_TYPES = (piexif.TYPES.Rational, piexif.TYPES.SRational)
+
+
+def decode_value(value, value_type=None):
+    """
+    Formats a raw tag value (as piexif returns it) for display.
+
+    Text is decoded as UTF-8, rationals become 'n/d' and sequences are
+    joined with ', '. Missing and empty values become NOT_AVAILABLE.
+
+    Args:
+        value: The raw value, or MISSING.
+        value_type (int): The piexif.TYPES type of the tag; tells a
+            rational from a pair of integers.
+    """
+    if value is MISSING:
+        return NOT_AVAILABLE
+    if isinstance(value, bytes):
+        text = value.decode('utf-8', 'ignore')
+    elif isinstance(value, str):
+        text = value
+    elif isinstance(value, tuple):
+        if value_type in _RATIONAL_TYPES:
+            items = value if value and isinstance(value[0], tuple) else (value,)
+            text = ', '.join(f'{numerator}/{denominator}' for numerator, denominator in items)
+        else:
+            text = ', '.join(str(item) for item in value)
+    else:
+        text = str(value)
+    return text if text else NOT_AVAILABLE
+
+
+def field_tag(field):
+    """
+    Returns the tag behind a field, as (IFD name, tag id, piexif.TYPES type).
+
+    Args:
+        field (str): A key of SUMMARY_FIELDS or a tag name from the tag
+            registry.
+
+    Raises:
+        KeyError: If the field is not a known tag.
+    """
+    if field in SUMMARY_FIELDS:
+        ifd, tag = SUMMARY_FIELDS[field]
+        return ifd, tag, piexif.TAGS['Image' if ifd == '0th' else ifd][tag]['type']
+    spec = lookup_tag(field)
+    return spec.ifd, spec.tag, spec.type
+
+
+class RecordSchema:
+    """
+    The fields of a set of records and the tags behind them.
+
+    Records only hold a reference to their schema, so the field names are
+    stored once. Use record_schema to get the shared instance for a set of
+    fields.
+    """
+
+    __slots__ = ('fields', 'tags', 'types', 'positions', '_interned')
+
+    def __init__(self, fields):
+        tags = []
+        types = []
+        unknown = []
+        for field in fields:
+            try:
+                ifd, tag, value_type = field_tag(field)
+            except KeyError:
+                unknown.append(field)
+                continue
+            tags.append((ifd, tag))
+            types.append(value_type)
+        if unknown:
+            raise ValueError(f"Unknown EXIF field(s): {', '.join(unknown)}")
+        self.fields = tuple(fields)
+        self.tags = tuple(tags)
+        self.types = tuple(types)
+        self.positions = {field: i for i, field in enumerate(self.fields)}
+        self._interned = {}
+
+    def __reduce__(self):
+        # Unpickled records (e.g. from worker processes) share the schema.
+        return record_schema, (self.fields,)
+
+    def _intern(self, value):
+        interned = self._interned.get(value)
+        if interned is not None:
+            return interned
+        if len(self._interned) < _INTERN_LIMIT:
+            return self._interned.setdefault(value, value)
+        return value
+
+    def record(self, filename, tags):
+        """
+        Builds the record of one file.
+
+        Args:
+            filename (str): The file name.
+            tags (dict): {(IFD name, tag id): raw value}, as returned by
+                exif_reader.read_exif_tags for self.tags.
+        """
+        return ExifRecord(filename, self, tuple(self._intern(tags.get(tag, MISSING)) for tag in self.tags))
+
+    def failed(self, filename):
+        """Builds the record of a file that could not be read."""
+        return ExifRecord(filename, self, READ_FAILED)
+
+    def from_mapping(self, mapping):
+        """
+        Builds a record from a dict of display values, such as the records
+        stored in the scan index.
+        """
+        values = [mapping.get(field, NOT_AVAILABLE) for field in self.fields]
+        if values and all(value == READ_ERROR for value in values):
+            return self.failed(mapping['filename'])
+        return ExifRecord(mapping['filename'], self, tuple(
+            MISSING if value == NOT_AVAILABLE else self._intern(value) for value in values))
+
+
+_SCHEMAS = {}
+
+
+def record_schema(fields=None):
+    """
+    Returns the shared RecordSchema for some fields.
+
+    Args:
+        fields (iterable): Field names: keys of SUMMARY_FIELDS or tag
+            names from the tag registry. None means the summary fields.
+
+    Raises:
+        ValueError: If a field is not a known tag.
+    """
+    fields = tuple(SUMMARY_FIELDS) if fields is None else tuple(fields)
+    schema = _SCHEMAS.get(fields)
+    if schema is None:
+        schema = _SCHEMAS.setdefault(fields, RecordSchema(fields))
+    return schema
+
+
+class ExifRecord(Mapping):
+    """
+    The summary record of one image file.
+
+    A record keeps the raw tag values and decodes a value only when it is
+    read, so large scans hold bytes and shared objects instead of four
+    strings per file. It is a read-only mapping with the keys 'filename'
+    and the schema's fields, and compares equal to the equivalent dict:
+
+        record['make']        # 'Nikon', or 'N/A' if the tag is missing
+        dict(record)          # {'filename': ..., 'make': ..., ...}
+
+    Args:
+        filename (str): The file name.
+        schema (RecordSchema): The fields of the record.
+        values (tuple): The raw values in field order (MISSING where the
+            file has no such tag), or READ_FAILED.
+    """
+
+    __slots__ = ('filename', 'schema', '_values')
+
+    def __init__(self, filename, schema, values):
+        self.filename = filename
+        self.schema = schema
+        self._values = values
+
+    @property
+    def failed(self):
+        """Whether the file could not be read."""
+        return self._values is READ_FAILED
+
+    def raw(self, field):
+        """Returns the undecoded value of a field, MISSING or READ_FAILED."""
+        position = self.schema.positions[field]
+        return self._values if self._values is READ_FAILED else self._values[position]
+
+    def __getitem__(self, key):
+        if key == 'filename':
+            return self.filename
+        position = self.schema.positions[key]
+        if self._values is READ_FAILED:
+            return READ_ERROR
+        return decode_value(self._values[position], self.schema.types[position])
+
+    def __iter__(self):
+        yield 'filename'
+        yield from self.schema.fields
+
+    def __len__(self):
+        return len(self.schema.fields) + 1
+
+    def __reduce__(self):
+        return ExifRecord, (self.filename, self.schema, self._values)
+
+    def __repr__(self):
+        return f'ExifRecord({dict(self)!r})'
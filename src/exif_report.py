@@ -0,0 +1,263 @@
+import argparse
+import collections
+import configparser
+import csv
+import json
+import operator
+import sys
+from array import array
+from exif_editor import iter_exif_summary, make_finder
+from exif_record import ExifRecord, NOT_AVAILABLE, READ_ERROR, MISSING, READ_FAILED
+
+REPORT_COLUMNS = ('make', 'model', 'lens_model')
+DEFAULT_GROUP_BY = ('make', 'model')
+FORMATS = ('table', 'json', 'csv')
+
+# Codes every column reserves for a missing tag and an unreadable file.
+_MISSING = 0
+_READ_ERROR = 1
+
+
+class _CategoricalColumn:
+    """
+    One dictionary-encoded column: an array of codes and the distinct labels.
+
+    Codes start as 2-byte items and widen to 4 bytes if a column ever has
+    more than 65536 distinct values.
+    """
+
+    __slots__ = ('codes', 'labels', 'by_raw', '_by_label')
+
+    def __init__(self):
+        self.codes = array('H')
+        self.labels = [NOT_AVAILABLE, READ_ERROR]
+        # Raw value (bytes from an ExifRecord, or a display string) -> code.
+        self.by_raw = {MISSING: _MISSING, NOT_AVAILABLE: _MISSING, READ_FAILED: _READ_ERROR,
+                       READ_ERROR: _READ_ERROR}
+        self._by_label = {NOT_AVAILABLE: _MISSING, READ_ERROR: _READ_ERROR}
+
+    def add_raw(self, raw, label):
+        """Returns the code of a raw value not seen before."""
+        # The same text may already have a code (e.g. bytes from a parsed
+        # file and a string from the scan index).
+        code = self._by_label.get(label)
+        if code is None:
+            code = self._by_label[label] = len(self.labels)
+            self.labels.append(label)
+            if code > 0xffff and self.codes.typecode == 'H':
+                self.codes = array('I', self.codes)
+        self.by_raw[raw] = code
+        return code
+
+
+class ExifReport:
+    """
+    Counts EXIF summary values over a scan, column by column.
+
+    Records are dictionary-encoded as they stream in: each column keeps one
+    small integer code per file and the list of distinct values, so the
+    memory per file is a few bytes no matter how long the values are.
+    Records are never kept.
+
+    The counts are then taken over the code arrays with C-level helpers
+    (array.count, Counter over zip), without a Python loop per file. numpy
+    is not a dependency of the project; these builtins keep a 2M-file
+    report within a couple of seconds.
+
+    Args:
+        columns (tuple): The record fields to encode.
+    """
+
+    def __init__(self, columns=REPORT_COLUMNS):
+        self.columns = tuple(columns)
+        self._columns = {column: _CategoricalColumn() for column in self.columns}
+        self._encoders = tuple(self._columns.items())
+        self.total_files = 0
+
+    def add(self, record):
+        """Adds the values of one summary record (an ExifRecord or a dict)."""
+        self.total_files += 1
+        is_record = isinstance(record, ExifRecord)
+        for column, encoded in self._encoders:
+            # Raw values are looked up first, so each distinct value is
+            # decoded once per report rather than once per file.
+            raw = record.raw(column) if is_record else record.get(column, NOT_AVAILABLE)
+            code = encoded.by_raw.get(raw)
+            if code is None:
+                code = encoded.add_raw(raw, record[column] if is_record else raw)
+            encoded.codes.append(code)
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+        return self
+
+    def _check(self, columns):
+        unknown = [column for column in columns if column not in self._columns]
+        if unknown:
+            raise ValueError(f"Unknown report column(s): {', '.join(unknown)}")
+
+    @property
+    def read_errors(self):
+        """The number of files whose EXIF could not be read."""
+        if not self.columns:
+            return 0
+        return self._columns[self.columns[0]].codes.count(_READ_ERROR)
+
+    def column_stats(self):
+        """Returns {column: {'missing': files without the tag, 'distinct': distinct values}}."""
+        return {
+            column: {
+                'missing': encoded.codes.count(_MISSING),
+                'distinct': len(encoded.labels) - 2,
+            }
+            for column, encoded in self._columns.items()
+        }
+
+    def group_counts(self, by=DEFAULT_GROUP_BY, missing=None):
+        """
+        Counts the files per combination of values, most frequent first.
+
+        Args:
+            by (tuple): The columns to group by.
+            missing (tuple): Columns whose missing values are counted per
+                group. Defaults to the report columns not grouped by.
+
+        Returns:
+            list: One dict per group: the group values, 'files', and a
+            'missing' dict of per-column counts.
+
+        Raises:
+            ValueError: If a column is not in the report.
+        """
+        by = tuple(by)
+        if missing is None:
+            missing = tuple(column for column in self.columns if column not in by)
+        self._check(by + tuple(missing))
+        keys = [self._columns[column].codes for column in by]
+
+        if keys:
+            files = collections.Counter(zip(*keys))
+        else:
+            files = collections.Counter({(): self.total_files} if self.total_files else {})
+        missing_counts = {}
+        for column in missing:
+            # One extra key item, True where the tag is missing (code 0).
+            flagged = collections.Counter(zip(*keys, map(operator.not_, self._columns[column].codes)))
+            missing_counts[column] = {key[:-1]: count for key, count in flagged.items() if key[-1]}
+
+        groups = []
+        for key, count in files.most_common():
+            group = {column: self._columns[column].labels[code] for column, code in zip(by, key)}
+            group['files'] = count
+            group['missing'] = {column: missing_counts[column].get(key, 0) for column in missing}
+            groups.append(group)
+        return groups
+
+    def to_dict(self, by=DEFAULT_GROUP_BY, missing=None):
+        """Returns the whole report as a JSON-compatible dict."""
+        return {
+            'total_files': self.total_files,
+            'read_errors': self.read_errors,
+            'columns': self.column_stats(),
+            'group_by': list(by),
+            'groups': self.group_counts(by, missing),
+        }
+
+
+def build_report(records, columns=REPORT_COLUMNS):
+    """Returns an ExifReport over summary records (e.g. iter_exif_summary)."""
+    return ExifReport(columns).extend(records)
+
+
+def _group_rows(report, by, missing):
+    for group in report['groups']:
+        yield [group[column] for column in by] + [group['files']] + [group['missing'][column] for column in missing]
+
+
+def write_report(report, output_format='table', out=None):
+    """
+    Writes a report dict (see ExifReport.to_dict) as a table, JSON or CSV.
+
+    The CSV has one row per group; the table also lists the per-column
+    missing-tag totals.
+    """
+    out = out or sys.stdout
+    by = report['group_by']
+    missing = list(report['groups'][0]['missing']) if report['groups'] else []
+    if output_format == 'json':
+        json.dump(report, out, ensure_ascii=False, indent=2)
+        out.write('\n')
+        return
+    header = list(by) + ['files'] + [f'missing_{column}' for column in missing]
+    if output_format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(header)
+        writer.writerows(_group_rows(report, by, missing))
+        return
+
+    out.write(f"Files: {report['total_files']}  Read errors: {report['read_errors']}\n")
+    for column, stats in report['columns'].items():
+        share = stats['missing'] / report['total_files'] * 100 if report['total_files'] else 0.0
+        out.write(f"  {column:<12} missing {stats['missing']:>8} ({share:5.1f}%)  distinct {stats['distinct']:>6}\n")
+    rows = [[str(value) for value in row] for row in _group_rows(report, by, missing)]
+    widths = [max([len(heading)] + [len(row[i]) for row in rows]) for i, heading in enumerate(header)]
+    out.write('\n' + ' | '.join(f"{heading:<{width}}" for heading, width in zip(header, widths)) + '\n')
+    out.write('-+-'.join('-' * width for width in widths) + '\n')
+    for row in rows:
+        out.write(' | '.join(f"{value:<{width}}" for value, width in zip(row, widths)) + '\n')
+
+
+def parse_columns(text):
+    """
+    Parses comma-separated report columns (e.g. 'make,model').
+
+    Raises:
+        argparse.ArgumentTypeError: If a column is not one of REPORT_COLUMNS.
+    """
+    columns = tuple(column.strip() for column in text.split(',') if column.strip())
+    unknown = [column for column in columns if column not in REPORT_COLUMNS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown column(s): {', '.join(unknown)}")
+    return columns
+
+
+def report_directory(directory_path, config_path='config/config.ini', group_by=DEFAULT_GROUP_BY, missing=None,
+                     output_format='table', jobs=1, index=None, out=None):
+    """
+    Scans a directory and writes its report.
+
+    Args:
+        directory_path (str): The path to the directory containing images.
+        config_path (str): The config file whose [Settings] select the files.
+        group_by (tuple): The columns to group by.
+        missing (tuple): The columns whose missing tags are counted per
+            group. Defaults to the columns not grouped by.
+        output_format (str): One of FORMATS.
+        jobs (int): The number of files to parse in parallel.
+        index (ScanIndex): Optional scan index to skip unchanged files.
+        out: The text stream to write to. Defaults to sys.stdout.
+
+    Returns:
+        dict: The report (see ExifReport.to_dict), or None if the config
+        is invalid.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    target_extensions = [ext.strip() for ext in config.get('Settings', 'target_extensions',
+                                                           fallback='.jpg,.jpeg,.tif,.tiff').split(',')]
+    try:
+        finder = make_finder(config, target_extensions)
+    except ValueError as e:
+        print(f"Error: Invalid [Settings] section: {e}", file=sys.stderr)
+        return None
+    report = build_report(iter_exif_summary(directory_path, finder, jobs=jobs, index=index))
+    report = report.to_dict(group_by, missing)
+    write_report(report, output_format, out)
+    return report
+
+
+if __name__ == '__main__':
+    # The command line lives in exif_cli (`exif_cli.py report`).
+    from exif_cli import main
+    sys.exit(main(['report'] + sys.argv[1:]))
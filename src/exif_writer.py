@@ -0,0 +1,260 @@
+import os
+import struct
+import tempfile
+import shutil
+from exif_reader import FileSource, ReadStats, find_exif_segment
+
+_SOI = b'\xff\xd8'
+_APP0 = 0xe0
+_APP1_MARKER = b'\xff\xe1'
+
+# A JPEG segment length is a 16-bit field that counts itself.
+MAX_SEGMENT_PAYLOAD = 0xffff - 2
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class WriteStats(ReadStats):
+    """Counts the bytes read and written while updating one file."""
+
+    __slots__ = ('bytes_written', 'in_place')
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_written = 0
+        self.in_place = False
+
+
+class ExifLocation:
+    """
+    Where the EXIF segment of a JPEG file is, or where it would go.
+
+    Attributes:
+        offset (int): The offset of the APP1 marker, or the insertion point.
+        length (int): The length of the whole segment, 0 if there is none.
+        segment (bytes): The whole APP1 segment, or None.
+    """
+
+    __slots__ = ('offset', 'length', 'segment')
+
+    def __init__(self, offset, length, segment):
+        self.offset = offset
+        self.length = length
+        self.segment = segment
+
+    @property
+    def exif_bytes(self):
+        """The segment payload in piexif.dump format (b'Exif\\0\\0...')."""
+        return self.segment[4:] if self.segment else None
+
+
+def is_jpeg(image_path):
+    with open(image_path, 'rb') as f:
+        return f.read(2) == _SOI
+
+
+def locate_exif(f, stats=None):
+    """
+    Finds the APP1/Exif segment of an open JPEG file.
+
+    When the file has no EXIF segment, the location is the insertion point:
+    right after SOI, or after the JFIF APP0 segment if it follows SOI.
+
+    Args:
+        f: A JPEG file opened in binary mode.
+        stats (ReadStats): Optional read counters.
+
+    Returns:
+        ExifLocation: The segment location.
+    """
+    source = FileSource(f, stats)
+    if source.head[0:2] != _SOI:
+        raise ValueError("Given file isn't JPEG.")
+    found = find_exif_segment(source)
+    if found is not None:
+        offset, length = found
+        return ExifLocation(offset, length, source.read_at(offset, length))
+
+    offset = 2
+    head = source.read_at(2, 4)
+    if len(head) == 4 and head[0] == 0xff and head[1] == _APP0:
+        offset += struct.unpack('>H', head[2:4])[0] + 2
+    return ExifLocation(offset, 0, None)
+
+
+def build_segment(exif_bytes, length=None):
+    """
+    Wraps piexif.dump output in an APP1 segment.
+
+    Args:
+        exif_bytes (bytes): EXIF data starting with b'Exif\\0\\0'.
+        length (int): Pad the segment with zeros to this total length.
+            Readers ignore bytes after the TIFF structure.
+
+    Returns:
+        bytes: The APP1 segment including its marker.
+    """
+    if len(exif_bytes) > MAX_SEGMENT_PAYLOAD:
+        raise ValueError(f"EXIF data is too large for one APP1 segment ({len(exif_bytes)} bytes).")
+    if length is not None:
+        exif_bytes = exif_bytes + b'\x00' * (length - 4 - len(exif_bytes))
+    return _APP1_MARKER + struct.pack('>H', len(exif_bytes) + 2) + exif_bytes
+
+
+def copy_range(src_fd, dst_fd, offset, count):
+    """
+    Copies count bytes from src_fd at offset to the position of dst_fd.
+
+    Uses os.copy_file_range or os.sendfile where the platform has them, so
+    the data does not pass through Python memory; otherwise falls back to
+    chunked reads.
+
+    Returns:
+        int: The number of bytes copied.
+    """
+    copied = 0
+    for fast_copy in (_copy_file_range, _sendfile):
+        try:
+            while copied < count:
+                n = fast_copy(src_fd, dst_fd, offset + copied, count - copied)
+                if n == 0:
+                    return copied
+                copied += n
+            return copied
+        except (AttributeError, OSError):
+            # Not available here, or not supported between these files.
+            # Anything already copied stays; continue from that point.
+            continue
+    while copied < count:
+        data = os.pread(src_fd, min(_COPY_CHUNK_SIZE, count - copied), offset + copied)
+        if not data:
+            break
+        os.write(dst_fd, data)
+        copied += len(data)
+    return copied
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def replace_segment(image_path, location, new_segment, stats=None, fsync=False):
+    """
+    Replaces the bytes of one segment by streaming into a temp file.
+
+    The file is rebuilt as head + new_segment + tail next to the original
+    and then renamed over it with os.replace, so a crash leaves either the
+    old or the new file, never a partial one.
+
+    Args:
+        image_path (str): The path to the JPEG file.
+        location (ExifLocation): The segment to replace (or insert at).
+        new_segment (bytes): The new segment bytes, b'' to remove it.
+        stats (WriteStats): Optional I/O counters.
+        fsync (bool): Flush the new file to disk before the rename. The
+            rename itself is durable once the directory is synced (see
+            durability.fsync_directory).
+
+    Raises:
+        OSError: If the file was cut short while being copied (e.g. it was
+            truncated meanwhile); the original is left as it is.
+    """
+    directory, name = os.path.split(os.path.abspath(image_path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+    try:
+        with open(image_path, 'rb') as src:
+            src_fd = src.fileno()
+            size = os.fstat(src_fd).st_size
+            tail_offset = location.offset + location.length
+            copied = copy_range(src_fd, fd, 0, location.offset)
+            os.write(fd, new_segment)
+            copied += copy_range(src_fd, fd, tail_offset, size - tail_offset)
+        if copied != size - location.length:
+            raise OSError(f"{image_path} changed while it was being rewritten: copied {copied} of "
+                          f"{size - location.length} bytes")
+        if fsync:
+            os.fsync(fd)
+        os.close(fd)
+        fd = None
+        shutil.copymode(image_path, temp_path)
+        os.replace(temp_path, image_path)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        os.unlink(temp_path)
+        raise
+    if stats is not None:
+        stats.bytes_read += copied
+        stats.reads += 1
+        stats.bytes_written += copied + len(new_segment)
+
+
+def replace_file(path, data, fsync=False):
+    """
+    Replaces the contents of a file through a temp file and os.replace.
+
+    Like replace_segment, a crash leaves either the old or the new file.
+
+    Args:
+        path (str): The file to replace.
+        data (bytes): The new contents.
+        fsync (bool): Flush the new file to disk before the rename.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory)
+    try:
+        with open(fd, 'wb') as f:
+            fd = None
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        os.unlink(temp_path)
+        raise
+
+
+def write_exif(image_path, exif_bytes, location=None, stats=None, fsync=False):
+    """
+    Writes EXIF data into a JPEG file, touching as few bytes as possible.
+
+    If the new APP1 segment fits in the existing one, it is padded to the
+    same length and written over it in place. Otherwise the file is rebuilt
+    in a temp file and atomically swapped in (see replace_segment).
+
+    Args:
+        image_path (str): The path to the JPEG file.
+        exif_bytes (bytes): EXIF data as returned by piexif.dump.
+        location (ExifLocation): The current segment location, if the
+            caller already looked it up.
+        stats (WriteStats): Optional I/O counters.
+        fsync (bool): Flush the written bytes to disk before returning (or,
+            for a rebuilt file, before it is renamed over the original).
+    """
+    if location is None:
+        with open(image_path, 'rb') as f:
+            location = locate_exif(f, stats)
+
+    needed = len(exif_bytes) + 4
+    if location.length and needed <= location.length:
+        segment = build_segment(exif_bytes, location.length)
+        with open(image_path, 'r+b') as f:
+            f.seek(location.offset)
+            f.write(segment)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        if stats is not None:
+            stats.bytes_written += len(segment)
+            stats.in_place = True
+        return
+
+    replace_segment(image_path, location, build_segment(exif_bytes), stats, fsync)
@@ -2,11 +2,30 @@ import tkinter as tk
 from tkinter import filedialog, scrolledtext, ttk
 import configparser
 import os
-from exif_editor import process_directory, get_exif_summary_from_directory
+from exif_editor import process_directory, iter_exif_summary, make_finder
+from exif_filter import parse_where
 from cleanup_backups import cleanup_backups
+from summary_store import SummaryStore
+from exif_report import ExifReport, DEFAULT_GROUP_BY
+from progress import ProgressTracker, FileError, RunError, RunSummary, ProfileReport
+from profiler import Profiler
 import threading
 import queue
 
+SUMMARY_HEADINGS = {
+    'filename': 'Filename',
+    'make': 'Make',
+    'model': 'Model',
+    'lens_model': 'Lens Model',
+}
+
+# Rows taken from the scanner per after() tick, so the window stays
+# responsive while a large directory streams in.
+SUMMARY_ROWS_PER_TICK = 2000
+
+# Progress events handled per after() tick during processing.
+PROGRESS_EVENTS_PER_TICK = 5000
+
 class ExifEditorGUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -72,17 +91,57 @@ class ExifEditorGUI(tk.Tk):
         summary_frame = tk.LabelFrame(self, text="EXIF Summary", padx=10, pady=10)
         summary_frame.pack(padx=10, pady=10, fill="both", expand=True)
 
-        self.summary_tree = ttk.Treeview(summary_frame, columns=("filename", "make", "model", "lens_model"), show="headings")
-        self.summary_tree.heading("filename", text="Filename")
-        self.summary_tree.heading("make", text="Make")
-        self.summary_tree.heading("model", text="Model")
-        self.summary_tree.heading("lens_model", text="Lens Model")
+        filter_frame = tk.Frame(summary_frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        tk.Label(filter_frame, text="Filter").pack(side="left")
+        self.summary_filter_column = ttk.Combobox(filter_frame, values=list(SUMMARY_HEADINGS.values()),
+                                                  state="readonly", width=12)
+        self.summary_filter_column.set(SUMMARY_HEADINGS['filename'])
+        self.summary_filter_column.pack(side="left", padx=5)
+        self.summary_filter_column.bind('<<ComboboxSelected>>', self.apply_summary_filter)
+        self.summary_filter_entry = tk.Entry(filter_frame)
+        self.summary_filter_entry.pack(side="left", fill="x", expand=True)
+        self.summary_filter_entry.bind('<KeyRelease>', self.apply_summary_filter)
+        report_button = tk.Button(filter_frame, text="Report", command=self.show_report)
+        report_button.pack(side="right")
+        self.summary_count_label = tk.Label(filter_frame, text="")
+        self.summary_count_label.pack(side="right", padx=5)
+
+        # Unlike the filter above, which hides loaded rows, these conditions
+        # go to the scanner, so files that do not match are never loaded.
+        where_frame = tk.Frame(summary_frame)
+        where_frame.pack(fill="x", pady=(0, 5))
+        tk.Label(where_frame, text="Where").pack(side="left")
+        self.summary_where_entry = tk.Entry(where_frame)
+        self.summary_where_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.summary_where_entry.bind('<Return>', self.rescan_summary)
+        tk.Label(where_frame, text="e.g. make=Canon; missing=lensmodel").pack(side="left")
+
+        # The tree only holds enough items to fill its visible height; they
+        # are refilled from self.summary_store as the user scrolls.
+        tree_frame = tk.Frame(summary_frame)
+        tree_frame.pack(fill="both", expand=True)
+        self.summary_tree = ttk.Treeview(tree_frame, columns=SummaryStore.COLUMNS, show="headings")
+        for column, heading in SUMMARY_HEADINGS.items():
+            self.summary_tree.heading(column, text=heading, command=lambda c=column: self.sort_summary(c))
 
         self.summary_tree.column("filename", width=200)
         self.summary_tree.column("make", width=100)
         self.summary_tree.column("model", width=150)
         self.summary_tree.column("lens_model", width=200)
-        self.summary_tree.pack(fill="both", expand=True)
+        self.summary_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.scroll_summary)
+        self.summary_scrollbar.pack(side="right", fill="y")
+        self.summary_tree.pack(side="left", fill="both", expand=True)
+        self.summary_tree.bind('<Configure>', self.resize_summary)
+        self.summary_tree.bind('<MouseWheel>', self.on_summary_wheel)
+        self.summary_tree.bind('<Button-4>', self.on_summary_wheel)
+        self.summary_tree.bind('<Button-5>', self.on_summary_wheel)
+
+        self.summary_store = SummaryStore()
+        # Counts per make/model and missing tags, built as records stream in.
+        self.summary_report = ExifReport()
+        self.summary_items = []
+        self.summary_offset = 0
 
         # Frame for actions
         action_frame = tk.Frame(self, padx=10, pady=10)
@@ -93,6 +152,18 @@ class ExifEditorGUI(tk.Tk):
 
         cleanup_button = tk.Button(action_frame, text="Cleanup Backups", command=self.cleanup_backups_thread)
         cleanup_button.pack(side="left")
+        # Off: remove only the backups listed in the runs' manifests.
+        self.cleanup_walk = tk.BooleanVar(value=False)
+        tk.Checkbutton(action_frame, text="All .bak files (walk)", variable=self.cleanup_walk).pack(side="left")
+
+        # Progress of the current processing run
+        progress_frame = tk.Frame(self, padx=10)
+        progress_frame.pack(fill="x")
+
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="determinate", maximum=1.0)
+        self.progress_bar.pack(side="left", fill="x", expand=True)
+        self.progress_label = tk.Label(progress_frame, text="", anchor="e")
+        self.progress_label.pack(side="right", padx=5)
 
         # Frame for output log
         log_frame = tk.LabelFrame(self, text="Log", padx=10, pady=10)
@@ -164,39 +235,173 @@ class ExifEditorGUI(tk.Tk):
             self.dir_label.config(text=directory)
             self.update_exif_summary()
 
+    def rescan_summary(self, event=None):
+        if getattr(self, 'directory_path', None):
+            self.update_exif_summary()
+
     def update_exif_summary(self):
-        for i in self.summary_tree.get_children():
-            self.summary_tree.delete(i)
+        try:
+            where = parse_where(self.summary_where_entry.get().split(';'))
+        except ValueError as e:
+            self.log(f"Error: {e}")
+            return
+        self.summary_store.clear()
+        self.summary_report = ExifReport()
+        self.summary_offset = 0
+        self.update_summary_headings()
+        self.apply_summary_filter()
+
+        target_extensions = self.config.get('Settings', 'target_extensions', fallback='.jpg,.jpeg,.tif,.tiff').split(',')
+        try:
+            finder = make_finder(self.config, target_extensions)
+        except ValueError as e:
+            self.log(f"Error: Invalid [Settings] section: {e}")
+            return
 
         self.summary_queue = queue.Queue()
         self.summary_thread = threading.Thread(
             target=self.run_summary_update,
-            args=(self.directory_path, self.summary_queue)
+            args=(self.directory_path, finder, self.summary_queue, where)
         )
         self.summary_thread.start()
-        self.process_summary_queue()
-
-    def run_summary_update(self, directory_path, q):
-        target_extensions = self.config.get('Settings', 'target_extensions', fallback='.jpg,.jpeg,.tif,.tiff').split(',')
-        summary_data = get_exif_summary_from_directory(directory_path, target_extensions)
-        q.put(summary_data)
-
-    def process_summary_queue(self):
+        self.process_summary_queue(self.summary_queue)
+
+    def open_scan_index(self):
+        # Called from worker threads; each one gets its own connection.
+        if not self.config.getboolean('Settings', 'scan_index', fallback=True):
+            return None
+        # Imported here, so sqlite3 is only loaded when the index is used.
+        from scan_index import ScanIndex
+        return ScanIndex()
+
+    def run_summary_update(self, directory_path, finder, q, where=None):
+        jobs = self.config.getint('Settings', 'jobs', fallback=4)
+        index = self.open_scan_index()
+        batch = []
         try:
-            summary_data = self.summary_queue.get_nowait()
-            for item in summary_data:
-                values = (
-                    item['filename'],
-                                    item.get('make', 'N/A'),
-                                    item.get('model', 'N/A'),
-                                    item.get('lens_model', 'N/A')                )
-                self.summary_tree.insert('', 'end', values=values)
-        except queue.Empty:
-            if self.summary_thread.is_alive():
-                self.after(100, self.process_summary_queue)
-
-
-
+            for item in iter_exif_summary(directory_path, finder, jobs=jobs, index=index, where=where):
+                batch.append(item)
+                if len(batch) >= 100:
+                    q.put(batch)
+                    batch = []
+        finally:
+            if index is not None:
+                index.close()
+            q.put(batch)
+            q.put(None)
+
+    def process_summary_queue(self, q):
+        if q is not self.summary_queue:
+            # A newer directory selection has taken over.
+            return
+        added = 0
+        while added < SUMMARY_ROWS_PER_TICK:
+            try:
+                summary_data = q.get_nowait()
+            except queue.Empty:
+                break
+            if summary_data is None:
+                self.render_summary()
+                return
+            self.summary_store.append(summary_data)
+            self.summary_report.extend(summary_data)
+            added += len(summary_data)
+        if added:
+            self.render_summary()
+        self.after(50 if added else 100, self.process_summary_queue, q)
+
+    def resize_summary(self, event=None):
+        rowheight = ttk.Style().lookup('Treeview', 'rowheight')
+        rowheight = int(rowheight) if rowheight else 20
+        # One row's worth of height is taken by the headings.
+        visible = max(1, self.summary_tree.winfo_height() // rowheight - 1)
+        while len(self.summary_items) < visible:
+            self.summary_items.append(self.summary_tree.insert('', 'end'))
+        while len(self.summary_items) > visible:
+            self.summary_tree.delete(self.summary_items.pop())
+        self.render_summary()
+
+    def render_summary(self):
+        total = len(self.summary_store)
+        visible = len(self.summary_items)
+        self.summary_offset = max(0, min(self.summary_offset, total - visible))
+        rows = self.summary_store.rows(self.summary_offset, self.summary_offset + visible)
+        for position, item in enumerate(self.summary_items):
+            if position < len(rows):
+                self.summary_tree.item(item, values=rows[position])
+                self.summary_tree.move(item, '', position)
+            else:
+                self.summary_tree.detach(item)
+
+        if total:
+            self.summary_scrollbar.set(self.summary_offset / total, (self.summary_offset + len(rows)) / total)
+        else:
+            self.summary_scrollbar.set(0, 1)
+        self.summary_count_label.config(text=f"{total} / {self.summary_store.total} files")
+
+    def scroll_summary(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.summary_offset = int(float(amount) * len(self.summary_store))
+        elif action == 'scroll':
+            step = len(self.summary_items) if unit == 'pages' else 1
+            self.summary_offset += int(amount) * step
+        self.render_summary()
+
+    def on_summary_wheel(self, event):
+        direction = -1 if event.num == 4 or event.delta > 0 else 1
+        self.scroll_summary('scroll', direction * 3, 'units')
+        return 'break'
+
+    def sort_summary(self, column):
+        descending = self.summary_store.sort_column == column and not self.summary_store.sort_descending
+        self.summary_store.sort(column, descending)
+        self.update_summary_headings()
+        self.render_summary()
+
+    def update_summary_headings(self):
+        for column, heading in SUMMARY_HEADINGS.items():
+            if column == self.summary_store.sort_column:
+                heading += ' ▼' if self.summary_store.sort_descending else ' ▲'
+            self.summary_tree.heading(column, text=heading)
+
+    def apply_summary_filter(self, event=None):
+        titles = {heading: column for column, heading in SUMMARY_HEADINGS.items()}
+        column = titles.get(self.summary_filter_column.get(), 'filename')
+        self.summary_store.set_filter(column, self.summary_filter_entry.get())
+        self.summary_offset = 0
+        self.render_summary()
+
+    def show_report(self):
+        report = self.summary_report
+        missing = [column for column in report.columns if column not in DEFAULT_GROUP_BY]
+        window = tk.Toplevel(self)
+        window.title("EXIF Report")
+        window.geometry("700x400")
+
+        overview = [f"Files: {report.total_files}", f"Read errors: {report.read_errors}"]
+        for column, stats in report.column_stats().items():
+            overview.append(f"Missing {SUMMARY_HEADINGS[column]}: {stats['missing']}")
+        tk.Label(window, text="    ".join(overview), anchor="w").pack(fill="x", padx=10, pady=5)
+
+        columns = list(DEFAULT_GROUP_BY) + ['files'] + [f'missing_{column}' for column in missing]
+        tree_frame = tk.Frame(window)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column in DEFAULT_GROUP_BY:
+            tree.heading(column, text=SUMMARY_HEADINGS[column])
+        tree.heading('files', text="Files")
+        tree.column('files', width=80, anchor="e")
+        for column in missing:
+            tree.heading(f'missing_{column}', text=f"No {SUMMARY_HEADINGS[column]}")
+            tree.column(f'missing_{column}', width=120, anchor="e")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(side="left", fill="both", expand=True)
+        # One row per group, not per file, so the Treeview stays small.
+        for group in report.group_counts(DEFAULT_GROUP_BY, missing):
+            tree.insert('', 'end', values=[group[column] for column in DEFAULT_GROUP_BY] + [group['files']]
+                        + [group['missing'][column] for column in missing])
 
     def log(self, message):
         self.log_area.config(state='normal')
@@ -214,38 +419,53 @@ class ExifEditorGUI(tk.Tk):
         self.log(f"Starting to process files in: {self.directory_path}")
 
         # Run processing in a separate thread to avoid freezing the GUI
+        self.reset_progress()
         self.processing_thread = threading.Thread(
             target=self.run_processing,
-            args=(self.directory_path, self.config_path)
+            args=(self.directory_path, self.config_path, self.progress_queue)
         )
         self.processing_thread.start()
+        self.process_progress_queue(self.progress_queue)
 
-    def run_processing(self, directory_path, config_path):
-        # This is a workaround to capture print statements from process_directory
-        q = queue.Queue()
-        
-        def process_wrapper(directory_path, config_path, queue):
-            # Redirect stdout
-            import sys
-            original_stdout = sys.stdout
-            sys.stdout = TTY_Proxy(queue)
-            
-            try:
-                process_directory(directory_path, config_path)
-            finally:
-                # Restore stdout
-                sys.stdout = original_stdout
-
-        thread = threading.Thread(target=process_wrapper, args=(directory_path, config_path, q))
-        thread.start()
+    def reset_progress(self):
+        self.progress_queue = queue.Queue()
+        self.progress_tracker = ProgressTracker()
+        self.progress_bar['value'] = 0
 
-        while thread.is_alive() or not q.empty():
+    def run_processing(self, directory_path, config_path, q):
+        # Runs on the processing thread; events reach the GUI through q.
+        index = self.open_scan_index()
+        try:
+            jobs = self.config.getint('Settings', 'jobs', fallback=4)
+            profile = Profiler() if self.config.getboolean('Settings', 'profile', fallback=False) else None
+            process_directory(directory_path, config_path, index=index, jobs=jobs, progress=q.put, profile=profile)
+        except Exception as e:
+            q.put(RunError(str(e)))
+        finally:
+            if index is not None:
+                index.close()
+
+    def process_progress_queue(self, q):
+        tracker = self.progress_tracker
+        for _ in range(PROGRESS_EVENTS_PER_TICK):
             try:
-                line = q.get_nowait()
-                self.after(0, self.log, line.strip())
+                event = q.get_nowait()
             except queue.Empty:
-                pass
-        thread.join()
+                break
+            tracker.update(event)
+            if isinstance(event, FileError):
+                self.log(f"Error processing {event.path}: {event.message}")
+            elif isinstance(event, RunError):
+                self.log(f"Error: {event.message}")
+            elif isinstance(event, ProfileReport):
+                self.log(event.text)
+            elif isinstance(event, RunSummary):
+                self.log(event.text.strip())
+
+        self.progress_bar['value'] = tracker.fraction
+        self.progress_label.config(text=tracker.describe())
+        if not tracker.finished or not q.empty():
+            self.after(100, self.process_progress_queue, q)
 
     def cleanup_backups_thread(self):
         if not hasattr(self, 'directory_path') or not self.directory_path:
@@ -254,25 +474,20 @@ class ExifEditorGUI(tk.Tk):
 
         self.log(f"Starting to cleanup backup files in: {self.directory_path}")
         # Run cleanup in a separate thread to avoid freezing the GUI
+        self.reset_progress()
         cleanup_thread = threading.Thread(
             target=self.run_cleanup,
-            args=(self.directory_path,)
+            args=(self.directory_path, self.progress_queue, self.cleanup_walk.get())
         )
         cleanup_thread.start()
+        self.process_progress_queue(self.progress_queue)
 
-    def run_cleanup(self, directory_path):
-        cleanup_backups(directory_path)
-        self.log("Cleanup finished.")
-
-class TTY_Proxy:
-    def __init__(self, queue):
-        self.queue = queue
-
-    def write(self, text):
-        self.queue.put(text)
-
-    def flush(self):
-        pass
+    def run_cleanup(self, directory_path, q, walk=False):
+        # Runs on the cleanup thread; events reach the GUI through q.
+        try:
+            cleanup_backups(directory_path, progress=q.put, walk=walk)
+        except Exception as e:
+            q.put(RunError(str(e)))
 
 if __name__ == "__main__":
     app = ExifEditorGUI()
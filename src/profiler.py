@@ -0,0 +1,223 @@
+import heapq
+import json
+import time
+
+
+class _Timer:
+    """Times one phase of one file; byte counts may be set inside the block."""
+
+    __slots__ = ('_phases', '_name', '_start', 'bytes_read', 'bytes_written')
+
+    def __init__(self, phases, name):
+        self._phases = phases
+        self._name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _add(self._phases, self._name, 1, time.perf_counter() - self._start, self.bytes_read, self.bytes_written)
+        return False
+
+
+def _add(phases, name, files, seconds, bytes_read, bytes_written):
+    totals = phases.get(name)
+    if totals is None:
+        totals = phases[name] = [0, 0.0, 0, 0]
+    totals[0] += files
+    totals[1] += seconds
+    totals[2] += bytes_read
+    totals[3] += bytes_written
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullProfiler:
+    """
+    The profiler used when profiling is off.
+
+    Every method is a no-op, so instrumented code costs one method call
+    and an empty with block per phase.
+    """
+
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_TIMER
+
+    def add(self, name, seconds, files=1, bytes_read=0, bytes_written=0):
+        pass
+
+    def file_done(self, path, seconds):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """
+    Collects per-phase timings, byte counts and the slowest files of a run.
+
+    One Profiler is not meant to be shared between threads. Workers use
+    their own (see process_directory) and the results are merged into the
+    run's profiler with merge; profilers pickle, so this also works with
+    worker processes.
+
+    Args:
+        slowest (int): How many of the slowest files to keep.
+    """
+
+    enabled = True
+
+    def __init__(self, slowest=10):
+        self.slowest = slowest
+        # phase name -> [files, seconds, bytes read, bytes written]
+        self.phases = {}
+        # Min-heap of (seconds, path) holding the slowest files.
+        self.files = []
+        self.started_at = time.perf_counter()
+        self.wall_seconds = None
+
+    def phase(self, name):
+        """
+        Returns a context manager that adds the time spent in it to a phase.
+
+        Example:
+            with profile.phase('load') as timer:
+                data = f.read()
+                timer.bytes_read = len(data)
+        """
+        return _Timer(self.phases, name)
+
+    def add(self, name, seconds, files=1, bytes_read=0, bytes_written=0):
+        """Adds a measurement taken without phase() to a phase."""
+        _add(self.phases, name, files, seconds, bytes_read, bytes_written)
+
+    def file_done(self, path, seconds):
+        """Records the total time spent on one file."""
+        if len(self.files) < self.slowest:
+            heapq.heappush(self.files, (seconds, path))
+        elif seconds > self.files[0][0]:
+            heapq.heapreplace(self.files, (seconds, path))
+
+    def merge(self, other):
+        """Adds the phases and slowest files of another profiler."""
+        for name, totals in other.phases.items():
+            _add(self.phases, name, *totals)
+        for seconds, path in other.files:
+            self.file_done(path, seconds)
+
+    def stop(self):
+        """Fixes the wall-clock time of the run."""
+        self.wall_seconds = time.perf_counter() - self.started_at
+
+    def report(self):
+        """Returns the collected data as a JSON-compatible dict."""
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self.started_at
+        return {
+            'wall_seconds': wall,
+            'phases': {
+                name: {
+                    'files': files,
+                    'seconds': seconds,
+                    'avg_ms': seconds / files * 1000 if files else 0.0,
+                    'bytes_read': bytes_read,
+                    'bytes_written': bytes_written,
+                }
+                for name, (files, seconds, bytes_read, bytes_written) in self.phases.items()
+            },
+            'slowest': [{'path': path, 'ms': seconds * 1000}
+                        for seconds, path in sorted(self.files, reverse=True)],
+        }
+
+    def format_text(self):
+        """Formats the report as a table for the terminal or the GUI log."""
+        report = self.report()
+        lines = [
+            "--- Profile ---",
+            f"Wall time: {report['wall_seconds']:.3f} s",
+            f"{'phase':<10} {'files':>8} {'total s':>9} {'avg ms':>8} {'MB read':>9} {'MB written':>10}",
+        ]
+        for name, phase in report['phases'].items():
+            lines.append(f"{name:<10} {phase['files']:>8} {phase['seconds']:>9.3f} {phase['avg_ms']:>8.2f} "
+                         f"{phase['bytes_read'] / 1024 / 1024:>9.2f} {phase['bytes_written'] / 1024 / 1024:>10.2f}")
+        if report['slowest']:
+            lines.append("Slowest files:")
+            for item in report['slowest']:
+                lines.append(f"  {item['ms']:>9.2f} ms  {item['path']}")
+        lines.append("---------------")
+        return '\n'.join(lines)
+
+    def save(self, path):
+        """
+        Writes the report to a file: JSON if the name ends in .json,
+        otherwise the text table.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                json.dump(self.report(), f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            else:
+                f.write(self.format_text() + '\n')
+
+
+def timed(iterable, profile, name):
+    """
+    Wraps an iterable so that the time spent in next() goes to a phase.
+
+    With profiling off, the iterable is returned as is.
+    """
+    if not profile.enabled:
+        return iterable
+    return _timed(iter(iterable), profile, name)
+
+
+def _timed(iterator, profile, name):
+    clock = time.perf_counter
+    while True:
+        start = clock()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            profile.add(name, clock() - start, files=0)
+            return
+        profile.add(name, clock() - start)
+        yield item
+
+
+def emit_report(profile, destination, stream=None):
+    """
+    Prints the report of a CLI run, or saves it when destination is a path.
+
+    Args:
+        profile (Profiler): The finished profiler.
+        destination (str): '-' to print it, or a file path.
+        stream: Where to print. Defaults to sys.stdout.
+    """
+    profile.stop()
+    if destination == '-':
+        print(profile.format_text(), file=stream)
+    else:
+        profile.save(destination)
+        print(f"Profile written to {destination}", file=stream)
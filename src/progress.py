@@ -0,0 +1,166 @@
+import time
+
+
+class ProgressEvent:
+    """Base class of the events process_directory reports to its progress callback."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class RunStarted(ProgressEvent):
+    """Sent once the target files are known, before any file is processed."""
+
+    __slots__ = ('directory', 'total_files', 'total_bytes')
+
+    def __init__(self, directory, total_files, total_bytes):
+        self.directory = directory
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+
+
+class FileStarted(ProgressEvent):
+    """Sent when a file is handed to a worker."""
+
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+
+class FileDone(ProgressEvent):
+    """Sent when a file was written (or, in a dry run, has planned changes)."""
+
+    __slots__ = ('path', 'size', 'changes')
+
+    def __init__(self, path, size, changes):
+        self.path = path
+        self.size = size
+        self.changes = changes
+
+
+class FileSkipped(ProgressEvent):
+    """Sent when a file already had the configured tags."""
+
+    __slots__ = ('path', 'size')
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+
+class FileError(ProgressEvent):
+    """Sent when a file could not be backed up or tagged."""
+
+    __slots__ = ('path', 'size', 'message')
+
+    def __init__(self, path, size, message):
+        self.path = path
+        self.size = size
+        self.message = message
+
+
+class RunSummary(ProgressEvent):
+    """Sent at the end of a run with the same counts as the printed summary."""
+
+    __slots__ = ('total_files', 'success_count', 'error_count', 'unchanged_count', 'text')
+
+    def __init__(self, total_files, success_count, error_count, unchanged_count, text):
+        self.total_files = total_files
+        self.success_count = success_count
+        self.error_count = error_count
+        self.unchanged_count = unchanged_count
+        self.text = text
+
+
+class ProfileReport(ProgressEvent):
+    """Sent before RunSummary when the run was profiled."""
+
+    __slots__ = ('text', 'report')
+
+    def __init__(self, text, report):
+        self.text = text
+        self.report = report
+
+
+class RunError(ProgressEvent):
+    """Sent instead of RunStarted when the run cannot start (e.g. a bad config)."""
+
+    __slots__ = ('message',)
+
+    def __init__(self, message):
+        self.message = message
+
+
+class ProgressTracker:
+    """
+    Turns progress events into counts, rates and an ETA.
+
+    Args:
+        clock (callable): Returns the current time in seconds.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.total_files = 0
+        self.total_bytes = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.errors = 0
+        self.started_at = None
+        self.finished = False
+
+    def update(self, event):
+        if isinstance(event, RunStarted):
+            self.total_files = event.total_files
+            self.total_bytes = event.total_bytes
+            self.started_at = self._clock()
+        elif isinstance(event, (FileDone, FileSkipped, FileError)):
+            self.files_done += 1
+            self.bytes_done += event.size
+            if isinstance(event, FileError):
+                self.errors += 1
+        elif isinstance(event, (RunSummary, RunError)):
+            self.finished = True
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return self._clock() - self.started_at
+
+    @property
+    def files_per_second(self):
+        elapsed = self.elapsed
+        return self.files_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self):
+        elapsed = self.elapsed
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the current file rate, or None if unknown."""
+        rate = self.files_per_second
+        if not rate:
+            return None
+        return (self.total_files - self.files_done) / rate
+
+    @property
+    def fraction(self):
+        return self.files_done / self.total_files if self.total_files else 0.0
+
+    def describe(self):
+        """Formats the progress as one status line."""
+        text = (f"{self.files_done}/{self.total_files} files, "
+                f"{self.files_per_second:.1f} files/s, "
+                f"{self.bytes_per_second / 1024 / 1024:.1f} MB/s")
+        eta = self.eta
+        if eta is not None and not self.finished:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f", ETA {minutes}:{seconds:02d}"
+        return text
@@ -1,56 +1,172 @@
 import argparse
 import configparser
+import csv
 import os
-from exif_editor import get_exif_summary_from_directory
+import sys
+from exif_editor import iter_exif_summary, make_finder
+from exif_record import SUMMARY_FIELDS, record_schema
 import json
 
-def query_directory_exif(directory_path, config_path='config/config.ini'):
+# 可輸出的欄位與表格標題。path 為相對於掃描目錄的路徑。
+# 此外也可使用任何 EXIF 標籤名稱（例如 fnumber、datetimeoriginal），標題即為名稱本身。
+FIELDS = {
+    'path': '檔案路徑',
+    'filename': '檔案名稱',
+    'make': '相機製造商',
+    'model': '相機型號',
+    'lens_model': '鏡頭型號',
+}
+DEFAULT_FIELDS = ('path', 'make', 'model', 'lens_model')
+FORMATS = ('table', 'ndjson', 'csv')
+
+# 表格模式下各欄位的最小寬度
+_TABLE_WIDTHS = {'make': 15, 'model': 20, 'lens_model': 25}
+
+
+def parse_fields(text):
+    """Parses a comma-separated --fields value: FIELDS names or EXIF tag names."""
+    fields = tuple(field.strip().lower() for field in text.split(',') if field.strip())
+    unknown = []
+    for field in fields:
+        if field not in FIELDS:
+            try:
+                record_schema((field,))
+            except ValueError:
+                unknown.append(field)
+    if unknown or not fields:
+        raise argparse.ArgumentTypeError(
+            f"未知的欄位：{', '.join(unknown)}（可用：{', '.join(FIELDS)}）" if unknown else "至少需要一個欄位")
+    return fields
+
+
+def iter_rows(directory_path, finder, fields=DEFAULT_FIELDS, jobs=1, index=None, profile=None, where=None,
+              limit=None):
+    """
+    Yields one tuple of field values per image, as soon as it is parsed.
+
+    Args:
+        directory_path (str): The directory to scan.
+        finder (FileFinder or list): The files to include.
+        fields (tuple): Names from FIELDS or EXIF tag names.
+        jobs (int): The number of files to parse in parallel.
+        index (ScanIndex): Optional scan index to skip unchanged files.
+            Only used when every field is a summary field.
+        profile (Profiler): Optional profiler for the scan.
+        where (ExifFilter): Optional filter; only matching files are
+            yielded, and the others are dropped while they are parsed.
+        limit (int): Stop the scan after this many rows.
+    """
+    tags = tuple(field for field in fields if field not in ('path', 'filename'))
+    # Only the other tags need the records to carry extra fields.
+    record_fields = None if set(tags) <= set(SUMMARY_FIELDS) else tags
+    for image_path, record in iter_exif_summary(directory_path, finder, jobs=jobs, index=index, profile=profile,
+                                                with_paths=True, fields=record_fields, where=where,
+                                                limit=limit):
+        values = []
+        for field in fields:
+            if field == 'path':
+                values.append(os.path.relpath(image_path, directory_path))
+            else:
+                values.append(record[field])
+        yield tuple(values)
+
+
+def write_ndjson(rows, fields, out):
+    count = 0
+    for row in rows:
+        out.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, fields, out):
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_table(rows, fields, out):
+    # 對齊需要知道最長的值，所以表格會等掃描完成才輸出。
+    rows = list(rows)
+    if not rows:
+        return 0
+    headings = [FIELDS.get(field, field) for field in fields]
+    widths = [max([_TABLE_WIDTHS.get(field, 0), len(heading)] + [len(row[i]) for row in rows])
+              for i, (field, heading) in enumerate(zip(fields, headings))]
+    header = ' | '.join(f"{heading:<{width}}" for heading, width in zip(headings, widths))
+    out.write(header + '\n')
+    out.write('-' * len(header) + '\n')
+    for row in rows:
+        out.write(' | '.join(f"{value:<{width}}" for value, width in zip(row, widths)) + '\n')
+    return len(rows)
+
+
+_WRITERS = {'table': write_table, 'ndjson': write_ndjson, 'csv': write_csv}
+
+
+def query_directory_exif(directory_path, config_path='config/config.ini', jobs=1, index=None, profile=None,
+                         output_format='table', fields=DEFAULT_FIELDS, out=None, where=None, limit=None):
     """
     Processes a directory to get EXIF summary and prints it.
 
+    With output_format 'ndjson' or 'csv', one line is written per file as
+    soon as it is parsed, so memory stays flat however large the tree is;
+    status messages then go to stderr to keep the output machine-readable.
+    The 'table' format aligns its columns and so prints after the scan.
+
     Args:
         directory_path (str): The path to the directory containing images.
         config_path (str): The path to the configuration file.
+        jobs (int): The number of files to parse in parallel.
+        index (ScanIndex): Optional scan index to skip unchanged files.
+        profile (Profiler): Optional profiler for the scan.
+        output_format (str): One of FORMATS.
+        fields (tuple): The fields to output, names from FIELDS or EXIF
+            tag names.
+        out: The text stream to write to. Defaults to sys.stdout.
+        where (ExifFilter): Optional filter (see exif_filter); only the
+            matching files are listed.
+        limit (int): List at most this many files; the scan stops there.
+
+    Returns:
+        int: The number of files listed, or None if the scan did not start.
     """
+    out = out or sys.stdout
+    messages = sys.stdout if output_format == 'table' else sys.stderr
     config = configparser.ConfigParser()
     if not os.path.exists(config_path):
-        print(f"錯誤：找不到設定檔 {config_path}")
-        return
+        print(f"錯誤：找不到設定檔 {config_path}", file=messages)
+        return None
 
     config.read(config_path)
 
     if not config.has_option('Settings', 'target_extensions'):
-        print("錯誤：設定檔中缺少 'target_extensions'")
-        return
+        print("錯誤：設定檔中缺少 'target_extensions'", file=messages)
+        return None
 
     target_extensions = [ext.strip() for ext in config.get('Settings', 'target_extensions').split(',')]
+    try:
+        finder = make_finder(config, target_extensions)
+    except ValueError as e:
+        print(f"錯誤：[Settings] 設定無效：{e}", file=messages)
+        return None
     
-    print(f"正在掃描目錄：{directory_path}")
+    print(f"正在掃描目錄：{directory_path}", file=messages)
     
-    summary_data = get_exif_summary_from_directory(directory_path, target_extensions)
+    rows = iter_rows(directory_path, finder, fields, jobs=jobs, index=index, profile=profile, where=where,
+                     limit=limit)
+    count = _WRITERS[output_format](rows, fields, out)
+    out.flush()
     
-    if not summary_data:
-        print("在指定目錄中找不到任何符合條件的圖片檔案。")
-        return
-
-    # 準備要輸出的格式
-    # 首先找到最長的檔案名稱，以便對齊
-    max_len = max(len(item['filename']) for item in summary_data)
-    header = f"{'檔案名稱':<{max_len}} | {'相機製造商':<15} | {'相機型號':<20} | {'鏡頭型號':<25}"
-    print(header)
-    print("-" * len(header))
-
-    for item in summary_data:
-        filename = item['filename']
-        make = item['make']
-        model = item['model']
-        lens_model = item['lens_model']
-        print(f"{filename:<{max_len}} | {make:<15} | {model:<20} | {lens_model:<25}")
+    if not count:
+        print("在指定目錄中找不到任何符合條件的圖片檔案。", file=messages)
+    return count
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='查詢目錄中圖片的 EXIF 資訊摘要。')
-    parser.add_argument('directory', help='包含圖片的目錄路徑')
-    parser.add_argument('--config', default='config/config.ini', help='設定檔的路徑')
-    args = parser.parse_args()
-    
-    query_directory_exif(args.directory, args.config)
+    # The command line lives in exif_cli (`exif_cli.py scan`).
+    from exif_cli import main
+    sys.exit(main(['scan'] + sys.argv[1:]))
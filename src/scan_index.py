@@ -0,0 +1,153 @@
+import os
+import json
+import sqlite3
+import time
+
+
+# Bump when the layout of the stored records changes; older indexes are
+# dropped and rebuilt on open.
+SCHEMA_VERSION = 1
+
+DEFAULT_MAX_ENTRIES = 500000
+
+# Pending writes are committed in batches of this size.
+_COMMIT_EVERY = 500
+
+
+def default_index_path():
+    """Returns the location of the shared scan index in the user cache dir."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'exif_editor', 'scan_index.sqlite')
+
+
+class ScanIndex:
+    """
+    An on-disk cache of summary records, keyed by file identity.
+
+    An entry is only returned while the file's path, size, mtime and inode
+    all match what was recorded, so any change to a file invalidates it.
+    The index holds at most max_entries files; the least recently used
+    entries are evicted when it is closed.
+
+    The connection must be used from the thread that opened the index.
+    """
+
+    def __init__(self, index_path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.index_path = index_path or default_index_path()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+        if self.index_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self._db = sqlite3.connect(self.index_path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.execute('DROP TABLE IF EXISTS files')
+            self._db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY,'
+            ' size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' inode INTEGER NOT NULL,'
+            ' record TEXT NOT NULL,'
+            ' last_used REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)')
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _changed(self):
+        self._pending += 1
+        if self._pending >= _COMMIT_EVERY:
+            self._db.commit()
+            self._pending = 0
+
+    def get(self, image_path, stat_result=None):
+        """
+        Returns the cached record for a file, or None if missing or stale.
+
+        Args:
+            image_path (str): The path to the image file.
+            stat_result (os.stat_result): The file's stat, if already known.
+        """
+        path = os.path.abspath(image_path)
+        st = stat_result or os.stat(path)
+        row = self._db.execute(
+            'SELECT size, mtime_ns, inode, record FROM files WHERE path = ?', (path,)).fetchone()
+        if row is None or row[:3] != (st.st_size, st.st_mtime_ns, st.st_ino):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute('UPDATE files SET last_used = ? WHERE path = ?', (time.time(), path))
+        self._changed()
+        return json.loads(row[3])
+
+    def put(self, image_path, record, stat_result=None):
+        """
+        Stores the record for a file under its current identity.
+
+        Args:
+            image_path (str): The path to the image file.
+            record (Mapping): The summary record to cache; stored as a
+                dict of its display values.
+            stat_result (os.stat_result): The file's stat, if already known.
+        """
+        path = os.path.abspath(image_path)
+        st = stat_result or os.stat(path)
+        self._db.execute(
+            'INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, record, last_used)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (path, st.st_size, st.st_mtime_ns, st.st_ino,
+             json.dumps(dict(record), ensure_ascii=False), time.time()))
+        self._changed()
+
+    def invalidate(self, image_path):
+        """Drops the entry for a single file."""
+        self._db.execute('DELETE FROM files WHERE path = ?', (os.path.abspath(image_path),))
+        self._changed()
+
+    def clear(self, directory_path=None):
+        """
+        Drops all entries, or only those below a directory.
+
+        Args:
+            directory_path (str): Limit the rebuild to this directory tree.
+        """
+        if directory_path is None:
+            self._db.execute('DELETE FROM files')
+        else:
+            prefix = os.path.join(os.path.abspath(directory_path), '')
+            # Every path starting with prefix sorts between prefix and the
+            # prefix with its last character (the separator) incremented.
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            self._db.execute('DELETE FROM files WHERE path >= ? AND path < ?', (prefix, upper))
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def evict(self):
+        """Removes the least recently used entries above max_entries."""
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                'DELETE FROM files WHERE path IN '
+                '(SELECT path FROM files ORDER BY last_used LIMIT ?)', (excess,))
+        self._db.commit()
+
+    def close(self):
+        """Evicts over-cap entries, commits and closes the database."""
+        if self._db is None:
+            return
+        self.evict()
+        self._db.close()
+        self._db = None
@@ -0,0 +1,107 @@
+import heapq
+from array import array
+
+
+class SummaryStore:
+    """
+    A compact row store behind the EXIF Summary view.
+
+    Rows are kept column by column, with repeated values (camera makes,
+    models, lenses, 'N/A') stored once and shared. Sorting and filtering
+    only rearrange an array of row numbers (the view), so the GUI can show
+    any window of a very large result without creating a Tk item per row.
+    """
+
+    COLUMNS = ('filename', 'make', 'model', 'lens_model')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._columns = {column: [] for column in self.COLUMNS}
+        self._interned = {}
+        self._view = array('I')
+        self.sort_column = None
+        self.sort_descending = False
+        self.filter_column = None
+        self.filter_text = ''
+        self._view_stale = False
+
+    def _intern(self, value):
+        return self._interned.setdefault(value, value)
+
+    def __len__(self):
+        """The number of rows in the current view."""
+        self.refresh()
+        return len(self._view)
+
+    @property
+    def total(self):
+        """The number of rows stored, ignoring the filter."""
+        return len(self._columns['filename'])
+
+    def append(self, records):
+        """
+        Adds summary records (dicts) to the store.
+
+        Rows that pass the current filter are added to the view. If the view
+        is sorted, only the new rows are sorted and then merged into it, so
+        a batch costs O(n + k log k) rather than a sort of all n rows.
+        """
+        columns = self._columns
+        added = []
+        for record in records:
+            row = len(columns['filename'])
+            columns['filename'].append(record['filename'])
+            for column in self.COLUMNS[1:]:
+                columns[column].append(self._intern(record.get(column, 'N/A')))
+            if self._matches(row):
+                added.append(row)
+        if self.sort_column is None or self._view_stale:
+            self._view.extend(added)
+        elif added:
+            values = self._columns[self.sort_column]
+            added.sort(key=values.__getitem__, reverse=self.sort_descending)
+            # Like a stable sort of the whole view: on ties, the rows already
+            # in it come first.
+            self._view = array('I', heapq.merge(self._view, added, key=values.__getitem__,
+                                                reverse=self.sort_descending))
+
+    def _matches(self, row):
+        if not self.filter_text:
+            return True
+        return self.filter_text in self._columns[self.filter_column][row].lower()
+
+    def row(self, position):
+        """Returns the values of the row at a position of the view."""
+        self.refresh()
+        row = self._view[position]
+        return tuple(self._columns[column][row] for column in self.COLUMNS)
+
+    def rows(self, start, stop):
+        """Returns the values of the view rows in [start, stop)."""
+        self.refresh()
+        return [self.row(position) for position in range(start, min(stop, len(self._view)))]
+
+    def sort(self, column, descending=False):
+        """Sorts the view by one column."""
+        self.sort_column = column
+        self.sort_descending = descending
+        self._view_stale = True
+
+    def set_filter(self, column, text):
+        """
+        Shows only the rows whose column contains text (case-insensitive).
+        An empty text removes the filter.
+        """
+        self.filter_column = column
+        self.filter_text = text.lower() if text else ''
+        self._view = array('I', (row for row in range(self.total) if self._matches(row)))
+        self._view_stale = self.sort_column is not None
+
+    def refresh(self):
+        if not self._view_stale:
+            return
+        values = self._columns[self.sort_column]
+        self._view = array('I', sorted(self._view, key=values.__getitem__, reverse=self.sort_descending))
+        self._view_stale = False
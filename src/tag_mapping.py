@@ -0,0 +1,182 @@
+import csv
+import json
+import fnmatch
+import re
+from tag_registry import TagPlan, compile_plan
+
+# The column (CSV) or key (JSON) holding the path or glob of a row.
+PATH_KEY = 'path'
+
+# At most this many problems are listed when a mapping is rejected.
+_MAX_PROBLEMS = 20
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+
+
+def _normalize(path):
+    return path.replace('\\', '/').strip().strip('/')
+
+
+def _literal_prefix(pattern):
+    """Returns the directories of a glob before its first wildcard, e.g. 'a/b' for 'a/b/*/c.jpg'."""
+    parts = pattern.split('/')
+    literal = []
+    for part in parts[:-1]:
+        if _GLOB_CHARS.search(part):
+            break
+        literal.append(part)
+    return '/'.join(literal)
+
+
+def _parent_directories(relative_path):
+    """Yields '' and every parent directory of a relative path, e.g. '', 'a', 'a/b'."""
+    yield ''
+    position = relative_path.find('/')
+    while position != -1:
+        yield relative_path[:position]
+        position = relative_path.find('/', position + 1)
+
+
+class TagMapping:
+    """
+    Per-file tag values, merged with the config defaults.
+
+    Each row gives tag values for one path or for a glob of paths, relative
+    to the processed directory ('/' separated). A file gets the defaults,
+    then the values of every matching glob row in mapping order, then the
+    values of its exact-path row; later values replace earlier ones. Empty
+    values leave the tag as it was.
+
+    Lookups are indexed: exact paths are one dict lookup, and glob rows are
+    bucketed by the literal directory part of the pattern, so a file is only
+    matched against the globs of its own parent directories. The merged
+    plan of each distinct set of matching globs is built once and shared.
+
+    Args:
+        rows (iterable): (line number, path or glob, {tag name: value}).
+        defaults (TagPlan): The plan compiled from the config's [EXIF].
+        source (str): The name of the mapping, for error messages.
+
+    Raises:
+        ValueError: If any row is invalid; all problems are listed.
+    """
+
+    def __init__(self, rows, defaults=TagPlan(()), source='mapping'):
+        self.defaults = defaults
+        self.exact = {}
+        # literal directory prefix -> [(row number, matcher, plan)]
+        self.globs = {}
+        self._plans = {}
+        problems = []
+        listed = set()
+        glob_count = 0
+        for line, path, values in rows:
+            path = _normalize('' if path is None else str(path))
+            if not path:
+                problems.append(f"line {line}: missing '{PATH_KEY}'")
+                continue
+            is_glob = _GLOB_CHARS.search(path) is not None
+            if not is_glob:
+                if path in listed:
+                    problems.append(f"line {line}: '{path}' is listed twice")
+                    continue
+                listed.add(path)
+            try:
+                plan = compile_plan(values)
+            except ValueError as e:
+                problems.append(f"line {line}: {e}")
+                continue
+            if is_glob:
+                matcher = re.compile(fnmatch.translate(path)).match
+                self.globs.setdefault(_literal_prefix(path), []).append((glob_count, matcher, plan))
+                glob_count += 1
+            else:
+                self.exact[path] = plan
+        if problems:
+            more = len(problems) - _MAX_PROBLEMS
+            text = '; '.join(problems[:_MAX_PROBLEMS]) + (f"; and {more} more" if more > 0 else '')
+            raise ValueError(f"Invalid tag mapping {source}: {text}")
+
+    def __len__(self):
+        return len(self.exact) + sum(len(bucket) for bucket in self.globs.values())
+
+    def plan_for(self, relative_path):
+        """
+        Returns the merged TagPlan for a file.
+
+        Args:
+            relative_path (str): The file's path relative to the processed
+                directory.
+        """
+        relative_path = _normalize(relative_path)
+        matched = []
+        for directory in _parent_directories(relative_path):
+            for number, matcher, plan in self.globs.get(directory, ()):
+                if matcher(relative_path):
+                    matched.append((number, plan))
+        exact = self.exact.get(relative_path)
+        if not matched and exact is None:
+            return self.defaults
+        matched.sort(key=lambda item: item[0])
+        numbers = tuple(number for number, _ in matched)
+        merged = self._plans.get(numbers)
+        if merged is None:
+            merged = self._plans[numbers] = _merge(self.defaults, [plan for _, plan in matched])
+        # Exact rows are merged per file; caching them would keep a second
+        # plan per listed file.
+        return merged if exact is None else _merge(merged, [exact])
+
+
+def _merge(base, plans):
+    entries = {(ifd, tag): value for ifd, tag, value in base}
+    for plan in plans:
+        entries.update(((ifd, tag), value) for ifd, tag, value in plan)
+    return TagPlan((ifd, tag, value) for (ifd, tag), value in entries.items())
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or PATH_KEY not in reader.fieldnames:
+            raise ValueError(f"Invalid tag mapping {path}: the header has no '{PATH_KEY}' column")
+        for row in reader:
+            values = {key: value for key, value in row.items() if key != PATH_KEY and key is not None}
+            yield reader.line_num, row[PATH_KEY], values
+
+
+def _read_json_lines(path):
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid tag mapping {path}: line {line_number}: {e}")
+            if not isinstance(row, dict):
+                raise ValueError(f"Invalid tag mapping {path}: line {line_number}: expected a JSON object")
+            values = {key: '' if value is None else str(value) for key, value in row.items() if key != PATH_KEY}
+            yield line_number, row.get(PATH_KEY), values
+
+
+def load_mapping(path, defaults=TagPlan(())):
+    """
+    Reads and validates a tag mapping file.
+
+    A .csv file needs a 'path' column and one column per tag; any other
+    file is read as JSON lines, one object per row with a "path" key and
+    tag name keys. Tag names are those of the [EXIF] section.
+
+    Args:
+        path (str): The mapping file.
+        defaults (TagPlan): The plan compiled from the config's [EXIF].
+
+    Returns:
+        TagMapping: The validated mapping.
+
+    Raises:
+        ValueError: If the file is malformed or any row is invalid.
+        OSError: If the file cannot be read.
+    """
+    rows = _read_csv(path) if path.lower().endswith('.csv') else _read_json_lines(path)
+    return TagMapping(rows, defaults, source=path)
@@ -0,0 +1,201 @@
+import fractions
+import piexif
+import piexif.helper
+
+
+# piexif table name -> IFD name used in piexif's exif dicts.
+_REGISTRY_IFDS = (('Image', '0th'), ('Exif', 'Exif'), ('GPS', 'GPS'))
+
+# Structural tags the writer maintains itself; setting them by hand
+# would corrupt the file.
+_RESERVED_TAGS = {
+    ('0th', piexif.ImageIFD.ExifTag),
+    ('0th', piexif.ImageIFD.GPSTag),
+    ('0th', piexif.ImageIFD.JPEGInterchangeFormat),
+    ('0th', piexif.ImageIFD.JPEGInterchangeFormatLength),
+    ('Exif', piexif.ExifIFD.InteroperabilityTag),
+}
+
+_INTEGER_TYPES = (piexif.TYPES.Byte, piexif.TYPES.Short, piexif.TYPES.Long,
+                  piexif.TYPES.SByte, piexif.TYPES.SShort, piexif.TYPES.SLong)
+_RATIONAL_TYPES = (piexif.TYPES.Rational, piexif.TYPES.SRational)
+_FLOAT_TYPES = (piexif.TYPES.Float, piexif.TYPES.DFloat)
+
+
+class TagSpec:
+    """One writable EXIF tag: where it lives and how its value is typed."""
+
+    __slots__ = ('ifd', 'tag', 'name', 'type')
+
+    def __init__(self, ifd, tag, name, type):
+        self.ifd = ifd
+        self.tag = tag
+        self.name = name
+        self.type = type
+
+    def __repr__(self):
+        return f'TagSpec({self.ifd!r}, {self.tag}, {self.name!r})'
+
+
+def _build_registry():
+    registry = {}
+    for table, ifd in _REGISTRY_IFDS:
+        for tag, info in piexif.TAGS[table].items():
+            if (ifd, tag) in _RESERVED_TAGS:
+                continue
+            spec = TagSpec(ifd, tag, info['name'], info['type'])
+            key = info['name'].lower()
+            registry[f'{table.lower()}.{key}'] = spec
+            # A few TIFF/EP tags exist in both the Image and the Exif tables;
+            # in JPEG files they belong in the Exif IFD, so Exif wins.
+            if key not in registry or ifd == 'Exif':
+                registry[key] = spec
+    return registry
+
+
+# Lowercase tag name (e.g. 'lensmodel') or qualified name (e.g.
+# 'image.exposuretime', 'gps.gpslatitude') -> TagSpec. Config keys are
+# lowercased by ConfigParser, so lookups are case-insensitive.
+TAG_REGISTRY = _build_registry()
+
+
+def lookup_tag(key):
+    """
+    Returns the TagSpec for a config key.
+
+    Raises:
+        KeyError: If no EXIF tag has that name.
+    """
+    return TAG_REGISTRY[key.strip().lower()]
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',')]
+
+
+def _rational(text, signed):
+    value = fractions.Fraction(text).limit_denominator(1000000)
+    if not signed and value < 0:
+        raise ValueError(f"{text} must not be negative")
+    return (value.numerator, value.denominator)
+
+
+def encode_value(spec, value):
+    """
+    Converts a config string to the Python value piexif stores for a tag.
+
+    ASCII tags become UTF-8 bytes, UserComment gets its character-code
+    prefix, numeric tags take comma-separated numbers (rationals as
+    '1/250' or '2.8').
+
+    Raises:
+        ValueError: If the value does not fit the tag's type.
+    """
+    if spec.type == piexif.TYPES.Ascii:
+        return value.encode('utf-8')
+    if spec.type == piexif.TYPES.Undefined:
+        if (spec.ifd, spec.tag) == ('Exif', piexif.ExifIFD.UserComment):
+            return piexif.helper.UserComment.dump(value, encoding="unicode")
+        return value.encode('utf-8')
+    if spec.type in _INTEGER_TYPES:
+        items = tuple(int(part, 0) for part in _split(value))
+    elif spec.type in _RATIONAL_TYPES:
+        items = tuple(_rational(part, spec.type == piexif.TYPES.SRational) for part in _split(value))
+    elif spec.type in _FLOAT_TYPES:
+        items = tuple(float(part) for part in _split(value))
+    else:
+        raise ValueError(f"unsupported type {spec.type}")
+    # piexif.load returns single values unwrapped; match it so that
+    # comparisons with the tags already in a file work.
+    return items[0] if len(items) == 1 else items
+
+
+class TagPlan:
+    """
+    An immutable, pre-encoded list of tag writes compiled from a config.
+
+    Compile it once per run with compile_plan and share it between all
+    workers; applying it to a file does no parsing or encoding.
+
+    Attributes:
+        entries (tuple): (IFD name, tag id, encoded value) triples.
+    """
+
+    __slots__ = ('entries',)
+
+    def __init__(self, entries):
+        object.__setattr__(self, 'entries', tuple(entries))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TagPlan is immutable')
+
+    def __reduce__(self):
+        return (TagPlan, (self.entries,))
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __eq__(self, other):
+        return isinstance(other, TagPlan) and self.entries == other.entries
+
+    def __hash__(self):
+        return hash(self.entries)
+
+    def __repr__(self):
+        return f'TagPlan({self.entries!r})'
+
+    def apply(self, exif_dict):
+        """
+        Sets the planned values in a piexif exif dict, in place.
+
+        Returns:
+            list: The changes, as (IFD name, tag, old value or None, new
+            value); empty if the dict already had every value.
+        """
+        changes = []
+        for ifd_name, tag, value in self.entries:
+            ifd = exif_dict.setdefault(ifd_name, {})
+            old_value = ifd.get(tag)
+            if old_value != value:
+                changes.append((ifd_name, tag, old_value, value))
+                ifd[tag] = value
+        return changes
+
+
+def compile_plan(exif_section):
+    """
+    Compiles the [EXIF] section of a config into a TagPlan.
+
+    Empty values are skipped. Every other key must name an EXIF tag from
+    the registry and every value must fit that tag's type; all problems
+    are reported together before any file is touched.
+
+    Args:
+        exif_section (Mapping): Tag name -> value string.
+
+    Returns:
+        TagPlan: The compiled plan.
+
+    Raises:
+        ValueError: If a key is unknown or a value is invalid.
+    """
+    entries = {}
+    problems = []
+    for key, value in exif_section.items():
+        if not value:  # Skip if the value is empty
+            continue
+        try:
+            spec = lookup_tag(key)
+        except KeyError:
+            problems.append(f"unknown EXIF tag '{key}'")
+            continue
+        try:
+            entries[(spec.ifd, spec.tag)] = encode_value(spec, value)
+        except ValueError as e:
+            problems.append(f"invalid value for '{key}': {e}")
+    if problems:
+        raise ValueError('; '.join(problems))
+    return TagPlan((ifd, tag, value) for (ifd, tag), value in entries.items())
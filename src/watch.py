@@ -0,0 +1,431 @@
+import os
+import sys
+import json
+import time
+import errno
+import select
+import struct
+import logging
+import tempfile
+import concurrent.futures
+from exif_editor import load_run_config, tag_file, written_paths
+from exif_filter import parse_where
+from backup_journal import BackupJournal
+from backup_manifest import BackupManifest
+from durability import SyncBatch, check_policy
+
+STATE_FILE_NAME = '.exif_watch_state.json'
+_STATE_VERSION = 1
+
+# inotify(7) constants.
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Returned by a watcher when it may have missed events.
+RESCAN = object()
+
+
+class PollingWatcher:
+    """
+    Finds changed files by comparing size/mtime snapshots of the tree.
+
+    Each poll is one directory walk; thanks to scandir's cached stat it
+    costs one stat per target file and never opens a file. Used where
+    inotify is not available (other platforms, some network shares).
+    """
+
+    def __init__(self, directory_path, finder, interval=1.0):
+        self.directory_path = directory_path
+        self.finder = finder
+        self.interval = interval
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for entry in self.finder.scan(self.directory_path):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds and returns the paths that changed,
+        appeared or disappeared.
+
+        The first call returns RESCAN, since nothing is known yet.
+        """
+        if self._snapshot is None:
+            self._snapshot = self._take_snapshot()
+            return RESCAN
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._take_snapshot()
+        changed = {path for path, key in snapshot.items() if self._snapshot.get(path) != key}
+        changed.update(self._snapshot.keys() - snapshot.keys())
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Gets change notifications from Linux inotify, through ctypes.
+
+    Every directory of the tree gets a watch; directories created later
+    are added as they appear. If the kernel queue overflows, RESCAN is
+    returned so the caller can fall back to a walk.
+
+    Raises:
+        OSError: If inotify is not available.
+    """
+
+    def __init__(self, directory_path, finder):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._ctypes = ctypes
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.directory_path = directory_path
+        self.finder = finder
+        self._directories = {}
+        self._started = False
+        self._add_tree(directory_path)
+
+    def _add_tree(self, top):
+        for root, dirs, _ in os.walk(top):
+            if not self.finder.hidden:
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+            self._add(root)
+
+    def _add(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = self._ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, 'inotify watch limit reached (fs.inotify.max_user_watches)')
+            # The directory disappeared meanwhile.
+            return
+        self._directories[wd] = path
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds and returns the paths that changed,
+        appeared or disappeared. A directory deleted or moved away is
+        returned as its path with a trailing separator.
+        """
+        if not self._started:
+            self._started = True
+            return RESCAN
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return RESCAN
+            if mask & _IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # Files may land before the new watch is in place.
+                    self._add_tree(path)
+                    changed.update(entry.path for entry in self.finder.scan(path))
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    # A moved directory keeps its watches; forget them so
+                    # their events are not reported under the old path.
+                    prefix = path + os.sep
+                    stale = [wd for wd, known in self._directories.items()
+                             if known == path or known.startswith(prefix)]
+                    for wd in stale:
+                        del self._directories[wd]
+                    changed.add(prefix)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(directory_path, finder, polling=False, interval=1.0):
+    """Returns an InotifyWatcher where possible, otherwise a PollingWatcher."""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory_path, finder)
+        except OSError as e:
+            logging.warning(f"inotify unavailable ({e}); polling every {interval} s instead")
+    return PollingWatcher(directory_path, finder, interval)
+
+
+def load_state(state_path):
+    """Returns {relative path: (size, mtime_ns)} of the files already tagged."""
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get('version') != _STATE_VERSION:
+        return {}
+    return {path: tuple(key) for path, key in state['files'].items()}
+
+
+def save_state(state_path, files):
+    """Writes the state file atomically."""
+    directory = os.path.dirname(os.path.abspath(state_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.exif_watch.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': _STATE_VERSION, 'files': files}, f, ensure_ascii=False)
+        os.replace(temp_path, state_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class DirectoryWatch:
+    """
+    Keeps a directory tagged: new or modified target files are tagged
+    once they stop changing.
+
+    A file is tagged after its size and mtime have stayed the same for
+    settle seconds, so files still being copied in are left alone. The
+    size and mtime of every tagged file (after tagging) go to a state
+    file, which is how the watch recognises its own writes and, after a
+    restart, the files it already handled; those are not read again.
+    Files that are deleted or moved away are dropped from the state.
+
+    With where, only files that match the filter are tagged. Files it
+    rejects are recorded in the state as well, so they are read again
+    only when they change; after changing the filter, delete the state
+    file to have every file checked against the new one.
+
+    durability works as in process_directory, except that a watch has no
+    end: with 'per-batch' and 'end' the pending files are flushed before
+    each save of the state file, so the state never lists a tagged file
+    that is not yet on disk.
+
+    Args:
+        directory_path (str): The directory to watch.
+        config_path (str): The config file with the tags to write.
+        state_path (str): The state file. Defaults to a hidden file in
+            the watched directory.
+        settle (float): Seconds a file must stay unchanged.
+        polling (bool): Poll even where inotify is available.
+        interval (float): Seconds between polls.
+        jobs (int): The number of files tagged in parallel.
+        where (ExifFilter or iterable): Optional filter, or --where
+            expressions (see exif_filter).
+        durability (str): One of durability.DURABILITY_POLICIES. Defaults
+            to the config's [Settings] durability.
+
+    Raises:
+        ValueError: If the config, the durability or a where expression is
+            invalid.
+    """
+
+    def __init__(self, directory_path, config_path, state_path=None, settle=0.5, polling=False, interval=1.0,
+                 jobs=1, where=None, durability=None):
+        run_config = load_run_config(config_path)
+        self.durability = check_policy(durability or run_config.durability)
+        self.where = parse_where(where) if where is not None else None
+        self.directory_path = directory_path
+        self.finder = run_config.finder
+        self.plan = run_config.plan
+        self.backup_mode = run_config.backup_mode
+        self.manifest = BackupManifest(directory_path) if self.backup_mode else None
+        self.journal = BackupJournal(manifest=self.manifest) if self.backup_mode == 'journal' else None
+        self.sync = SyncBatch(self.durability)
+        self.state_path = state_path or os.path.join(directory_path, STATE_FILE_NAME)
+        self.settle = settle
+        self.jobs = jobs
+        self.files = load_state(self.state_path)
+        # path -> (size, mtime_ns, time the key was first seen)
+        self.pending = {}
+        self.watcher = create_watcher(directory_path, self.finder, polling, interval)
+        self._state_dirty = False
+        self._state_saved_at = 0.0
+        self.tagged = 0
+        self.errors = 0
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.directory_path)
+
+    def _stat_key(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _forget_tree(self, prefix):
+        """Drops every file under a directory that was deleted or moved away."""
+        for path in [path for path in self.pending if path.startswith(prefix)]:
+            del self.pending[path]
+        relative = self._relative(prefix) + os.sep
+        for path in [path for path in self.files if path.startswith(relative)]:
+            del self.files[path]
+            self._state_dirty = True
+
+    def _consider(self, path, now):
+        if path.endswith(os.sep):
+            self._forget_tree(path)
+            return
+        relative = self._relative(path)
+        if not self.finder.matches_path(relative):
+            return
+        key = self._stat_key(path)
+        if key is None:
+            self.pending.pop(path, None)
+            if self.files.pop(relative, None) is not None:
+                self._state_dirty = True
+            return
+        if self.files.get(relative) == key:
+            # Already tagged (this includes the watch's own writes).
+            self.pending.pop(path, None)
+            return
+        seen = self.pending.get(path)
+        if seen is None or seen[:2] != key:
+            self.pending[path] = (key[0], key[1], now)
+
+    def _ready(self, now):
+        ready = []
+        for path, (size, mtime_ns, since) in list(self.pending.items()):
+            if now - since < self.settle:
+                continue
+            key = self._stat_key(path)
+            if key is None:
+                del self.pending[path]
+            elif key != (size, mtime_ns):
+                # Still being written.
+                self.pending[path] = (key[0], key[1], now)
+            else:
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+    def _tag(self, paths):
+        def tag(path):
+            if self.where is not None and not self.where.matches_file(path):
+                return path, ('skipped', [], None, None, None)
+            return path, tag_file(path, self.plan, self.backup_mode, journal=self.journal, manifest=self.manifest,
+                                  durability=self.durability)
+
+        if self.jobs > 1 and len(paths) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                results = list(pool.map(tag, paths))
+        else:
+            results = [tag(path) for path in paths]
+
+        for path, (status, _, _, error, _) in results:
+            if status == 'error':
+                self.errors += 1
+                print(f"Error processing {path}: {error}")
+                continue
+            if status == 'written':
+                self.tagged += 1
+                self.sync.add(written_paths(path, self.backup_mode))
+                print(f"Tagged {path}")
+            key = self._stat_key(path)
+            if key is not None:
+                self.files[self._relative(path)] = key
+                self._state_dirty = True
+
+    def step(self, timeout=0.2):
+        """
+        Handles the changes of one wait.
+
+        Args:
+            timeout (float): The longest time to wait for changes.
+
+        Returns:
+            int: The number of files tagged (or found up to date) this step.
+        """
+        changed = self.watcher.wait(timeout)
+        now = time.monotonic()
+        if changed is RESCAN:
+            changed = [entry.path for entry in self.finder.scan(self.directory_path)]
+        for path in changed:
+            self._consider(path, now)
+        ready = self._ready(now)
+        if ready:
+            self._tag(ready)
+        if self._state_dirty and (not self.pending or now - self._state_saved_at >= 1.0):
+            self.save()
+        return len(ready)
+
+    def save(self):
+        self.sync.flush()
+        save_state(self.state_path, self.files)
+        self._state_dirty = False
+        self._state_saved_at = time.monotonic()
+
+    def run(self):
+        """Watches until interrupted (Ctrl-C)."""
+        print(f"Watching {self.directory_path} ({type(self.watcher).__name__}); press Ctrl-C to stop.")
+        try:
+            while True:
+                # Wake up in time to tag settled files.
+                self.step(self.settle / 2 if self.pending else 1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self._state_dirty:
+            self.save()
+        self.watcher.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.manifest is not None:
+            self.manifest.close()
+
+
+if __name__ == '__main__':
+    # The command line lives in exif_cli (`exif_cli.py watch`).
+    from exif_cli import main
+    sys.exit(main(['watch'] + sys.argv[1:]))
@@ -0,0 +1,15 @@
+import os
+import sys
+import pytest
+
+# The modules in src/ import each other by their plain names (as gui.py does),
+# so src/ has to be importable for the tests that use the "src." prefix too.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+
+@pytest.fixture(autouse=True)
+def user_cache_dir(tmp_path_factory, monkeypatch):
+    """Keeps the manifest registry and the scan index out of the real user cache dir."""
+    cache_home = tmp_path_factory.mktemp('cache')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(cache_home))
+    return cache_home
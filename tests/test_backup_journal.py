@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_editor import process_directory
+from src.backup_journal import find_journals, read_journal, restore
+from src.cleanup_backups import cleanup_backups
+
+
+@pytest.fixture
+def temp_image_dir():
+    temp_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(temp_dir, 'nested'))
+    Image.new('RGB', (64, 64), color='red').save(os.path.join(temp_dir, 'plain.jpg'))
+    exif_bytes = piexif.dump({'0th': {piexif.ImageIFD.Artist: b'Original Artist'}})
+    Image.new('RGB', (64, 64), color='blue').save(os.path.join(temp_dir, 'nested', 'tagged.jpg'), exif=exif_bytes)
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def _write_config(temp_dir, backup_mode, artist='Test Artist'):
+    config = configparser.ConfigParser()
+    config['Settings'] = {
+        'create_backup': 'true',
+        'backup_mode': backup_mode,
+        'target_extensions': '.jpg',
+    }
+    config['EXIF'] = {'Artist': artist}
+    config_path = os.path.join(temp_dir, 'config.ini')
+    with open(config_path, 'w') as configfile:
+        config.write(configfile)
+    return config_path
+
+
+def _read_all(temp_dir):
+    contents = {}
+    for name in ('plain.jpg', os.path.join('nested', 'tagged.jpg')):
+        with open(os.path.join(temp_dir, name), 'rb') as f:
+            contents[name] = f.read()
+    return contents
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_journal_restores_originals(temp_image_dir, executor):
+    originals = _read_all(temp_image_dir)
+    config_path = _write_config(temp_image_dir, 'journal')
+
+    process_directory(temp_image_dir, config_path, jobs=2, executor=executor)
+
+    assert not any(name.endswith('.bak') for _, _, files in os.walk(temp_image_dir) for name in files)
+    assert piexif.load(os.path.join(temp_image_dir, 'plain.jpg'))['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
+    journals = find_journals(temp_image_dir)
+    assert len(journals) == 2
+    assert sum(len(list(read_journal(path))) for path in journals) == 2
+
+    assert restore(temp_image_dir) == (2, 0)
+    assert _read_all(temp_image_dir) == originals
+
+
+def test_restore_uses_oldest_run(temp_image_dir):
+    originals = _read_all(temp_image_dir)
+    process_directory(temp_image_dir, _write_config(temp_image_dir, 'journal', 'First'))
+    os.rename(find_journals(temp_image_dir)[0],
+              os.path.join(temp_image_dir, '.exif_backup-00000000T000000-1.journal'))
+    process_directory(temp_image_dir, _write_config(temp_image_dir, 'journal', 'A much longer second artist'))
+
+    restore(temp_image_dir)
+
+    assert _read_all(temp_image_dir) == originals
+
+
+def test_reflink_backup(temp_image_dir):
+    originals = _read_all(temp_image_dir)
+
+    process_directory(temp_image_dir, _write_config(temp_image_dir, 'reflink'))
+
+    with open(os.path.join(temp_image_dir, 'plain.jpg.bak'), 'rb') as f:
+        assert f.read() == originals['plain.jpg']
+
+
+def test_cleanup_prunes_journals(temp_image_dir):
+    process_directory(temp_image_dir, _write_config(temp_image_dir, 'journal'))
+
+    cleanup_backups(temp_image_dir, journals=False)
+    assert len(find_journals(temp_image_dir)) == 2
+
+    cleanup_backups(temp_image_dir)
+    assert find_journals(temp_image_dir) == []
+
+
+def test_restore_leaves_files_that_no_longer_match(temp_image_dir):
+    process_directory(temp_image_dir, _write_config(temp_image_dir, 'journal'))
+    edited = os.path.join(temp_image_dir, 'plain.jpg')
+    with open(edited, 'ab') as f:
+        f.write(b'appended by another program')
+    before = _read_all(temp_image_dir)['plain.jpg']
+
+    assert restore(temp_image_dir) == (1, 1)
+
+    assert _read_all(temp_image_dir)['plain.jpg'] == before
@@ -0,0 +1,87 @@
+import os
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.batch_job import create_job, run_job, merge_job, read_checkpoint
+import exif_editor
+
+
+@pytest.fixture
+def job(tmp_path):
+    photos = tmp_path / 'photos'
+    os.makedirs(photos / 'nested')
+    for i in range(6):
+        Image.new('RGB', (16, 16)).save(photos / ('nested' if i % 2 else '') / f'{i}.jpg')
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'true', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    job_dir = str(tmp_path / 'job')
+    assert create_job(job_dir, str(photos), str(config_path)) == 6
+    return job_dir, photos
+
+
+def _artists(photos):
+    return sorted(piexif.load(str(path))['0th'].get(piexif.ImageIFD.Artist)
+                  for path in photos.rglob('*.jpg'))
+
+
+def test_shards_cover_every_file_once(job):
+    job_dir, photos = job
+
+    for shard in range(3):
+        assert run_job(job_dir, shard, 3)['total_files'] == 2
+    totals, missing = merge_job(job_dir, 3)
+
+    assert missing == []
+    assert totals == {'total_files': 6, 'success_count': 6, 'error_count': 0, 'unchanged_count': 0}
+    assert _artists(photos) == [b'Test Artist'] * 6
+
+
+def test_resume_skips_completed_files(job, monkeypatch):
+    job_dir, photos = job
+    tagged = []
+    real = exif_editor.tag_file
+
+    def crash_after_three(image_path, *args):
+        if len(tagged) == 3:
+            raise KeyboardInterrupt
+        tagged.append(image_path)
+        return real(image_path, *args)
+
+    monkeypatch.setattr(exif_editor, 'tag_file', crash_after_three)
+    with pytest.raises(KeyboardInterrupt):
+        run_job(job_dir)
+    checkpoint = os.path.join(job_dir, 'checkpoint-0-of-1.log')
+    assert len(read_checkpoint(checkpoint)) == 3
+    with pytest.raises(ValueError):
+        run_job(job_dir)
+
+    tagged.clear()
+    monkeypatch.setattr(exif_editor, 'tag_file', real)
+    totals = run_job(job_dir, resume=True)
+
+    assert totals['total_files'] == 6 and totals['success_count'] == 6
+    assert _artists(photos) == [b'Test Artist'] * 6
+    # Each file was backed up once, by the run that changed it.
+    assert len(list(photos.rglob('*.bak'))) == 6
+
+
+def test_merge_reports_unfinished_shards(job):
+    job_dir, _ = job
+    run_job(job_dir, 1, 2)
+
+    totals, missing = merge_job(job_dir, 2)
+
+    assert missing == [0]
+    assert totals['total_files'] == 3
+
+
+def test_invalid_shard(job):
+    job_dir, _ = job
+    with pytest.raises(ValueError):
+        run_job(job_dir, 2, 2)
@@ -3,9 +3,13 @@ import os
 import shutil
 import tempfile
 import pytest
+import configparser
+from PIL import Image
 
 # Import the function we want to test (it doesn't exist yet)
-from src.cleanup_backups import cleanup_backups
+from src.cleanup_backups import cleanup_backups, parse_age
+from src.exif_editor import process_directory
+from src.backup_manifest import find_manifests, read_manifest, read_manifest_entries, write_manifest
 
 @pytest.fixture
 def temp_dir_with_backups():
@@ -31,8 +35,8 @@ def test_cleanup_backups(temp_dir_with_backups):
     """
     Test the backup cleanup functionality.
     """
-    # Run the function to be tested
-    cleanup_backups(temp_dir_with_backups)
+    # Run the function to be tested; these backups are not in a manifest
+    cleanup_backups(temp_dir_with_backups, walk=True)
 
     # 1. Check that backup files have been deleted
     assert not os.path.exists(os.path.join(temp_dir_with_backups, 'image1.jpg.bak'))
@@ -41,3 +45,138 @@ def test_cleanup_backups(temp_dir_with_backups):
     # 2. Check that other files still exist
     assert os.path.exists(os.path.join(temp_dir_with_backups, 'image1.jpg'))
     assert os.path.exists(os.path.join(temp_dir_with_backups, 'notes.txt'))
+
+
+@pytest.fixture
+def processed_dir(tmp_path):
+    """A directory tagged by process_directory, plus a .bak file the user made."""
+    os.makedirs(tmp_path / 'nested')
+    for name in ('a.jpg', 'b.jpg', os.path.join('nested', 'c.jpg')):
+        Image.new('RGB', (16, 16)).save(tmp_path / name)
+    (tmp_path / 'notes.txt.bak').write_text('kept by the user')
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'true', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    process_directory(str(tmp_path), str(config_path), jobs=2)
+    return tmp_path
+
+
+def test_cleanup_removes_only_manifest_backups(processed_dir):
+    manifests = find_manifests(str(processed_dir))
+    assert len(manifests) == 1
+    assert len(read_manifest(manifests[0])) == 3
+    events = []
+
+    summary = cleanup_backups(str(processed_dir), progress=events.append)
+
+    assert (summary.removed, summary.kept, summary.missing, summary.failed) == (3, 0, 0, 0)
+    assert summary.bytes_reclaimed > 0
+    assert not (processed_dir / 'a.jpg.bak').exists()
+    assert not (processed_dir / 'nested' / 'c.jpg.bak').exists()
+    assert (processed_dir / 'notes.txt.bak').exists()
+    assert find_manifests(str(processed_dir)) == []
+    assert [type(event).__name__ for event in events].count('FileDone') == 3
+    assert type(events[-1]).__name__ == 'RunSummary'
+
+
+def test_cleanup_dry_run_changes_nothing(processed_dir):
+    summary = cleanup_backups(str(processed_dir), dry_run=True)
+
+    assert summary.removed == 3
+    assert (processed_dir / 'b.jpg.bak').exists()
+    assert len(find_manifests(str(processed_dir))) == 1
+
+
+def test_cleanup_older_than_keeps_recent_backups(processed_dir):
+    manifest, = find_manifests(str(processed_dir))
+    entries = read_manifest_entries(manifest)
+    entries[str(processed_dir / 'a.jpg.bak')] -= 10 * 86400
+    write_manifest(manifest, entries)
+    os.remove(processed_dir / 'b.jpg.bak')
+
+    summary = cleanup_backups(str(processed_dir), older_than=parse_age('7d'))
+
+    assert (summary.removed, summary.kept, summary.missing) == (1, 1, 1)
+    assert not (processed_dir / 'a.jpg.bak').exists()
+    assert (processed_dir / 'nested' / 'c.jpg.bak').exists()
+    manifest, = find_manifests(str(processed_dir))
+    assert read_manifest(manifest) == [str(processed_dir / 'nested' / 'c.jpg.bak')]
+
+
+def test_cleanup_older_than_ages_backups_by_when_they_were_made(tmp_path):
+    image = tmp_path / 'old.jpg'
+    Image.new('RGB', (16, 16)).save(image)
+    month_ago = os.path.getmtime(image) - 30 * 86400
+    os.utime(image, (month_ago, month_ago))
+    config_path = tmp_path / 'config.ini'
+    config_path.write_text("[Settings]\ncreate_backup = true\ntarget_extensions = .jpg\n[EXIF]\nArtist = Test\n")
+    process_directory(str(tmp_path), str(config_path))
+    # The backup keeps the timestamps of the image it copies.
+    assert os.path.getmtime(tmp_path / 'old.jpg.bak') == month_ago
+
+    assert cleanup_backups(str(tmp_path), older_than=parse_age('7d')).removed == 0
+    assert cleanup_backups(str(tmp_path), older_than=parse_age('7d'), walk=True).removed == 0
+    assert (tmp_path / 'old.jpg.bak').exists()
+
+
+def test_parse_age():
+    assert parse_age('2') == 2 * 86400
+    assert parse_age('12h') == 12 * 3600
+    with pytest.raises(ValueError):
+        parse_age('soon')
+
+
+def test_cleanup_of_a_subdirectory_uses_the_parent_manifest(processed_dir):
+    nested = processed_dir / 'nested'
+    (nested / 'd.jpg.bak').write_text('made by the user')
+
+    summary = cleanup_backups(str(nested))
+
+    assert summary.removed == 1
+    assert not (nested / 'c.jpg.bak').exists()
+    assert (nested / 'd.jpg.bak').exists()
+    # The manifest keeps the backups outside the cleaned directory.
+    manifest, = find_manifests(str(processed_dir))
+    assert sorted(read_manifest(manifest)) == [str(processed_dir / 'a.jpg.bak'), str(processed_dir / 'b.jpg.bak')]
+
+
+def test_cleanup_finds_the_manifests_of_subdirectories(processed_dir):
+    shoot = processed_dir / 'shoot'
+    os.makedirs(shoot)
+    Image.new('RGB', (16, 16)).save(shoot / 'e.jpg')
+    process_directory(str(shoot), str(processed_dir / 'config.ini'))
+    assert len(find_manifests(str(processed_dir), subdirectories=True)) == 2
+
+    summary = cleanup_backups(str(processed_dir))
+
+    assert summary.removed == 4
+    assert not (shoot / 'e.jpg.bak').exists()
+    assert find_manifests(str(processed_dir), subdirectories=True) == []
+
+
+def test_cleanup_walk_updates_the_manifests(processed_dir):
+    summary = cleanup_backups(str(processed_dir / 'nested'), walk=True)
+
+    assert summary.removed == 1
+    manifest, = find_manifests(str(processed_dir))
+    assert sorted(read_manifest(manifest)) == [str(processed_dir / 'a.jpg.bak'), str(processed_dir / 'b.jpg.bak')]
+
+    cleanup_backups(str(processed_dir), walk=True)
+
+    assert find_manifests(str(processed_dir)) == []
+    assert not (processed_dir / 'notes.txt.bak').exists()
+
+
+def test_cleanup_reads_only_registered_manifests(processed_dir, monkeypatch):
+    walked = []
+    monkeypatch.setattr(os, 'walk', lambda *args, **kwargs: walked.append(args) or iter(()))
+    shoot = processed_dir / 'shoot'
+    os.makedirs(shoot)
+    Image.new('RGB', (16, 16)).save(shoot / 'e.jpg')
+    process_directory(str(shoot), str(processed_dir / 'config.ini'))
+
+    assert cleanup_backups(str(processed_dir)).removed == 4
+    assert walked == []
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import subprocess
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_cli import main
+from src.backup_manifest import BackupManifest
+
+CLI = os.path.join(os.path.dirname(__file__), '..', 'src', 'exif_cli.py')
+
+# Modules a command must not load unless it needs them.
+HEAVY_MODULES = {'piexif', 'PIL', 'exif_editor', 'exif_reader', 'sqlite3', 'tkinter', 'configparser'}
+
+
+def _import_profile(*args):
+    """Runs the CLI with -X importtime; returns the imported module names.
+
+    How long the imports take is measured by benchmarks/bench_cli_startup.py.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', CLI, *args], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            modules.add(line.rsplit('|', 1)[1].strip())
+    return modules
+
+
+@pytest.fixture
+def backups(tmp_path):
+    manifest = BackupManifest(str(tmp_path), 'run')
+    for i in range(4):
+        path = tmp_path / f'{i}.jpg.bak'
+        path.write_bytes(b'backup')
+        manifest.record(str(path))
+    manifest.close()
+    return tmp_path
+
+
+@pytest.mark.parametrize('args', [('--help',), ('scan', '--help'), ('tag', '--help'), ('watch', '--help'),
+                                  ('batch', 'run', '--help'), ('restore', '--help'), ('report', '--help')])
+def test_help_imports_no_backends(args):
+    modules = _import_profile(*args)
+
+    assert not modules & HEAVY_MODULES
+
+
+def test_cleanup_imports_no_backends(backups):
+    modules = _import_profile('cleanup', '--dry-run', str(backups))
+
+    assert 'cleanup_backups' in modules
+    assert not modules & HEAVY_MODULES
+
+
+def test_cleanup_command(backups, capsys):
+    assert main(['cleanup', str(backups), '--older-than', '0']) == 0
+
+    assert not list(backups.glob('*.bak'))
+    assert 'Removed' in capsys.readouterr().out
+
+
+def test_invalid_arguments_are_usage_errors(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exited:
+        main(['cleanup', str(tmp_path), '--older-than', 'soon'])
+    assert exited.value.code == 2
+    with pytest.raises(SystemExit) as exited:
+        main(['scan', str(tmp_path), '--fields', 'path,nosuchtag'])
+    assert exited.value.code == 2
+    assert 'nosuchtag' in capsys.readouterr().err
+
+
+def test_scan_command(tmp_path, capsys):
+    Image.new('RGB', (16, 16)).save(tmp_path / 'a.jpg', exif=piexif.dump({'0th': {piexif.ImageIFD.Make: b'Nikon'}}))
+    config_path = tmp_path / 'config.ini'
+    config_path.write_text('[Settings]\ntarget_extensions = .jpg\n')
+
+    assert main(['scan', str(tmp_path), '--config', str(config_path), '--no-cache', '--format', 'ndjson',
+                 '--fields', 'filename,make']) == 0
+
+    assert json.loads(capsys.readouterr().out) == {'filename': 'a.jpg', 'make': 'Nikon'}
+
+
+@pytest.fixture
+def photos(tmp_path):
+    directory = tmp_path / 'photos'
+    directory.mkdir()
+    Image.new('RGB', (16, 16)).save(directory / 'a.jpg', exif=piexif.dump({'0th': {piexif.ImageIFD.Make: b'Nikon'}}))
+    config_path = tmp_path / 'config.ini'
+    config_path.write_text('[Settings]\ntarget_extensions = .jpg\ncreate_backup = true\nbackup_mode = journal\n'
+                           '\n[EXIF]\nArtist = CLI\n')
+    return str(directory), str(config_path)
+
+
+def test_failed_runs_exit_nonzero(tmp_path):
+    missing = str(tmp_path / 'missing.ini')
+
+    assert main(['tag', str(tmp_path), '--config', missing, '--no-cache']) == 1
+    assert main(['scan', str(tmp_path), '--config', missing, '--no-cache']) == 1
+
+
+def test_tag_report_and_restore_commands(photos, tmp_path, capsys):
+    directory, config_path = photos
+    cache_path = str(tmp_path / 'index.sqlite')
+
+    assert main(['tag', directory, '--config', config_path, '--cache-path', cache_path]) == 0
+    assert os.path.exists(cache_path)
+    capsys.readouterr()
+
+    assert main(['report', directory, '--config', config_path, '--cache-path', cache_path, '--format', 'json',
+                 '--group-by', 'make']) == 0
+    assert json.loads(capsys.readouterr().out)['groups'][0]['make'] == 'Nikon'
+
+    assert main(['restore', directory, '--list']) == 0
+    assert ': 1 files' in capsys.readouterr().out
+    assert main(['restore', directory]) == 0
+    assert 'Restored: 1' in capsys.readouterr().out
+    assert piexif.ImageIFD.Artist not in piexif.load(os.path.join(directory, 'a.jpg'))['0th']
+
+
+def test_batch_command(photos, tmp_path, capsys):
+    directory, config_path = photos
+    job = str(tmp_path / 'job')
+
+    assert main(['batch', 'create', job, directory, '--config', config_path]) == 0
+    assert main(['batch', 'merge', job]) == 1
+    assert main(['batch', 'run', job]) == 0
+    assert main(['batch', 'merge', job]) == 0
+    assert 'Listed 1 files' in capsys.readouterr().out
+
+
+def test_old_entry_points_use_the_cli(photos):
+    directory, config_path = photos
+    assert main(['tag', directory, '--config', config_path, '--no-cache']) == 0
+    script = os.path.join(os.path.dirname(CLI), 'backup_journal.py')
+
+    result = subprocess.run([sys.executable, script, 'list', directory], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.endswith(': 1 files\n')
@@ -0,0 +1,70 @@
+import os
+
+from src.discovery import FileFinder, iter_files
+
+
+def make_tree(root, paths):
+    for path in paths:
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'w') as f:
+            f.write('x')
+
+
+def relative(root, paths):
+    return sorted(os.path.relpath(p, root).replace(os.sep, '/') for p in paths)
+
+
+def test_suffixes_are_matched_case_insensitively(tmp_path):
+    make_tree(tmp_path, ['a.JPG', 'b.jpeg', 'c.png', 'd.jpg.bak', 'sub/e.jpg'])
+    # Extensions as they come from a config line, with stray spaces.
+    found = iter_files(str(tmp_path), ['.jpg', ' .jpeg'])
+    assert relative(tmp_path, found) == ['a.JPG', 'b.jpeg', 'sub/e.jpg']
+
+
+def test_walk_order_matches_os_walk(tmp_path):
+    make_tree(tmp_path, ['a.jpg', 'x/b.jpg', 'x/y/c.jpg', 'z/d.jpg', 'e.jpg'])
+    expected = [os.path.join(root, name)
+                for root, _, files in os.walk(tmp_path) for name in files]
+    assert sorted(iter_files(str(tmp_path), ['.jpg'])) == sorted(expected)
+    # Every directory's files come before those of its subdirectories.
+    order = [os.path.relpath(p, tmp_path) for p in iter_files(str(tmp_path), ['.jpg'])]
+    assert order.index(os.path.join('x', 'b.jpg')) < order.index(os.path.join('x', 'y', 'c.jpg'))
+
+
+def test_include_exclude_and_depth(tmp_path):
+    make_tree(tmp_path, ['a.jpg', 'raw/b.jpg', 'keep/c.jpg', 'keep/deep/d.jpg', 'keep/IMG_1.jpg'])
+    finder = FileFinder(['.jpg'], exclude=['raw', 'IMG_*'])
+    assert relative(tmp_path, (e.path for e in finder.scan(str(tmp_path)))) == ['a.jpg', 'keep/c.jpg', 'keep/deep/d.jpg']
+
+    finder = FileFinder(['.jpg'], include=['keep/*'], max_depth=1)
+    assert relative(tmp_path, (e.path for e in finder.scan(str(tmp_path)))) == ['keep/IMG_1.jpg', 'keep/c.jpg']
+
+    finder = FileFinder(['.jpg'], max_depth=0)
+    assert relative(tmp_path, (e.path for e in finder.scan(str(tmp_path)))) == ['a.jpg']
+
+
+def test_hidden_and_symlink_policies(tmp_path):
+    make_tree(tmp_path, ['.hidden.jpg', '.cache/a.jpg', 'real/b.jpg'])
+    os.symlink(tmp_path / 'real', tmp_path / 'link')
+    os.symlink(tmp_path / 'real' / 'b.jpg', tmp_path / 'c.jpg')
+    os.symlink(tmp_path, tmp_path / 'real' / 'loop')
+
+    def scan(**options):
+        return relative(tmp_path, iter_files(str(tmp_path), ['.jpg'], **options))
+
+    assert scan() == ['.cache/a.jpg', '.hidden.jpg', 'c.jpg', 'real/b.jpg']
+    assert scan(hidden=False) == ['c.jpg', 'real/b.jpg']
+    assert scan(hidden=False, symlinks='skip') == ['real/b.jpg']
+    # 'real' and 'link' are the same directory, so only one is entered, and
+    # the loop back to the top is not followed.
+    followed = scan(hidden=False, symlinks='follow')
+    assert followed in (['c.jpg', 'real/b.jpg'], ['c.jpg', 'link/b.jpg'])
+
+
+def test_entries_are_yielded_lazily(tmp_path):
+    make_tree(tmp_path, ['a.jpg', 'b.jpg'])
+    scan = FileFinder(['.jpg']).scan(str(tmp_path))
+    first = next(scan)
+    assert first.is_file() and first.stat().st_size == 1
+    scan.close()
@@ -0,0 +1,144 @@
+import os
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.batch_job import create_job, run_job, read_checkpoint
+from src.exif_editor import process_directory
+# The flat module names, as used by exif_editor (see tests/conftest.py).
+from durability import SyncBatch
+from exif_async import tag_files
+from tag_registry import compile_plan
+from watch import DirectoryWatch
+from progress import FileDone
+
+
+@pytest.fixture
+def photos(tmp_path):
+    photos = tmp_path / 'photos'
+    os.makedirs(photos / 'nested')
+    for i in range(6):
+        Image.new('RGB', (16, 16)).save(photos / ('nested' if i % 2 else '') / f'{i}.jpg')
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'true', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    return photos, str(config_path)
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: calls.append(fd) or real(fd))
+    return calls
+
+
+def test_batches_sync_each_directory_once(tmp_path, fsyncs):
+    for name in ('a', 'b', 'c'):
+        (tmp_path / name).write_bytes(b'data')
+    sync = SyncBatch('per-batch', batch_size=2)
+
+    assert not sync.add([str(tmp_path / 'a'), str(tmp_path / 'a.bak')])
+    assert not sync.add()
+    assert sync.add([str(tmp_path / 'b')])
+    assert (sync.flushes, sync.directories_synced) == (1, 1)
+    assert len(fsyncs) == 1
+
+    sync.add([str(tmp_path / 'c')])
+    sync.flush()
+    assert (sync.flushes, sync.directories_synced) == (2, 2)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        SyncBatch('always')
+
+
+@pytest.mark.parametrize('durability', ['none', 'per-file', 'per-batch', 'end'])
+def test_every_policy_tags_and_backs_up(photos, durability, fsyncs):
+    directory, config_path = photos
+
+    process_directory(str(directory), config_path, durability=durability)
+
+    assert len(list(directory.rglob('*.jpg.bak'))) == 6
+    assert all(piexif.load(str(path))['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
+               for path in directory.rglob('*.jpg'))
+    assert len(fsyncs) == EXPECTED_FSYNCS[durability]
+
+
+# Per file: the backup and its directory, the image and its directory.
+# Batched: the six images and backups in the workers, then the two
+# directories once.
+EXPECTED_FSYNCS = {'none': 0, 'per-file': 6 * 4, 'per-batch': 12 + 2, 'end': 12 + 2}
+
+
+@pytest.mark.parametrize('backup_mode', ['copy', 'journal'])
+@pytest.mark.parametrize('durability', ['per-batch', 'end'])
+def test_backups_and_rewrites_are_flushed_before_the_image_changes(photos, durability, backup_mode, monkeypatch):
+    import exif_editor
+    directory, config_path = photos
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    config['Settings']['backup_mode'] = backup_mode
+    with open(config_path, 'w') as f:
+        config.write(f)
+    events = []
+    real_fsync, real_replace, real_write = os.fsync, os.replace, exif_editor.write_exif
+    monkeypatch.setattr(os, 'fsync', lambda fd: events.append('fsync') or real_fsync(fd))
+    monkeypatch.setattr(os, 'replace', lambda *args: events.append('replace') or real_replace(*args))
+    monkeypatch.setattr(exif_editor, 'write_exif', lambda *args, **kwargs: events.append('write')
+                        or real_write(*args, **kwargs))
+
+    exif_editor.process_directory(str(directory), config_path, durability=durability)
+
+    # The backup or journal record, then the new file, each flushed first.
+    assert events.count('write') == events.count('replace') == 6
+    assert all(events[i - 1] == 'fsync' for i, event in enumerate(events) if event in ('write', 'replace'))
+
+
+@pytest.mark.parametrize('durability', ['none', 'per-file', 'per-batch', 'end'])
+def test_async_tagging_follows_the_policy(photos, durability, fsyncs):
+    import asyncio
+    directory, _ = photos
+    paths = [str(path) for path in directory.rglob('*.jpg')]
+
+    counts = asyncio.run(tag_files(paths, compile_plan({'artist': 'Async'}), backup_mode='copy',
+                                   durability=durability))
+
+    assert counts == {'written': 6}
+    assert len(fsyncs) == EXPECTED_FSYNCS[durability]
+
+
+@pytest.mark.parametrize('durability', ['none', 'per-file', 'per-batch', 'end'])
+def test_watch_follows_the_policy(photos, durability, fsyncs):
+    directory, config_path = photos
+    watch = DirectoryWatch(str(directory), config_path, settle=0, polling=True, interval=0, durability=durability)
+    try:
+        while watch.tagged < 6:
+            watch.step(0)
+    finally:
+        watch.close()
+
+    assert len(fsyncs) == EXPECTED_FSYNCS[durability]
+
+
+def test_job_checkpoints_only_synced_files(photos, tmp_path):
+    directory, config_path = photos
+    job_dir = str(tmp_path / 'job')
+    create_job(job_dir, str(directory), config_path)
+    checkpoint = os.path.join(job_dir, 'checkpoint-0-of-1.log')
+    logged = []
+
+    def progress(event):
+        if isinstance(event, FileDone):
+            logged.append(len(read_checkpoint(checkpoint)))
+
+    run_job(job_dir, durability='end', progress=progress)
+
+    assert logged == [0] * 6
+    assert set(read_checkpoint(checkpoint).values()) == {'written'}
+    assert len(read_checkpoint(checkpoint)) == 6
@@ -0,0 +1,222 @@
+import io
+import os
+import tarfile
+import zipfile
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_editor import iter_exif_summary, process_directory
+# The flat module names, as used by exif_editor (see tests/conftest.py).
+from exif_archive import HeadBuffer, archive_output_path
+from exif_reader import read_exif_tags_from
+from exif_filter import parse_where
+from exif_record import READ_ERROR
+
+
+def _jpeg(make=None, size=16):
+    data = io.BytesIO()
+    exif = piexif.dump({'0th': {piexif.ImageIFD.Make: make}}) if make else b''
+    Image.new('RGB', (size, size)).save(data, format='JPEG', exif=exif)
+    return data.getvalue()
+
+
+MEMBERS = {
+    'a.jpg': _jpeg(b'Nikon'),
+    'shoot/b.jpg': _jpeg(),
+    'notes.txt': b'not an image',
+}
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'true', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist'}
+    path = tmp_path / 'config.ini'
+    with open(path, 'w') as f:
+        config.write(f)
+    return str(path)
+
+
+def _write_zip(path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+
+
+def _write_tar(path):
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def _read_members(path):
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            return {info.filename: archive.read(info) for info in archive.infolist()}
+    with tarfile.open(path) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+
+@pytest.mark.parametrize('name, write', [('photos.zip', _write_zip), ('photos.tar.gz', _write_tar)])
+def test_summary_reads_archive_members(tmp_path, name, write):
+    path = str(tmp_path / name)
+    write(path)
+
+    records = dict(iter_exif_summary(path, ['.jpg'], with_paths=True))
+
+    assert records[os.path.join(path, 'a.jpg')]['make'] == 'Nikon'
+    assert records[os.path.join(path, 'shoot/b.jpg')]['make'] == 'N/A'
+    assert len(records) == 2
+
+
+@pytest.mark.parametrize('name, write', [('photos.zip', _write_zip), ('photos.tar.gz', _write_tar)])
+def test_tagging_writes_a_tagged_copy(tmp_path, config_path, name, write):
+    path = str(tmp_path / name)
+    write(path)
+
+    process_directory(path, config_path)
+
+    output = archive_output_path(path)
+    members = _read_members(output)
+    assert _read_members(path) == MEMBERS
+    assert members['notes.txt'] == MEMBERS['notes.txt']
+    for image in ('a.jpg', 'shoot/b.jpg'):
+        assert piexif.load(members[image])['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
+        Image.open(io.BytesIO(members[image])).load()
+    assert piexif.load(members['a.jpg'])['0th'][piexif.ImageIFD.Make] == b'Nikon'
+    assert not [file for file in os.listdir(tmp_path) if file.endswith('.bak') or file.endswith('.tmp')]
+
+
+def test_unchanged_zip_members_keep_their_data(tmp_path, config_path, capsys):
+    path = str(tmp_path / 'photos.zip')
+    _write_zip(path)
+    process_directory(path, config_path)
+    tagged = archive_output_path(path)
+
+    process_directory(tagged, config_path, output_path=str(tmp_path / 'again.zip'))
+
+    assert 'Unchanged: 2' in capsys.readouterr().out
+    with zipfile.ZipFile(tagged) as first, zipfile.ZipFile(tmp_path / 'again.zip') as second:
+        # Copied as compressed bytes, not compressed again.
+        assert [(info.filename, info.CRC, info.compress_type, info.compress_size) for info in first.infolist()] == \
+               [(info.filename, info.CRC, info.compress_type, info.compress_size) for info in second.infolist()]
+        assert second.testzip() is None
+    assert _read_members(str(tmp_path / 'again.zip')) == _read_members(tagged)
+
+
+def _patch_central_directory(path, names, patch):
+    """Calls patch(data, offset) on the central directory record of each named member."""
+    data = bytearray(open(path, 'rb').read())
+    offset = data.find(b'PK\x01\x02')
+    while offset >= 0:
+        name_length = int.from_bytes(data[offset + 28:offset + 30], 'little')
+        if data[offset + 46:offset + 46 + name_length].decode() in names:
+            patch(data, offset)
+        offset = data.find(b'PK\x01\x02', offset + 46)
+    open(path, 'wb').write(bytes(data))
+
+
+def _mark_encrypted(data, offset):
+    """Sets the encryption flag, as an encrypted ZIP would have it."""
+    data[offset + 8] |= 0x01
+
+
+def _damage_crc(data, offset):
+    """Changes the CRC, so the member only fails once it has been read to the end."""
+    data[offset + 16] ^= 0xff
+
+
+def _raw_members(path):
+    """Returns the name, flags, CRC and compressed bytes of each ZIP member."""
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as raw:
+        members = {}
+        for info in archive.infolist():
+            raw.seek(info.header_offset + 26)
+            name_length, extra_length = int.from_bytes(raw.read(2), 'little'), int.from_bytes(raw.read(2), 'little')
+            raw.seek(name_length + extra_length, os.SEEK_CUR)
+            members[info.filename] = (info.flag_bits & 0x01, info.CRC, raw.read(info.compress_size))
+        return members
+
+
+def test_unreadable_zip_members_are_kept_as_they_are(tmp_path, config_path, capsys):
+    path = str(tmp_path / 'photos.zip')
+    _write_zip(path)
+    _patch_central_directory(path, {'a.jpg', 'notes.txt'}, _mark_encrypted)
+
+    records = dict(iter_exif_summary(path, ['.jpg'], with_paths=True))
+    summary = process_directory(path, config_path)
+
+    assert records[os.path.join(path, 'a.jpg')]['make'] == READ_ERROR
+    assert records[os.path.join(path, 'shoot/b.jpg')]['make'] == 'N/A'
+    # notes.txt is not an image, so it is neither read nor counted.
+    assert (summary.total_files, summary.error_count, summary.success_count) == (2, 1, 1)
+    output = archive_output_path(path)
+    source, copied = _raw_members(path), _raw_members(output)
+    assert list(copied) == list(MEMBERS)
+    assert copied['a.jpg'] == source['a.jpg'] and copied['notes.txt'] == source['notes.txt']
+    with zipfile.ZipFile(output) as archive:
+        assert piexif.load(archive.read('shoot/b.jpg'))['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
+
+
+def test_a_member_that_fails_part_way_is_copied_as_it_was(tmp_path, config_path, capsys):
+    path = str(tmp_path / 'photos.zip')
+    _write_zip(path)
+    _patch_central_directory(path, {'shoot/b.jpg'}, _damage_crc)
+
+    summary = process_directory(path, config_path)
+
+    assert (summary.error_count, summary.success_count) == (1, 1)
+    output = archive_output_path(path)
+    assert _raw_members(output)['shoot/b.jpg'] == _raw_members(path)['shoot/b.jpg']
+    with zipfile.ZipFile(output) as archive:
+        assert archive.testzip() == 'shoot/b.jpg'
+        assert piexif.load(archive.read('a.jpg'))['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
+
+
+def test_dry_run_writes_nothing(tmp_path, config_path, capsys):
+    path = str(tmp_path / 'photos.zip')
+    _write_zip(path)
+
+    process_directory(path, config_path, dry_run=True)
+
+    assert 'Would change: 2' in capsys.readouterr().out
+    assert not os.path.exists(archive_output_path(path))
+
+
+class _CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_only_the_head_of_a_member_is_read():
+    stream = _CountingStream(_jpeg(b'Nikon', size=1024))
+
+    tags = read_exif_tags_from(HeadBuffer(stream), (('0th', piexif.ImageIFD.Make),))
+
+    assert tags == {('0th', piexif.ImageIFD.Make): b'Nikon'}
+    assert stream.bytes_read < 8192 < len(stream.getvalue())
+
+
+def test_where_selects_members(tmp_path, config_path, capsys):
+    path = str(tmp_path / 'photos.zip')
+    _write_zip(path)
+
+    records = list(iter_exif_summary(path, ['.jpg'], with_paths=True, where=parse_where('missing=make')))
+    process_directory(path, config_path, where=['make=Nikon'])
+
+    assert [image_path for image_path, _ in records] == [os.path.join(path, 'shoot/b.jpg')]
+    assert 'Total files processed: 1' in capsys.readouterr().out
+    members = _read_members(archive_output_path(path))
+    assert members['shoot/b.jpg'] == MEMBERS['shoot/b.jpg']
+    assert piexif.load(members['a.jpg'])['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+import time
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_editor import iter_exif_summary
+# Imported by the flat name so monkeypatching reaches the module exif_async uses.
+import exif_async
+from exif_async import scan_directory, tag_files
+from tag_registry import compile_plan
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(12):
+        sub = tmp_path / f'd{i % 3}'
+        sub.mkdir(exist_ok=True)
+        Image.new('RGB', (16, 16)).save(sub / f'image{i:02d}.jpg')
+    return str(tmp_path)
+
+
+async def collect(aiterable):
+    return [item async for item in aiterable]
+
+
+def test_scan_directory_matches_iter_exif_summary(image_dir):
+    records = asyncio.run(collect(scan_directory(image_dir, ['.jpg'], concurrency=4, with_paths=True)))
+    assert records == list(iter_exif_summary(image_dir, ['.jpg'], with_paths=True))
+
+
+def test_scan_directory_applies_backpressure(image_dir, monkeypatch):
+    started = []
+    real = exif_async.summarize_file
+    monkeypatch.setattr(exif_async, 'summarize_file', lambda path, *args: started.append(path) or real(path, *args))
+
+    async def first_record():
+        scan = scan_directory(image_dir, ['.jpg'], concurrency=3)
+        record = await scan.__anext__()
+        await asyncio.sleep(0.05)
+        await scan.aclose()
+        return record
+
+    assert asyncio.run(first_record())['make'] == 'N/A'
+    # Only the files of the window were read, not the whole directory.
+    assert len(started) <= 3
+
+
+def test_tag_files_counts_and_reports_each_file(image_dir):
+    paths = [os.path.join(root, name) for root, _, files in os.walk(image_dir) for name in files]
+    plan = compile_plan({'artist': 'Async Artist'})
+    results = []
+
+    counts = asyncio.run(tag_files(paths, plan, concurrency=4, backup_mode='copy', on_result=results.append))
+
+    assert counts == {'written': len(paths)}
+    assert sorted(result[0] for result in results) == sorted(paths)
+    assert piexif.load(paths[0])['0th'][piexif.ImageIFD.Artist] == b'Async Artist'
+    assert os.path.exists(paths[0] + '.bak')
+    # Tagging the scan output again finds nothing to change.
+    async def retag():
+        source = (path async for path, _ in scan_directory(image_dir, ['.jpg'], with_paths=True))
+        return await tag_files(source, plan)
+    assert asyncio.run(retag()) == {'unchanged': len(paths)}
+
+
+def test_tag_files_cancellation_finishes_running_files(image_dir, monkeypatch):
+    lock = threading.Lock()
+    started, finished = [], []
+    first_started = threading.Event()
+    release = threading.Event()
+
+    def slow_tag_file(image_path, *args):
+        with lock:
+            started.append(image_path)
+        first_started.set()
+        # Held until the task has been cancelled.
+        release.wait(5)
+        with lock:
+            finished.append(image_path)
+        return 'written', [], None, None, None
+
+    monkeypatch.setattr(exif_async, 'tag_file', slow_tag_file)
+    paths = [os.path.join(image_dir, f'missing{i}.jpg') for i in range(100)]
+
+    async def run():
+        task = asyncio.create_task(tag_files(paths, compile_plan({'artist': 'x'}), concurrency=4))
+        await asyncio.get_running_loop().run_in_executor(None, first_started.wait, 5)
+        task.cancel()
+        # Let the cancellation reach tag_files before the files finish.
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert 0 < len(started) <= 4
+    assert sorted(finished) == sorted(started)
@@ -7,7 +7,9 @@ import piexif
 import pytest
 
 # Import the function we want to test (it doesn't exist yet)
-from src.exif_editor import process_directory
+from src.exif_editor import process_directory, iter_exif_summary, get_exif_summary_from_directory
+# exif_editor imports its siblings by plain name, so the event classes must come from there too.
+from progress import RunStarted, FileStarted, FileDone, FileError, RunSummary, RunError
 
 @pytest.fixture
 def temp_image_dir():
@@ -88,4 +90,123 @@ def test_process_directory_case_insensitive(temp_image_dir):
     # Check if EXIF tags were written to the uppercase extension image
     exif_dict_3 = piexif.load(os.path.join(temp_dir, 'image3.JPG'))
     assert exif_dict_3['0th'][piexif.ImageIFD.Artist].decode('utf-8') == 'Test Artist'
-    assert exif_dict_3['0th'][piexif.ImageIFD.Copyright].decode('utf-8') == 'Test Copyright'
\ No newline at end of file
+    assert exif_dict_3['0th'][piexif.ImageIFD.Copyright].decode('utf-8') == 'Test Copyright'
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_iter_exif_summary_parallel_matches_serial(temp_image_dir, executor):
+    """
+    Test that the worker pool yields the same records in the same order.
+    """
+    temp_dir, _ = temp_image_dir
+    for i in range(20):
+        Image.new('RGB', (16, 16)).save(os.path.join(temp_dir, f'extra{i:02d}.jpg'))
+
+    serial = list(iter_exif_summary(temp_dir, ['.jpg', '.jpeg']))
+    parallel = list(iter_exif_summary(temp_dir, ['.jpg', '.jpeg'], jobs=4, executor=executor, max_in_flight=3))
+
+    assert len(serial) == 22
+    assert parallel == serial
+    assert get_exif_summary_from_directory(temp_dir, ['.jpg', '.jpeg'], jobs=4) == serial
+
+
+def test_iter_exif_summary_is_lazy(temp_image_dir):
+    """
+    Test that records can be consumed before the walk is finished.
+    """
+    temp_dir, _ = temp_image_dir
+
+    records = iter_exif_summary(temp_dir, ['.jpg', '.jpeg'], jobs=2)
+    first = next(records)
+    records.close()
+
+    assert first['filename'] in ('image1.jpg', 'image2.jpeg')
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_process_directory_parallel(temp_image_dir, capsys, executor):
+    """
+    Test that a parallel run tags every file and reports the same counts.
+    """
+    temp_dir, config_path = temp_image_dir
+    for i in range(10):
+        Image.new('RGB', (16, 16)).save(os.path.join(temp_dir, f'extra{i}.jpg'))
+    with open(os.path.join(temp_dir, 'broken.jpg'), 'w') as f:
+        f.write('not an image')
+
+    process_directory(temp_dir, config_path, jobs=4, executor=executor, max_in_flight=2)
+
+    output = capsys.readouterr().out
+    assert 'Total files processed: 13\nSuccessful: 12\nErrors: 1\n' in output
+    for i in range(10):
+        exif_dict = piexif.load(os.path.join(temp_dir, f'extra{i}.jpg'))
+        assert exif_dict['0th'][piexif.ImageIFD.Artist].decode('utf-8') == 'Test Artist'
+        assert os.path.exists(os.path.join(temp_dir, f'extra{i}.jpg.bak'))
+
+
+def test_process_directory_skips_unchanged_files(temp_image_dir, capsys):
+    """
+    Test that a second run neither backs up nor rewrites files that are already tagged.
+    """
+    temp_dir, config_path = temp_image_dir
+    process_directory(temp_dir, config_path)
+    os.remove(os.path.join(temp_dir, 'image1.jpg.bak'))
+    mtime = os.stat(os.path.join(temp_dir, 'image1.jpg')).st_mtime_ns
+    capsys.readouterr()
+
+    process_directory(temp_dir, config_path)
+
+    assert 'Successful: 2\nErrors: 0\nUnchanged: 2\n' in capsys.readouterr().out
+    assert not os.path.exists(os.path.join(temp_dir, 'image1.jpg.bak'))
+    assert os.stat(os.path.join(temp_dir, 'image1.jpg')).st_mtime_ns == mtime
+
+
+def test_process_directory_dry_run(temp_image_dir, capsys):
+    """
+    Test that a dry run lists the planned changes and writes nothing.
+    """
+    temp_dir, config_path = temp_image_dir
+    with open(os.path.join(temp_dir, 'image1.jpg'), 'rb') as f:
+        original = f.read()
+
+    process_directory(temp_dir, config_path, dry_run=True)
+
+    output = capsys.readouterr().out
+    assert f"{os.path.join(temp_dir, 'image1.jpg')}:\n  Artist: None -> b'Test Artist'\n" in output
+    assert 'Would change: 2\n' in output
+    assert not os.path.exists(os.path.join(temp_dir, 'image1.jpg.bak'))
+    with open(os.path.join(temp_dir, 'image1.jpg'), 'rb') as f:
+        assert f.read() == original
+
+
+def test_process_directory_progress_events(temp_image_dir):
+    """
+    Test that the progress callback receives typed events for the whole run.
+    """
+    temp_dir, config_path = temp_image_dir
+    with open(os.path.join(temp_dir, 'broken.jpg'), 'w') as f:
+        f.write('not an image')
+    events = []
+
+    process_directory(temp_dir, config_path, jobs=2, progress=events.append)
+
+    assert isinstance(events[0], RunStarted)
+    assert events[0].total_files == 3
+    assert sum(isinstance(event, FileStarted) for event in events) == 3
+    assert sorted(os.path.basename(event.path) for event in events if isinstance(event, FileDone)) == [
+        'image1.jpg', 'image2.jpeg']
+    errors = [event for event in events if isinstance(event, FileError)]
+    assert [os.path.basename(event.path) for event in errors] == ['broken.jpg']
+    assert isinstance(events[-1], RunSummary)
+    assert (events[-1].total_files, events[-1].success_count, events[-1].error_count) == (3, 2, 1)
+
+
+def test_process_directory_reports_config_errors(temp_image_dir):
+    """
+    Test that a run that cannot start sends a RunError event.
+    """
+    temp_dir, _ = temp_image_dir
+    events = []
+
+    process_directory(temp_dir, os.path.join(temp_dir, 'missing.ini'), progress=events.append)
+
+    assert len(events) == 1 and isinstance(events[0], RunError)
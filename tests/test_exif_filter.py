@@ -0,0 +1,147 @@
+import json
+import os
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_editor import iter_exif_summary, process_directory
+from src.scan_index import ScanIndex
+from src.exif_cli import main
+# The flat module names, as used by exif_editor (see tests/conftest.py).
+import exif_editor
+import exif_reader
+from exif_filter import parse_where
+
+CAMERAS = {
+    'a.jpg': {'0th': {piexif.ImageIFD.Make: b'Canon', piexif.ImageIFD.Model: b'EOS R5'},
+              'Exif': {piexif.ExifIFD.LensModel: b'RF100mm F2.8 L MACRO'}},
+    'b.jpg': {'0th': {piexif.ImageIFD.Make: b'Canon', piexif.ImageIFD.Model: b'EOS 5D'}},
+    'c.jpg': {'0th': {piexif.ImageIFD.Make: b'Nikon', piexif.ImageIFD.Model: b'Z 6'},
+              'Exif': {piexif.ExifIFD.LensModel: b'NIKKOR Z 24-70mm', piexif.ExifIFD.FNumber: (28, 10)}},
+    'd.jpg': {'0th': {piexif.ImageIFD.Make: b'Sony'}},
+}
+
+
+@pytest.fixture
+def photos(tmp_path):
+    directory = tmp_path / 'photos'
+    directory.mkdir()
+    for name, exif in CAMERAS.items():
+        Image.new('RGB', (16, 16)).save(directory / name, exif=piexif.dump(exif))
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'false', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Model': 'Unknown'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    return str(directory), str(config_path)
+
+
+def _names(directory, where, **options):
+    return sorted(record['filename'] for record in iter_exif_summary(directory, ['.jpg'], where=parse_where(where),
+                                                                      **options))
+
+
+@pytest.mark.parametrize('where, expected', [
+    (['make=Canon'], ['a.jpg', 'b.jpg']),
+    (['make!=Canon'], ['c.jpg', 'd.jpg']),
+    (['model^=EOS'], ['a.jpg', 'b.jpg']),
+    (['lens_model~=(?i)macro'], ['a.jpg']),
+    (['missing=lensmodel'], ['b.jpg', 'd.jpg']),
+    (['present=LensModel', 'make=Nikon'], ['c.jpg']),
+    (['fnumber=28/10'], ['c.jpg']),
+    (['missing=model'], ['d.jpg']),
+])
+def test_predicates(photos, where, expected):
+    directory, _ = photos
+    assert _names(directory, where) == expected
+
+
+@pytest.mark.parametrize('expression', ['make', 'colour=red', 'model~=(', 'missing=colour'])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        parse_where(expression)
+
+
+def test_rejected_files_skip_the_other_ifds(photos, monkeypatch):
+    directory, _ = photos
+    parsed = []
+    real = exif_reader._TiffReader._ifd_entries
+
+    def ifd_entries(reader, ifd_name):
+        if ifd_name not in reader._entries:
+            parsed.append(ifd_name)
+        return real(reader, ifd_name)
+
+    monkeypatch.setattr(exif_reader._TiffReader, '_ifd_entries', ifd_entries)
+    tags = exif_reader.read_exif_tags(os.path.join(directory, 'a.jpg'), where=parse_where('make=Nikon'))
+
+    assert tags is None
+    assert parsed == ['0th']
+
+
+def test_limit_stops_the_walk(photos, monkeypatch):
+    directory, _ = photos
+    calls = []
+    real = exif_editor.summarize_file
+
+    def summarize_file(image_path, **options):
+        calls.append(image_path)
+        return real(image_path, **options)
+
+    monkeypatch.setattr(exif_editor, 'summarize_file', summarize_file)
+
+    assert len(_names(directory, ['make=Canon'], limit=1)) == 1
+    assert len(calls) < len(CAMERAS)
+
+
+def test_cached_records_are_filtered(photos, tmp_path):
+    directory, _ = photos
+    with ScanIndex(str(tmp_path / 'index.sqlite')) as index:
+        list(iter_exif_summary(directory, ['.jpg'], index=index))
+        assert _names(directory, ['make=Canon'], index=index) == ['a.jpg', 'b.jpg']
+        # fnumber is not cached, so these files are read again.
+        assert _names(directory, ['fnumber=28/10'], index=index) == ['c.jpg']
+
+
+def test_tag_only_matching_files(photos):
+    directory, config_path = photos
+
+    process_directory(directory, config_path, where=['missing=model'])
+
+    models = {name: piexif.load(os.path.join(directory, name))['0th'][piexif.ImageIFD.Model] for name in CAMERAS}
+    assert models == {'a.jpg': b'EOS R5', 'b.jpg': b'EOS 5D', 'c.jpg': b'Z 6', 'd.jpg': b'Unknown'}
+
+
+def test_progress_runs_read_each_header_once(photos, monkeypatch):
+    import exif_filter
+    directory, config_path = photos
+    matched = []
+    real = exif_filter.ExifFilter.matches_file
+    monkeypatch.setattr(exif_filter.ExifFilter, 'matches_file',
+                        lambda self, path: matched.append(path) or real(self, path))
+    events = []
+
+    summary = process_directory(directory, config_path, where=['make=Canon'], progress=events.append)
+
+    assert sorted(matched) == sorted(os.path.join(directory, name) for name in CAMERAS)
+    assert events[0].total_files == summary.total_files == 2
+
+
+def test_cli_scan_where_and_limit(photos, capsys):
+    directory, config_path = photos
+
+    assert main(['scan', directory, '--config', config_path, '--no-cache', '--format', 'ndjson',
+                 '--where', 'make=Canon', '--limit', '1']) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])['make'] == 'Canon'
+
+
+def test_cli_rejects_bad_expressions(photos, capsys):
+    directory, config_path = photos
+    with pytest.raises(SystemExit):
+        main(['tag', directory, '--config', config_path, '--where', 'colour=red'])
+    assert 'colour' in capsys.readouterr().err
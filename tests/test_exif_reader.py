@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_reader import read_exif_tags, ReadStats, SUMMARY_TAGS
+from src.exif_editor import get_exif_summary_from_directory
+
+
+@pytest.fixture
+def temp_dir():
+    temp_dir = tempfile.mkdtemp()
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+def _exif_bytes(make=b'Nikon', model=b'ZF', lens_model=b'Nikon Z 40mm f/2 SE'):
+    exif_dict = {
+        '0th': {piexif.ImageIFD.Make: make, piexif.ImageIFD.Model: model,
+                piexif.ImageIFD.XResolution: (300, 1)},
+        'Exif': {piexif.ExifIFD.LensModel: lens_model, piexif.ExifIFD.ISOSpeedRatings: 100},
+        'GPS': {}, '1st': {}, 'thumbnail': None,
+    }
+    return piexif.dump(exif_dict)
+
+
+def _expected(path, tags):
+    exif_dict = piexif.load(path)
+    return {(ifd, tag): exif_dict[ifd][tag] for ifd, tag in tags if tag in exif_dict.get(ifd, {})}
+
+
+def test_read_matches_piexif_for_jpeg(temp_dir):
+    path = os.path.join(temp_dir, 'photo.jpg')
+    Image.new('RGB', (64, 64), color='red').save(path, exif=_exif_bytes())
+    tags = SUMMARY_TAGS + (('0th', piexif.ImageIFD.XResolution),
+                           ('Exif', piexif.ExifIFD.ISOSpeedRatings))
+
+    assert read_exif_tags(path, tags) == _expected(path, tags)
+
+
+def test_read_matches_piexif_for_short_values(temp_dir):
+    """Values of four bytes or less are stored inside the IFD entry itself."""
+    path = os.path.join(temp_dir, 'photo.jpg')
+    Image.new('RGB', (64, 64)).save(path, exif=_exif_bytes(make=b'AB', model=b'', lens_model=b'XYZ'))
+
+    assert read_exif_tags(path) == _expected(path, SUMMARY_TAGS)
+
+
+def test_read_matches_piexif_for_tiff(temp_dir):
+    path = os.path.join(temp_dir, 'photo.tif')
+    Image.new('RGB', (64, 64), color='blue').save(path)
+    piexif_dict = piexif.load(path)
+    assert read_exif_tags(path, [('0th', piexif.ImageIFD.ImageWidth)]) == {
+        ('0th', piexif.ImageIFD.ImageWidth): piexif_dict['0th'][piexif.ImageIFD.ImageWidth]}
+
+
+def test_read_jpeg_without_exif(temp_dir):
+    path = os.path.join(temp_dir, 'plain.jpg')
+    Image.new('RGB', (64, 64)).save(path)
+
+    assert read_exif_tags(path) == {}
+
+
+def test_read_invalid_file(temp_dir):
+    path = os.path.join(temp_dir, 'broken.jpg')
+    with open(path, 'w') as f:
+        f.write('not an image')
+
+    with pytest.raises(piexif.InvalidImageDataError):
+        read_exif_tags(path)
+
+
+def test_read_stops_before_image_data(temp_dir):
+    """A large JPEG costs the same few KB as a small one."""
+    path = os.path.join(temp_dir, 'large.jpg')
+    Image.effect_noise((1024, 1024), 64).convert('RGB').save(path, exif=_exif_bytes(), quality=95)
+    stats = ReadStats()
+
+    read_exif_tags(path, stats=stats)
+
+    assert os.path.getsize(path) > 200 * 1024
+    assert stats.bytes_read <= 8 * 1024
+
+
+def test_summary_matches_piexif(temp_dir):
+    Image.new('RGB', (64, 64)).save(os.path.join(temp_dir, 'a.jpg'), exif=_exif_bytes())
+    Image.new('RGB', (64, 64)).save(os.path.join(temp_dir, 'b.jpg'))
+    with open(os.path.join(temp_dir, 'c.jpg'), 'w') as f:
+        f.write('not an image')
+
+    summary = sorted(get_exif_summary_from_directory(temp_dir, ['.jpg']), key=lambda item: item['filename'])
+
+    assert summary == [
+        {'filename': 'a.jpg', 'make': 'Nikon', 'model': 'ZF', 'lens_model': 'Nikon Z 40mm f/2 SE'},
+        {'filename': 'b.jpg', 'make': 'N/A', 'model': 'N/A', 'lens_model': 'N/A'},
+        {'filename': 'c.jpg', 'make': '讀取失敗', 'model': '讀取失敗', 'lens_model': '讀取失敗'},
+    ]
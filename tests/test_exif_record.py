@@ -0,0 +1,77 @@
+import pickle
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_editor import summarize_file, get_exif_summary_from_directory
+from src.scan_index import ScanIndex
+# The flat module name, as used by exif_editor (see tests/conftest.py).
+from exif_record import MISSING, READ_FAILED, record_schema
+
+
+def _exif_bytes():
+    return piexif.dump({
+        '0th': {piexif.ImageIFD.Make: b'Nikon'},
+        'Exif': {piexif.ExifIFD.FNumber: (28, 10), piexif.ExifIFD.ISOSpeedRatings: 400},
+    })
+
+
+def test_record_decodes_on_access(tmp_path):
+    path = str(tmp_path / 'a.jpg')
+    Image.new('RGB', (16, 16)).save(path, exif=_exif_bytes())
+
+    record = summarize_file(path)
+
+    assert record.raw('make') == b'Nikon'
+    assert record.raw('model') is MISSING
+    assert record == {'filename': 'a.jpg', 'make': 'Nikon', 'model': 'N/A', 'lens_model': 'N/A'}
+    assert not hasattr(record, '__dict__')
+
+
+def test_records_share_interned_values(tmp_path):
+    for name in ('a.jpg', 'b.jpg'):
+        Image.new('RGB', (16, 16)).save(tmp_path / name, exif=_exif_bytes())
+
+    first, second = get_exif_summary_from_directory(str(tmp_path), ['.jpg'])
+
+    assert first.schema is second.schema
+    assert first.raw('make') is second.raw('make')
+
+
+def test_any_tags_can_be_requested(tmp_path):
+    path = str(tmp_path / 'a.jpg')
+    Image.new('RGB', (16, 16)).save(path, exif=_exif_bytes())
+
+    record = summarize_file(path, fields=('fnumber', 'isospeedratings', 'artist'))
+
+    assert dict(record) == {'filename': 'a.jpg', 'fnumber': '28/10', 'isospeedratings': '400', 'artist': 'N/A'}
+    with pytest.raises(ValueError):
+        record_schema(('nosuchtag',))
+
+
+def test_unreadable_file(tmp_path):
+    path = tmp_path / 'broken.jpg'
+    path.write_text('not an image')
+
+    record = summarize_file(str(path))
+
+    assert record.failed
+    assert record.raw('make') is READ_FAILED
+    assert record['lens_model'] == '讀取失敗'
+
+
+def test_records_pickle_and_round_trip_through_the_index(tmp_path):
+    path = str(tmp_path / 'a.jpg')
+    Image.new('RGB', (16, 16)).save(path, exif=_exif_bytes())
+    record = summarize_file(path)
+
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy == record
+    assert copy.schema is record.schema
+    assert copy.raw('model') is MISSING
+
+    with ScanIndex(':memory:') as index:
+        index.put(path, record)
+        cached = record.schema.from_mapping(index.get(path))
+    assert cached == record
+    assert cached.raw('model') is MISSING
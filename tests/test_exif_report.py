@@ -0,0 +1,70 @@
+import io
+import csv
+import json
+from PIL import Image
+import piexif
+
+from src.exif_editor import iter_exif_summary
+from src.exif_report import build_report, write_report, ExifReport
+
+
+def _record(make='N/A', model='N/A', lens_model='N/A'):
+    return {'filename': 'x.jpg', 'make': make, 'model': model, 'lens_model': lens_model}
+
+
+def _sample():
+    return build_report([
+        _record('Nikon', 'ZF', 'Z 40mm'),
+        _record('Nikon', 'ZF'),
+        _record('Nikon', 'ZF'),
+        _record('Canon', 'R5', 'RF 50mm'),
+        _record('讀取失敗', '讀取失敗', '讀取失敗'),
+    ])
+
+
+def test_group_counts_with_missing_lens():
+    report = _sample()
+
+    groups = report.group_counts(('make', 'model'))
+
+    assert groups[0] == {'make': 'Nikon', 'model': 'ZF', 'files': 3, 'missing': {'lens_model': 2}}
+    assert {'make': 'Canon', 'model': 'R5', 'files': 1, 'missing': {'lens_model': 0}} in groups
+    assert report.read_errors == 1
+    assert report.column_stats()['lens_model'] == {'missing': 2, 'distinct': 2}
+
+
+def test_parsed_and_cached_values_share_codes(tmp_path):
+    exif_bytes = piexif.dump({'0th': {piexif.ImageIFD.Make: b'Nikon'}})
+    Image.new('RGB', (16, 16)).save(tmp_path / 'a.jpg', exif=exif_bytes)
+    report = ExifReport()
+
+    report.extend(iter_exif_summary(str(tmp_path), ['.jpg']))
+    report.add(_record('Nikon'))
+
+    assert report.group_counts(('make',)) == [{'make': 'Nikon', 'files': 2,
+                                               'missing': {'model': 2, 'lens_model': 2}}]
+
+
+def test_codes_widen_past_65536_values():
+    report = build_report(_record(model=f'M{i}') for i in range(70000))
+
+    assert report.column_stats()['model']['distinct'] == 70000
+    assert len(report.group_counts(('model',))) == 70000
+
+
+def test_output_formats():
+    report = _sample().to_dict(('make',), ('lens_model',))
+
+    out = io.StringIO()
+    write_report(report, 'csv', out)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ['make', 'files', 'missing_lens_model']
+    assert rows[1] == ['Nikon', '3', '2']
+
+    out = io.StringIO()
+    write_report(report, 'json', out)
+    assert json.loads(out.getvalue())['total_files'] == 5
+
+    out = io.StringIO()
+    write_report(report, 'table', out)
+    assert out.getvalue().startswith('Files: 5  Read errors: 1')
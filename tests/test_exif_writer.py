@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_writer import WriteStats, locate_exif, write_exif, copy_range
+import src.exif_writer
+
+
+@pytest.fixture
+def jpeg_path():
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, 'photo.jpg')
+    Image.effect_noise((128, 128), 64).convert('RGB').save(path)
+    yield path
+    shutil.rmtree(temp_dir)
+
+
+def _dump(**tags):
+    zeroth = {getattr(piexif.ImageIFD, name): value.encode('utf-8') for name, value in tags.items()}
+    return piexif.dump({'0th': zeroth, 'Exif': {}, 'GPS': {}, '1st': {}, 'thumbnail': None})
+
+
+def _image_data(path):
+    """Everything from the first segment after the EXIF segment to EOF."""
+    with open(path, 'rb') as f:
+        location = locate_exif(f)
+        f.seek(location.offset + location.length)
+        return f.read()
+
+
+def test_insert_into_jpeg_without_exif(jpeg_path):
+    before = _image_data(jpeg_path)
+
+    write_exif(jpeg_path, _dump(Artist='Test Artist'))
+
+    assert piexif.load(jpeg_path)['0th'][piexif.ImageIFD.Artist] == b'Test Artist'
+    assert _image_data(jpeg_path) == before
+    Image.open(jpeg_path).load()
+
+
+def test_smaller_exif_is_patched_in_place(jpeg_path):
+    write_exif(jpeg_path, _dump(Artist='A much longer artist name'))
+    size = os.path.getsize(jpeg_path)
+    inode = os.stat(jpeg_path).st_ino
+    stats = WriteStats()
+
+    write_exif(jpeg_path, _dump(Artist='Short'), stats=stats)
+
+    assert stats.in_place
+    assert stats.bytes_written < 1024
+    assert os.path.getsize(jpeg_path) == size
+    assert os.stat(jpeg_path).st_ino == inode
+    assert piexif.load(jpeg_path)['0th'][piexif.ImageIFD.Artist] == b'Short'
+    Image.open(jpeg_path).load()
+
+
+def test_larger_exif_rewrites_file(jpeg_path):
+    write_exif(jpeg_path, _dump(Artist='Short'))
+    before = _image_data(jpeg_path)
+    stats = WriteStats()
+
+    write_exif(jpeg_path, _dump(Artist='A much longer artist name', Copyright='All rights reserved.'), stats=stats)
+
+    assert not stats.in_place
+    assert _image_data(jpeg_path) == before
+    assert piexif.load(jpeg_path)['0th'][piexif.ImageIFD.Copyright] == b'All rights reserved.'
+    assert os.listdir(os.path.dirname(jpeg_path)) == ['photo.jpg']
+
+
+def test_failed_replace_keeps_original(jpeg_path, monkeypatch):
+    with open(jpeg_path, 'rb') as f:
+        original = f.read()
+
+    def fail(src, dst):
+        raise OSError('disk full')
+    monkeypatch.setattr(os, 'replace', fail)
+
+    with pytest.raises(OSError):
+        write_exif(jpeg_path, _dump(Artist='Test Artist'))
+
+    with open(jpeg_path, 'rb') as f:
+        assert f.read() == original
+    assert os.listdir(os.path.dirname(jpeg_path)) == ['photo.jpg']
+
+
+def test_copy_range_falls_back_to_reads(jpeg_path, monkeypatch):
+    def unsupported(*args):
+        raise OSError('not supported')
+    monkeypatch.setattr(os, 'copy_file_range', unsupported, raising=False)
+    monkeypatch.setattr(os, 'sendfile', unsupported, raising=False)
+    copy_path = jpeg_path + '.copy'
+
+    with open(jpeg_path, 'rb') as src, open(copy_path, 'wb') as dst:
+        copied = copy_range(src.fileno(), dst.fileno(), 10, os.path.getsize(jpeg_path) - 10)
+
+    with open(jpeg_path, 'rb') as src, open(copy_path, 'rb') as dst:
+        assert dst.read() == src.read()[10:]
+    assert copied == os.path.getsize(jpeg_path) - 10
+
+
+def test_short_copy_leaves_the_original(jpeg_path, monkeypatch):
+    original = open(jpeg_path, 'rb').read()
+    calls = []
+
+    def truncating_copy_range(src_fd, dst_fd, offset, count):
+        calls.append(offset)
+        if len(calls) == 2:
+            # The file is cut short between the head and the tail copy.
+            os.truncate(jpeg_path, len(original) // 2)
+        return copy_range(src_fd, dst_fd, offset, count)
+
+    monkeypatch.setattr(src.exif_writer, 'copy_range', truncating_copy_range)
+    with pytest.raises(OSError, match='changed while'):
+        write_exif(jpeg_path, _dump(Artist='Test Artist'))
+
+    assert os.listdir(os.path.dirname(jpeg_path)) == ['photo.jpg']
+    assert os.path.getsize(jpeg_path) == len(original) // 2
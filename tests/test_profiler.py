@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+import configparser
+from PIL import Image
+import pytest
+
+from src.profiler import NULL_PROFILER, Profiler, timed
+from src.exif_editor import process_directory, get_exif_summary_from_directory
+# exif_editor imports its siblings by plain name, so the event classes must come from there too.
+from progress import ProfileReport, RunSummary
+
+
+@pytest.fixture
+def image_dir():
+    temp_dir = tempfile.mkdtemp()
+    for i in range(3):
+        Image.new('RGB', (32, 32)).save(os.path.join(temp_dir, f'image{i}.jpg'))
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'true', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist'}
+    with open(os.path.join(temp_dir, 'config.ini'), 'w') as configfile:
+        config.write(configfile)
+    yield temp_dir, os.path.join(temp_dir, 'config.ini')
+    shutil.rmtree(temp_dir)
+
+
+def test_phases_merge_and_keep_the_slowest_files():
+    profile = Profiler(slowest=2)
+    with profile.phase('load') as timer:
+        timer.bytes_read = 100
+    other = Profiler()
+    other.add('load', 0.5, bytes_read=50)
+    for seconds, path in ((0.1, 'a'), (0.3, 'b'), (0.2, 'c')):
+        other.file_done(path, seconds)
+    profile.merge(other)
+
+    report = profile.report()
+    assert report['phases']['load']['files'] == 2
+    assert report['phases']['load']['bytes_read'] == 150
+    assert [item['path'] for item in report['slowest']] == ['b', 'c']
+    assert 'load' in profile.format_text()
+
+
+def test_timed_counts_items_and_is_transparent_when_off():
+    items = [1, 2, 3]
+    assert timed(items, NULL_PROFILER, 'walk') is items
+    profile = Profiler()
+    assert list(timed(items, profile, 'walk')) == items
+    assert profile.report()['phases']['walk']['files'] == 3
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_process_directory_profile(image_dir, jobs):
+    temp_dir, config_path = image_dir
+    profile = Profiler()
+    events = []
+    process_directory(temp_dir, config_path, jobs=jobs, profile=profile, progress=events.append)
+
+    phases = profile.report()['phases']
+    assert phases['walk']['files'] == 3
+    assert phases['backup']['files'] == 3 and phases['backup']['bytes_written'] > 0
+    assert phases['write']['files'] == 3 and phases['write']['bytes_written'] > 0
+    assert len(profile.report()['slowest']) == 3
+    assert isinstance(events[-2], ProfileReport) and isinstance(events[-1], RunSummary)
+
+
+def test_summary_profile_is_saved_as_json(image_dir, tmp_path):
+    temp_dir, _ = image_dir
+    profile = Profiler()
+    get_exif_summary_from_directory(temp_dir, ['.jpg'], jobs=2, profile=profile)
+    path = str(tmp_path / 'profile.json')
+    profile.save(path)
+    with open(path) as f:
+        report = json.load(f)
+    assert report['phases']['read']['files'] == 3
+    assert report['phases']['read']['bytes_read'] > 0
@@ -0,0 +1,36 @@
+from src.progress import ProgressTracker, RunStarted, FileDone, FileSkipped, FileError, RunSummary
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tracker_rates_and_eta():
+    clock = FakeClock()
+    tracker = ProgressTracker(clock)
+    tracker.update(RunStarted('/photos', 10, 10 * 1024 * 1024))
+    clock.now += 2
+    tracker.update(FileDone('/photos/a.jpg', 1024 * 1024, []))
+    tracker.update(FileSkipped('/photos/b.jpg', 1024 * 1024))
+    tracker.update(FileError('/photos/c.jpg', 1024 * 1024, 'broken'))
+    tracker.update(FileDone('/photos/d.jpg', 1024 * 1024, []))
+
+    assert tracker.files_done == 4 and tracker.errors == 1
+    assert tracker.files_per_second == 2.0
+    assert tracker.bytes_per_second == 2 * 1024 * 1024
+    assert tracker.eta == 3.0
+    assert tracker.fraction == 0.4
+    assert tracker.describe() == '4/10 files, 2.0 files/s, 2.0 MB/s, ETA 0:03'
+
+
+def test_tracker_finishes_on_summary():
+    tracker = ProgressTracker(FakeClock())
+    tracker.update(RunStarted('/photos', 0, 0))
+    tracker.update(RunSummary(0, 0, 0, 0, 'summary'))
+
+    assert tracker.finished
+    assert tracker.eta is None
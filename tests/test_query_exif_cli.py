@@ -0,0 +1,77 @@
+import io
+import csv
+import json
+import os
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.query_exif_cli import query_directory_exif, parse_fields
+
+
+@pytest.fixture
+def photo_dir(tmp_path):
+    exif_bytes = piexif.dump({'0th': {piexif.ImageIFD.Make: b'Nikon', piexif.ImageIFD.Model: b'ZF'}})
+    os.makedirs(tmp_path / 'photos' / '2025')
+    Image.new('RGB', (16, 16)).save(tmp_path / 'photos' / 'a.jpg', exif=exif_bytes)
+    Image.new('RGB', (16, 16)).save(tmp_path / 'photos' / '2025' / 'b.jpg')
+    config = configparser.ConfigParser()
+    config['Settings'] = {'target_extensions': '.jpg'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    return str(tmp_path / 'photos'), str(config_path)
+
+
+def test_ndjson_streams_relative_paths(photo_dir, capsys):
+    directory, config_path = photo_dir
+    out = io.StringIO()
+    count = query_directory_exif(directory, config_path, output_format='ndjson', out=out)
+
+    records = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda r: r['path'])
+    assert count == 2
+    assert records == [
+        {'path': os.path.join('2025', 'b.jpg'), 'make': 'N/A', 'model': 'N/A', 'lens_model': 'N/A'},
+        {'path': 'a.jpg', 'make': 'Nikon', 'model': 'ZF', 'lens_model': 'N/A'},
+    ]
+    # Status messages stay off stdout so the output can be piped.
+    assert capsys.readouterr().out == ''
+
+
+def test_csv_with_selected_fields(photo_dir):
+    directory, config_path = photo_dir
+    out = io.StringIO()
+    query_directory_exif(directory, config_path, output_format='csv', fields=('filename', 'make'), out=out)
+
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ['filename', 'make']
+    assert sorted(rows[1:]) == [['a.jpg', 'Nikon'], ['b.jpg', 'N/A']]
+
+
+def test_table_lists_every_file(photo_dir):
+    directory, config_path = photo_dir
+    out = io.StringIO()
+    query_directory_exif(directory, config_path, out=out)
+
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith('檔案路徑')
+    assert any(line.startswith(os.path.join('2025', 'b.jpg')) for line in lines[2:])
+    assert len(lines) == 4
+
+
+def test_parse_fields_rejects_unknown_names():
+    assert parse_fields('path, make') == ('path', 'make')
+    with pytest.raises(Exception):
+        parse_fields('path,iso')
+
+
+def test_fields_accept_exif_tag_names(photo_dir):
+    directory, config_path = photo_dir
+    out = io.StringIO()
+    query_directory_exif(directory, config_path, output_format='csv', fields=parse_fields('filename,Model,artist'),
+                         out=out)
+
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ['filename', 'model', 'artist']
+    assert sorted(rows[1:]) == [['a.jpg', 'ZF', 'N/A'], ['b.jpg', 'N/A', 'N/A']]
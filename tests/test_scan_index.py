@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import configparser
+from PIL import Image
+import pytest
+
+from src.scan_index import ScanIndex
+from src.exif_editor import get_exif_summary_from_directory, add_exif_tags_to_file
+
+
+@pytest.fixture
+def temp_dir():
+    temp_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(temp_dir, 'photos', 'nested'))
+    Image.new('RGB', (16, 16)).save(os.path.join(temp_dir, 'photos', 'a.jpg'))
+    Image.new('RGB', (16, 16)).save(os.path.join(temp_dir, 'photos', 'nested', 'b.jpg'))
+    yield temp_dir
+    shutil.rmtree(temp_dir)
+
+
+@pytest.fixture
+def index(temp_dir):
+    index = ScanIndex(os.path.join(temp_dir, 'index.sqlite'))
+    yield index
+    index.close()
+
+
+def test_second_scan_is_served_from_index(temp_dir, index):
+    photos = os.path.join(temp_dir, 'photos')
+    first = get_exif_summary_from_directory(photos, ['.jpg'], index=index)
+    assert index.misses == 2 and index.hits == 0
+
+    second = get_exif_summary_from_directory(photos, ['.jpg'], index=index)
+
+    assert index.hits == 2
+    assert second == first
+
+
+def test_changed_file_is_parsed_again(temp_dir, index):
+    path = os.path.join(temp_dir, 'photos', 'a.jpg')
+    index.put(path, {'filename': 'a.jpg', 'make': 'Old', 'model': 'N/A', 'lens_model': 'N/A'})
+    assert index.get(path)['make'] == 'Old'
+
+    Image.new('RGB', (32, 32)).save(path)
+
+    assert index.get(path) is None
+
+
+def test_index_survives_reopen(temp_dir, index):
+    path = os.path.join(temp_dir, 'photos', 'a.jpg')
+    record = {'filename': 'a.jpg', 'make': 'Nikon', 'model': 'ZF', 'lens_model': 'N/A'}
+    index.put(path, record)
+    index.close()
+
+    with ScanIndex(index.index_path) as reopened:
+        assert reopened.get(path) == record
+
+
+def test_eviction_keeps_most_recent_entries(temp_dir):
+    with ScanIndex(os.path.join(temp_dir, 'small.sqlite'), max_entries=1) as index:
+        a = os.path.join(temp_dir, 'photos', 'a.jpg')
+        b = os.path.join(temp_dir, 'photos', 'nested', 'b.jpg')
+        index.put(a, {'filename': 'a.jpg'})
+        index.put(b, {'filename': 'b.jpg'})
+        index.evict()
+
+        assert len(index) == 1
+        assert index.get(b) == {'filename': 'b.jpg'}
+
+
+def test_clear_directory(temp_dir, index):
+    photos = os.path.join(temp_dir, 'photos')
+    get_exif_summary_from_directory(photos, ['.jpg'], index=index)
+
+    index.clear(os.path.join(photos, 'nested'))
+
+    assert len(index) == 1
+    assert index.get(os.path.join(photos, 'a.jpg')) is not None
+
+
+def test_add_exif_tags_updates_index(temp_dir, index):
+    path = os.path.join(temp_dir, 'photos', 'a.jpg')
+    get_exif_summary_from_directory(os.path.join(temp_dir, 'photos'), ['.jpg'], index=index)
+    config = configparser.ConfigParser()
+    config['EXIF'] = {'make': 'Nikon', 'model': 'ZF'}
+
+    assert add_exif_tags_to_file(path, config, index=index)
+
+    assert index.get(path) == {'filename': 'a.jpg', 'make': 'Nikon', 'model': 'ZF', 'lens_model': 'N/A'}
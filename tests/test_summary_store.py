@@ -0,0 +1,61 @@
+from src.summary_store import SummaryStore
+
+
+def _record(filename, make='N/A', model='N/A', lens_model='N/A'):
+    return {'filename': filename, 'make': make, 'model': model, 'lens_model': lens_model}
+
+
+def test_append_and_window():
+    store = SummaryStore()
+    store.append([_record(f'img{i:03d}.jpg', make='Nikon') for i in range(250)])
+
+    assert len(store) == 250
+    assert store.rows(100, 103) == [
+        ('img100.jpg', 'Nikon', 'N/A', 'N/A'),
+        ('img101.jpg', 'Nikon', 'N/A', 'N/A'),
+        ('img102.jpg', 'Nikon', 'N/A', 'N/A'),
+    ]
+    assert store.rows(248, 260) == [('img248.jpg', 'Nikon', 'N/A', 'N/A'), ('img249.jpg', 'Nikon', 'N/A', 'N/A')]
+
+
+def test_repeated_values_are_shared():
+    store = SummaryStore()
+    store.append([_record('a.jpg', make=''.join(['Nik', 'on'])), _record('b.jpg', make=''.join(['Ni', 'kon']))])
+
+    assert store.row(0)[1] is store.row(1)[1]
+
+
+def test_sort_applies_to_rows_added_later():
+    store = SummaryStore()
+    store.append([_record('b.jpg'), _record('c.jpg')])
+    store.sort('filename', descending=True)
+
+    store.append([_record('a.jpg'), _record('d.jpg')])
+
+    assert [row[0] for row in store.rows(0, 10)] == ['d.jpg', 'c.jpg', 'b.jpg', 'a.jpg']
+
+
+def test_filter_by_column():
+    store = SummaryStore()
+    store.append([_record('a.jpg', model='ZF'), _record('b.jpg', model='Z8'), _record('c.jpg', model='zf')])
+    store.set_filter('model', 'zf')
+
+    store.append([_record('d.jpg', model='ZF')])
+
+    assert [row[0] for row in store.rows(0, 10)] == ['a.jpg', 'c.jpg', 'd.jpg']
+    assert store.total == 4
+
+    store.set_filter('model', '')
+    assert len(store) == 4
+
+
+def test_streamed_batches_are_merged_without_resorting():
+    store = SummaryStore()
+    store.sort('make')
+    store.append([_record('a.jpg', make='Sony'), _record('b.jpg', make='Canon')])
+    assert len(store) == 2
+    store.refresh = lambda: None
+
+    store.append([_record('c.jpg', make='Nikon'), _record('d.jpg', make='Canon'), _record('e.jpg', make='Zeiss')])
+
+    assert [row[0] for row in store.rows(0, 10)] == ['b.jpg', 'd.jpg', 'c.jpg', 'a.jpg', 'e.jpg']
@@ -0,0 +1,100 @@
+import os
+import json
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+from src.exif_editor import process_directory
+from src.tag_mapping import TagMapping, load_mapping
+from src.tag_registry import compile_plan
+
+
+def _rows(*rows):
+    return [(number, path, values) for number, (path, values) in enumerate(rows, 1)]
+
+
+def test_exact_rows_override_globs_and_defaults():
+    defaults = compile_plan({'artist': 'Default', 'model': 'Default Camera'})
+    mapping = TagMapping(_rows(
+        ('shoot1/*', {'model': 'Z 6', 'lensmodel': '24-70'}),
+        ('shoot1/b.jpg', {'model': 'ZF', 'lensmodel': ''}),
+        ('*.jpg', {'artist': 'Everyone'}),
+    ), defaults)
+
+    def tags(path):
+        return {(ifd, tag): value for ifd, tag, value in mapping.plan_for(path)}
+
+    assert mapping.plan_for('other/x.tif') is defaults
+    a = tags('shoot1/a.jpg')
+    assert a[('0th', piexif.ImageIFD.Artist)] == b'Everyone'
+    assert a[('0th', piexif.ImageIFD.Model)] == b'Z 6'
+    b = tags('shoot1/b.jpg')
+    assert b[('0th', piexif.ImageIFD.Model)] == b'ZF'
+    # An empty value keeps what the earlier rows set.
+    assert b[('Exif', piexif.ExifIFD.LensModel)] == b'24-70'
+    # Files matching the same globs share one plan.
+    assert mapping.plan_for('shoot1/c.jpg') is mapping.plan_for('shoot1/d.jpg')
+
+
+def test_whole_mapping_is_validated_up_front(tmp_path):
+    path = tmp_path / 'mapping.jsonl'
+    path.write_text('\n'.join(json.dumps(row) for row in [
+        {'path': 'a.jpg', 'fnumber': 'wide open'},
+        {'path': 'b.jpg', 'nosuchtag': 'x'},
+        {'fnumber': '2.8'},
+        {'path': 'a.jpg', 'model': 'ZF'},
+    ]))
+
+    with pytest.raises(ValueError) as info:
+        load_mapping(str(path))
+
+    message = str(info.value)
+    assert 'line 1' in message and 'line 2' in message and 'line 3' in message
+    assert "'a.jpg' is listed twice" in message
+
+
+def test_process_directory_applies_csv_mapping(tmp_path):
+    photos = tmp_path / 'photos'
+    os.makedirs(photos / 'shoot1')
+    for name in ('a.jpg', os.path.join('shoot1', 'b.jpg'), os.path.join('shoot1', 'c.jpg')):
+        Image.new('RGB', (16, 16)).save(photos / name)
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'false', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist', 'Model': 'Default'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    mapping_path = tmp_path / 'mapping.csv'
+    mapping_path.write_text('path,Model,DateTimeOriginal\n'
+                            'shoot1/*,Z 6,\n'
+                            'shoot1/c.jpg,,2025:01:02 03:04:05\n')
+
+    process_directory(str(photos), str(config_path), mapping=str(mapping_path))
+
+    def load(name):
+        exif = piexif.load(str(photos / name))
+        return (exif['0th'][piexif.ImageIFD.Artist], exif['0th'][piexif.ImageIFD.Model],
+                exif['Exif'].get(piexif.ExifIFD.DateTimeOriginal))
+
+    assert load('a.jpg') == (b'Test Artist', b'Default', None)
+    assert load(os.path.join('shoot1', 'b.jpg')) == (b'Test Artist', b'Z 6', None)
+    assert load(os.path.join('shoot1', 'c.jpg')) == (b'Test Artist', b'Z 6', b'2025:01:02 03:04:05')
+
+
+def test_invalid_mapping_touches_no_file(tmp_path, capsys):
+    Image.new('RGB', (16, 16)).save(tmp_path / 'a.jpg')
+    before = (tmp_path / 'a.jpg').read_bytes()
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'false', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Test Artist'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    mapping_path = tmp_path / 'mapping.csv'
+    mapping_path.write_text('path,FNumber\na.jpg,f/2.8\n')
+
+    process_directory(str(tmp_path), str(config_path), mapping=str(mapping_path))
+
+    assert (tmp_path / 'a.jpg').read_bytes() == before
+    assert 'Invalid tag mapping' in capsys.readouterr().out
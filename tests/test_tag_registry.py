@@ -0,0 +1,88 @@
+import pickle
+import configparser
+import piexif
+import piexif.helper
+import pytest
+from PIL import Image
+
+# Imported by the flat name exif_editor uses, so isinstance(plan, TagPlan)
+# holds inside update_exif_file.
+from tag_registry import TagPlan, compile_plan, lookup_tag
+from src.exif_editor import update_exif_file, process_directory
+
+
+def test_registry_covers_image_exif_and_gps_tags():
+    assert (lookup_tag('Artist').ifd, lookup_tag('Artist').tag) == ('0th', piexif.ImageIFD.Artist)
+    assert (lookup_tag('fnumber').ifd, lookup_tag('fnumber').tag) == ('Exif', piexif.ExifIFD.FNumber)
+    assert (lookup_tag('GPSAltitude').ifd, lookup_tag('GPSAltitude').tag) == ('GPS', piexif.GPSIFD.GPSAltitude)
+    # Tags defined in both tables go to the Exif IFD unless qualified.
+    assert lookup_tag('exposuretime').ifd == 'Exif'
+    assert lookup_tag('image.exposuretime').ifd == '0th'
+    # Pointers to other IFDs are maintained by the writer, not the config.
+    with pytest.raises(KeyError):
+        lookup_tag('exiftag')
+
+
+def test_compile_plan_encodes_values_once():
+    plan = compile_plan({
+        'artist': 'Someone',
+        'usercomment': 'Hello',
+        'fnumber': '2.8',
+        'exposuretime': '1/250',
+        'isospeedratings': '400',
+        'gpsversionid': '2, 2, 0, 0',
+        'datetimeoriginal': '',
+    })
+    assert dict(((ifd, tag), value) for ifd, tag, value in plan) == {
+        ('0th', piexif.ImageIFD.Artist): b'Someone',
+        ('Exif', piexif.ExifIFD.UserComment): piexif.helper.UserComment.dump('Hello', encoding='unicode'),
+        ('Exif', piexif.ExifIFD.FNumber): (14, 5),
+        ('Exif', piexif.ExifIFD.ExposureTime): (1, 250),
+        ('Exif', piexif.ExifIFD.ISOSpeedRatings): 400,
+        ('GPS', piexif.GPSIFD.GPSVersionID): (2, 2, 0, 0),
+    }
+
+
+def test_plan_is_immutable_and_picklable():
+    plan = compile_plan({'artist': 'Someone'})
+    with pytest.raises(AttributeError):
+        plan.entries = ()
+    assert pickle.loads(pickle.dumps(plan)) == plan
+    assert isinstance(plan, TagPlan) and len(plan) == 1
+
+
+def test_compile_plan_rejects_unknown_keys_and_bad_values():
+    with pytest.raises(ValueError) as excinfo:
+        compile_plan({'artsit': 'Someone', 'fnumber': 'wide open'})
+    assert "unknown EXIF tag 'artsit'" in str(excinfo.value)
+    assert "invalid value for 'fnumber'" in str(excinfo.value)
+
+
+def test_plan_round_trips_through_a_file(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    Image.new('RGB', (16, 16)).save(path)
+    plan = compile_plan({'fnumber': '2.8', 'gpsaltitude': '12.5', 'artist': 'Someone'})
+
+    assert update_exif_file(path, plan)[0] == 'written'
+    exif_dict = piexif.load(path)
+    assert exif_dict['Exif'][piexif.ExifIFD.FNumber] == (14, 5)
+    assert exif_dict['GPS'][piexif.GPSIFD.GPSAltitude] == (25, 2)
+    # Values compare equal to what piexif reads back, so a rerun is a no-op.
+    assert update_exif_file(path, plan)[0] == 'unchanged'
+
+
+def test_process_directory_rejects_unknown_keys_before_touching_files(tmp_path, capsys):
+    path = str(tmp_path / 'photo.jpg')
+    Image.new('RGB', (16, 16)).save(path)
+    config = configparser.ConfigParser()
+    config['Settings'] = {'target_extensions': '.jpg', 'create_backup': 'true'}
+    config['EXIF'] = {'artist': 'Someone', 'lens_model': 'Nikon'}
+    config_path = str(tmp_path / 'config.ini')
+    with open(config_path, 'w') as f:
+        config.write(f)
+
+    process_directory(str(tmp_path), config_path)
+
+    assert "unknown EXIF tag 'lens_model'" in capsys.readouterr().out
+    assert not (tmp_path / 'photo.jpg.bak').exists()
+    assert piexif.ImageIFD.Artist not in piexif.load(path)['0th']
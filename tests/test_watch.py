@@ -0,0 +1,137 @@
+import os
+import time
+import configparser
+from PIL import Image
+import piexif
+import pytest
+
+# Imported by the flat name so monkeypatching reaches the module watch uses.
+import watch
+from watch import DirectoryWatch, InotifyWatcher, PollingWatcher, load_state
+
+
+@pytest.fixture
+def watched_dir(tmp_path):
+    directory = tmp_path / 'ingest'
+    directory.mkdir()
+    config = configparser.ConfigParser()
+    config['Settings'] = {'create_backup': 'false', 'target_extensions': '.jpg'}
+    config['EXIF'] = {'Artist': 'Watcher'}
+    config_path = tmp_path / 'config.ini'
+    with open(config_path, 'w') as f:
+        config.write(f)
+    return str(directory), str(config_path)
+
+
+def run_until(watcher, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        watcher.step(0.05)
+
+
+def artist(path):
+    return piexif.load(path)['0th'].get(piexif.ImageIFD.Artist)
+
+
+@pytest.mark.parametrize('polling', [True, False])
+def test_new_files_are_tagged_after_settling(watched_dir, polling):
+    directory, config_path = watched_dir
+    watcher = DirectoryWatch(directory, config_path, settle=0.1, polling=polling, interval=0.05)
+    if not polling and not isinstance(watcher.watcher, InotifyWatcher):
+        pytest.skip('inotify is not available here')
+    try:
+        watcher.step(0.05)
+        os.makedirs(os.path.join(directory, 'new'))
+        path = os.path.join(directory, 'new', 'photo.jpg')
+        Image.new('RGB', (16, 16)).save(path)
+        run_until(watcher, lambda: watcher.tagged == 1)
+        assert artist(path) == b'Watcher'
+        # The watch's own write does not make the file pending again.
+        for _ in range(5):
+            watcher.step(0.05)
+        assert watcher.tagged == 1 and not watcher.pending
+    finally:
+        watcher.close()
+    assert load_state(watcher.state_path) == {os.path.join('new', 'photo.jpg'): watcher.files[os.path.join('new', 'photo.jpg')]}
+
+
+def test_files_still_changing_are_not_tagged(watched_dir):
+    directory, config_path = watched_dir
+    watcher = DirectoryWatch(directory, config_path, settle=0.3, polling=True, interval=0.05)
+    try:
+        watcher.step(0.05)
+        path = os.path.join(directory, 'growing.jpg')
+        Image.new('RGB', (16, 16)).save(path)
+        for i in range(4):
+            watcher.step(0.05)
+            with open(path, 'ab') as f:
+                f.write(b'\0' * 10)
+        assert watcher.tagged == 0
+        run_until(watcher, lambda: watcher.tagged == 1)
+    finally:
+        watcher.close()
+
+
+def test_restart_skips_files_in_the_state(watched_dir, monkeypatch):
+    directory, config_path = watched_dir
+    for i in range(3):
+        Image.new('RGB', (16, 16)).save(os.path.join(directory, f'photo{i}.jpg'))
+    watcher = DirectoryWatch(directory, config_path, settle=0, polling=True, interval=0.01)
+    run_until(watcher, lambda: watcher.tagged == 3)
+    watcher.close()
+
+    calls = []
+    real = watch.tag_file
+    monkeypatch.setattr(watch, 'tag_file', lambda path, *a, **k: calls.append(path) or real(path, *a, **k))
+    Image.new('RGB', (16, 16)).save(os.path.join(directory, 'later.jpg'))
+    watcher = DirectoryWatch(directory, config_path, settle=0, polling=True, interval=0.01)
+    try:
+        run_until(watcher, lambda: watcher.tagged == 1)
+    finally:
+        watcher.close()
+    assert calls == [os.path.join(directory, 'later.jpg')]
+
+
+def test_polling_watcher_reports_changed_files(tmp_path):
+    from discovery import FileFinder
+    poller = PollingWatcher(str(tmp_path), FileFinder(['.jpg']), interval=0)
+    assert poller.wait(0) is watch.RESCAN
+    (tmp_path / 'a.jpg').write_bytes(b'x')
+    assert poller.wait(0) == {str(tmp_path / 'a.jpg')}
+    assert poller.wait(0) == set()
+
+
+@pytest.mark.parametrize('polling', [True, False])
+def test_deleted_files_and_directories_leave_the_state(watched_dir, polling):
+    directory, config_path = watched_dir
+    os.makedirs(os.path.join(directory, 'shoot'))
+    for name in ('a.jpg', os.path.join('shoot', 'b.jpg'), os.path.join('shoot', 'c.jpg')):
+        Image.new('RGB', (16, 16)).save(os.path.join(directory, name))
+    watcher = DirectoryWatch(directory, config_path, settle=0, polling=polling, interval=0.01)
+    if not polling and not isinstance(watcher.watcher, InotifyWatcher):
+        pytest.skip('inotify is not available here')
+    try:
+        run_until(watcher, lambda: watcher.tagged == 3)
+        os.remove(os.path.join(directory, 'a.jpg'))
+        os.rename(os.path.join(directory, 'shoot'), str(directory) + '-moved')
+        run_until(watcher, lambda: not watcher.files)
+    finally:
+        watcher.close()
+    assert load_state(watcher.state_path) == {}
+
+
+def test_where_limits_the_files_tagged(watched_dir, monkeypatch):
+    directory, config_path = watched_dir
+    Image.new('RGB', (16, 16)).save(os.path.join(directory, 'nikon.jpg'),
+                                    exif=piexif.dump({'0th': {piexif.ImageIFD.Make: b'Nikon'}}))
+    Image.new('RGB', (16, 16)).save(os.path.join(directory, 'canon.jpg'),
+                                    exif=piexif.dump({'0th': {piexif.ImageIFD.Make: b'Canon'}}))
+    watcher = DirectoryWatch(directory, config_path, settle=0, polling=True, interval=0.01, where=['make=Canon'])
+    try:
+        run_until(watcher, lambda: len(watcher.files) == 2)
+    finally:
+        watcher.close()
+    assert watcher.tagged == 1
+    assert artist(os.path.join(directory, 'canon.jpg')) == b'Watcher'
+    assert artist(os.path.join(directory, 'nikon.jpg')) is None